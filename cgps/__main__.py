@@ -5,7 +5,9 @@ import yaml
 
 from cgps.cli.app_cli import AppCli
 from cgps.container import Container
+from cgps.core.checkpoint_manager import CheckpointManager
 from cgps.core.database import Database
+from cgps.core.snapshot_flusher import SnapshotFlusher
 from dependency_injector.wiring import Provide, inject
 
 
@@ -13,9 +15,18 @@ from dependency_injector.wiring import Provide, inject
 def run(
     app: AppCli = Provide[Container.app_cli],
     database: Database = Provide[Container.database],
+    checkpoints: CheckpointManager = Provide[Container.checkpoint_manager],
+    snapshots: SnapshotFlusher = Provide[Container.snapshot_flusher],
 ):
-    app.run()
-    database.close()
+    checkpoints.start()
+    snapshots.start()
+    try:
+        app.run()
+    finally:
+        snapshots.stop()
+        checkpoints.stop()
+        # also writes the final snapshot in memory_snapshot mode
+        database.close()
 
 
 def main():
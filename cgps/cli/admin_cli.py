@@ -1,13 +1,18 @@
 from argparse import _SubParsersAction, ArgumentParser
+from typing import Optional
 
 import questionary
 from cgps.cli.guards.login_guard import logged_in
 from cgps.cli.user_cli import UserCli
+from cgps.core.database import Database
 from cgps.core.services.admin_auth_service import AdminAuthService
 from cgps.core.services.car_service import CarService
+from cgps.core.services.geofence_service import GeofenceService
 from cgps.core.services.gps_service import GpsService
 from cgps.core.services.order_service import OrderService
 from cgps.core.services.tracking_service import TrackingService
+from cgps.core.services.trip_service import TripService
+from cgps.core.utils import ISO_DT
 from cgps.ui.tracking_report_ui import TrackingReportUi
 from cgps.ui.car_list_ui import CarListUi
 from cgps.ui.customer_search_ui import CustomerSearchUi
@@ -32,8 +37,14 @@ class AdminCli(UserCli):
         gps_service: GpsService,
         tracking_service: TrackingService,
         tracking_report_ui: TrackingReportUi,
+        database: Database,
+        geofence_service: GeofenceService,
+        trip_service: TripService,
     ):
         super().__init__(auth_service, login_ui)
+        self._database = database
+        self._geofence_service = geofence_service
+        self._trip_service = trip_service
         self._order_service = order_service
         self._car_service = car_service
         self._gps_service = gps_service
@@ -75,6 +86,10 @@ class AdminCli(UserCli):
             "report", help="view cars tracking report in realtime"
         )
         car_report.set_defaults(func=lambda _: self._car_report())
+        car_trips = car_cmd.add_parser("trips", help="list trips, newest first")
+        car_trips.add_argument("--car", type=int, default=None, metavar="ID")
+        car_trips.add_argument("--limit", type=int, default=20)
+        car_trips.set_defaults(func=lambda args: self._car_trips(args.car, args.limit))
 
         order = cmd.add_parser("order", help="view all and update rent orders")
         order.set_defaults(func=lambda _: self._order_list())
@@ -84,6 +99,36 @@ class AdminCli(UserCli):
         order_search = order_cmd.add_parser("search", help="search customer orders")
         order_search.set_defaults(func=lambda _: self._order_search())
 
+        geofence = cmd.add_parser("geofence", help="view and manage geofences")
+        geofence.set_defaults(func=lambda _: self._geofence_list())
+        geofence_cmd = geofence.add_subparsers(
+            dest="cmd", title="Usage", metavar="geofence <command>"
+        )
+        geofence_circle = geofence_cmd.add_parser("circle", help="add a circular geofence")
+        geofence_circle.add_argument("name")
+        geofence_circle.add_argument("lat", type=float)
+        geofence_circle.add_argument("lng", type=float)
+        geofence_circle.add_argument("radius_m", type=float, help="radius in metres")
+        geofence_circle.set_defaults(
+            func=lambda args: self._geofence_circle(args.name, args.lat, args.lng, args.radius_m)
+        )
+        geofence_polygon = geofence_cmd.add_parser("polygon", help="add a polygon geofence")
+        geofence_polygon.add_argument("name")
+        geofence_polygon.add_argument("points", nargs="+", metavar="LAT,LNG")
+        geofence_polygon.set_defaults(
+            func=lambda args: self._geofence_polygon(args.name, args.points)
+        )
+        geofence_delete = geofence_cmd.add_parser("delete", help="delete a geofence")
+        geofence_delete.add_argument("id", type=int)
+        geofence_delete.set_defaults(func=lambda args: self._geofence_delete(args.id))
+        geofence_events = geofence_cmd.add_parser("events", help="show enter/exit events")
+        geofence_events.add_argument("--fence", type=int, default=None, metavar="ID")
+        geofence_events.add_argument("--car", type=int, default=None, metavar="ID")
+        geofence_events.add_argument("--limit", type=int, default=50)
+        geofence_events.set_defaults(
+            func=lambda args: self._geofence_events(args.fence, args.car, args.limit)
+        )
+
     @logged_in()
     def _customer_list(self, user_id: int):
         pass
@@ -143,28 +188,101 @@ class AdminCli(UserCli):
 
     @logged_in()
     def _car_report(self, user_id: int):
-        initial = self._tracking_service.list_with_car()
-        cars = self._car_service.all()
+        with self._database.snapshot():
+            # one row per car from tracking_latest; the stream appends from there
+            initial = self._tracking_service.latest_positions()
+            cars = self._car_service.all()
         self._tracking_report_ui.with_data(initial).with_stream(
             cars=cars,
             interval_sec=3.0,
         ).run()
 
     @logged_in()
-    def _order_search(self, user_id: int):
-        result = self._customer_search_ui.run()
-        if result is None:
+    def _car_trips(self, car_id: Optional[int], limit: int, user_id: int):
+        trips = self._trip_service.list(car_id=car_id, limit=limit)
+        if not trips:
+            print("No trips")
             return
-        invoices = self._order_service.list(customer_id=result.id)
-        result = self._order_list_ui.with_data(invoices, flow="manage").run()
+        for t in trips:
+            fuel = f"{t.fuel_used:.1f}%" if t.fuel_used is not None else "-"
+            print(
+                f"{t.started_at.strftime(ISO_DT)}  {t.duration_sec / 60:>6.1f} min"
+                f"  car {t.car_id}  {t.distance_km:>8.2f} km"
+                f"  max {t.max_speed_kmh or 0:>5.1f} km/h  fuel {fuel}"
+            )
+
+    @logged_in()
+    def _order_search(self, user_id: int):
+        # one consistent snapshot for the screen; the chosen action writes afterwards
+        with self._database.snapshot():
+            result = self._customer_search_ui.run()
+            if result is None:
+                return
+            invoices = self._order_service.list(customer_id=result.id)
+            result = self._order_list_ui.with_data(invoices, flow="manage").run()
         self._handle_order_manage(result)
 
     @logged_in()
     def _order_list(self, user_id: int):
-        invoices = self._order_service.list()
-        result = self._order_list_ui.with_data(invoices, flow="manage").run()
+        with self._database.snapshot():
+            invoices = self._order_service.list()
+            result = self._order_list_ui.with_data(invoices, flow="manage").run()
         self._handle_order_manage(result)
 
+    @logged_in()
+    def _geofence_list(self, user_id: int):
+        fences = self._geofence_service.all()
+        if not fences:
+            print("No geofences")
+            return
+        for f in fences:
+            if f.kind == "circle":
+                shape = f"circle {f.center_lat}, {f.center_lng} r={f.radius_m:g} m"
+            else:
+                shape = f"polygon of {len(f.points)} points"
+            inside = len(self._geofence_service.inside(f.id))
+            print(f"{f.id:>4}  {f.name}  {shape}  ({inside} car(s) inside)")
+
+    @logged_in()
+    def _geofence_circle(self, name: str, lat: float, lng: float, radius_m: float, user_id: int):
+        try:
+            fence_id = self._geofence_service.add_circle(name, lat, lng, radius_m)
+        except ValueError as e:
+            print(e)
+            return
+        print(f"Added geofence {fence_id}")
+
+    @logged_in()
+    def _geofence_polygon(self, name: str, points: list[str], user_id: int):
+        try:
+            parsed = [tuple(float(v) for v in p.split(",")) for p in points]
+            if any(len(p) != 2 for p in parsed):
+                raise ValueError("Points must be given as LAT,LNG")
+            fence_id = self._geofence_service.add_polygon(name, parsed)
+        except ValueError as e:
+            print(e)
+            return
+        print(f"Added geofence {fence_id}")
+
+    @logged_in()
+    def _geofence_delete(self, geofence_id: int, user_id: int):
+        if not self._geofence_service.delete(geofence_id):
+            print(f"No geofence {geofence_id}")
+            return
+        print("Delete geofence successful")
+
+    @logged_in()
+    def _geofence_events(
+        self, geofence_id: Optional[int], car_id: Optional[int], limit: int, user_id: int
+    ):
+        events = self._geofence_service.events(geofence_id, car_id, limit)
+        if not events:
+            print("No geofence events")
+            return
+        for e in events:
+            at = e.created_at.strftime(ISO_DT) if e.created_at else ""
+            print(f"{at}  car {e.car_id}  {e.event:<5}  geofence {e.geofence_id}")
+
     def _handle_order_manage(self, result):
         if result is None:
             return
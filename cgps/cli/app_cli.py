@@ -45,10 +45,24 @@ class AppCli:
                     "    cgps admin car                   view all and update cars",
                     "    cgps admin car register          register a new car",
                     "    cgps admin car report            view cars tracking report in realtime",
+                    "    cgps admin car trips             list trips, newest first",
                     "    cgps admin order                 view all and update rent orders",
                     "    cgps admin order search          search customer orders",
+                    "    cgps admin geofence              view and manage geofences",
+                    "    cgps admin geofence events       show geofence enter/exit events",
                     "\n"
-                    "    cgps db init                     initialize database"
+                    "    cgps db init                     initialize database",
+                    "    cgps db migrate                  apply pending schema migrations",
+                    "    cgps db rollback                 revert the last schema migration",
+                    "    cgps db status                   show schema migration status",
+                    "    cgps db backup <path>            online backup to a new file",
+                    "    cgps db vacuum                   compact the database file",
+                    "    cgps db advise                   check service queries for table scans",
+                    "    cgps db stats                    show query profiler report",
+                    "    cgps db partitions               list or drop monthly tracking partitions",
+                    "    cgps db retain                   roll up trackings and purge old raw rows",
+                    "    cgps db archive                  export closed tracking days to column files",
+                    "    cgps db trips                    show or rebuild trip segmentation"
                 ]
             ),
         )
@@ -1,12 +1,47 @@
+import sqlite3
 from argparse import _SubParsersAction, ArgumentParser
 from importlib.resources import files
 from pathlib import Path
+from typing import Optional
 from cgps.core.database import Database
+from cgps.core.index_advisor import IndexAdvisor
+from cgps.core.migrator import Migrator
+from cgps.core.query_profiler import QueryProfiler, null_params
+from cgps.core.services.tracking_service import TrackingService
+from cgps.core.tracking_archive import TrackingArchive, TrackingArchiver
+from cgps.core.tracking_partitions import TrackingPartitions
+from cgps.core.tracking_retention import TrackingRetention
+from cgps.core.trip_segmenter import TripSegmenter
+
+_SORT_KEYS = {"total": "total_ms", "p95": "p95_ms", "calls": "calls", "rows": "rows"}
 
 
 class DatabaseCli:
-    def __init__(self, database: Database):
+    def __init__(
+        self,
+        database: Database,
+        migrator: Migrator,
+        index_advisor: IndexAdvisor,
+        tracking_timestamps: str = "iso",
+        profiler: Optional[QueryProfiler] = None,
+        partitions: Optional[TrackingPartitions] = None,
+        retention: Optional[TrackingRetention] = None,
+        archiver: Optional[TrackingArchiver] = None,
+        archive: Optional[TrackingArchive] = None,
+        trips: Optional[TripSegmenter] = None,
+        tracking_service: Optional[TrackingService] = None,
+    ):
         self._database = database
+        self._migrator = migrator
+        self._index_advisor = index_advisor
+        self._tracking_timestamps = tracking_timestamps
+        self._profiler = profiler
+        self._partitions = partitions if partitions is not None and partitions.enabled else None
+        self._retention = retention
+        self._archiver = archiver
+        self._archive = archive
+        self._trips = trips
+        self._tracking_service = tracking_service
 
     def run(self, role: _SubParsersAction):
         db: ArgumentParser = role.add_parser("db", help="Database management")
@@ -14,10 +49,265 @@ class DatabaseCli:
 
         cmd = db.add_subparsers(dest="cmd", title="Usage", metavar="db <command>")
         db_init = cmd.add_parser("init", help="initialize database")
-        db_init.set_defaults(
-            func=lambda _: (
-                self._database.migrate_from_file(Path(files("cgps") / "db.sql")),
-                self._database.migrate_from_file(Path(files("cgps") / "seed.sql")),
-                print("Database initialized successfully"),
+        db_init.set_defaults(func=lambda _: self._init())
+
+        db_migrate = cmd.add_parser("migrate", help="apply pending migrations")
+        db_migrate.add_argument("--to", type=int, default=None, help="target version")
+        db_migrate.set_defaults(func=lambda args: self._migrate(args.to))
+
+        db_rollback = cmd.add_parser("rollback", help="revert applied migrations")
+        db_rollback.add_argument("--steps", type=int, default=1, help="migrations to revert")
+        db_rollback.set_defaults(func=lambda args: self._rollback(args.steps))
+
+        db_status = cmd.add_parser("status", help="show migration status")
+        db_status.set_defaults(func=lambda _: self._status())
+
+        db_advise = cmd.add_parser("advise", help="check service queries for table scans")
+        db_advise.add_argument(
+            "--apply",
+            action="store_true",
+            help="create the curated indexes (pending migrations) and run ANALYZE",
+        )
+        db_advise.set_defaults(func=lambda args: self._advise(args.apply))
+
+        db_backup = cmd.add_parser("backup", help="online backup to a new file")
+        db_backup.add_argument("path", help="backup file to create")
+        db_backup.add_argument("--pages", type=int, default=256, help="pages per step")
+        db_backup.add_argument(
+            "--sleep", type=float, default=0.0, help="seconds to pause between steps"
+        )
+        db_backup.set_defaults(
+            func=lambda args: self._backup(args.path, args.pages, args.sleep)
+        )
+
+        db_vacuum = cmd.add_parser("vacuum", help="compact the database file")
+        db_vacuum.add_argument(
+            "--incremental",
+            nargs="?",
+            type=int,
+            const=0,
+            default=None,
+            metavar="PAGES",
+            help="release free pages (all by default) without a full rebuild",
+        )
+        db_vacuum.set_defaults(func=lambda args: self._vacuum(args.incremental))
+
+        db_stats = cmd.add_parser("stats", help="show query profiler report")
+        db_stats.add_argument("--top", type=int, default=10, help="statements to show")
+        db_stats.add_argument(
+            "--sort", choices=list(_SORT_KEYS), default="total", help="order statements by"
+        )
+        db_stats.add_argument("--reset", action="store_true", help="clear recorded stats")
+        db_stats.set_defaults(func=lambda args: self._stats(args.top, args.sort, args.reset))
+
+        db_partitions = cmd.add_parser("partitions", help="list or drop monthly tracking partitions")
+        db_partitions.add_argument(
+            "--drop", type=int, default=None, metavar="YYYYMM", help="delete one month"
+        )
+        db_partitions.set_defaults(func=lambda args: self._partitions_cmd(args.drop))
+
+        db_retain = cmd.add_parser(
+            "retain", help="roll trackings up per minute/hour and purge old raw rows"
+        )
+        db_retain.add_argument(
+            "--rollup-only", action="store_true", help="update the rollups, purge nothing"
+        )
+        db_retain.set_defaults(func=lambda args: self._retain(args.rollup_only))
+
+        db_archive = cmd.add_parser(
+            "archive", help="export closed days of trackings to columnar files"
+        )
+        db_archive.add_argument(
+            "--list", action="store_true", help="list archived days, export nothing"
+        )
+        db_archive.set_defaults(func=lambda args: self._archive_cmd(args.list))
+
+        db_trips = cmd.add_parser("trips", help="show trip segmentation status")
+        db_trips.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="segment the stored history again (stop ingest first)",
+        )
+        db_trips.set_defaults(func=lambda args: self._trips_cmd(args.rebuild))
+
+    def _init(self):
+        if self._partitions is not None:
+            self._partitions.drop_all()
+        self._database.migrate_from_file(Path(files("cgps") / "db.sql"))
+        self._migrator.migrate()
+        self._database.migrate_from_file(Path(files("cgps") / "seed.sql"))
+        if self._tracking_timestamps == "epoch_ms":
+            self._database.migrate_from_file(Path(files("cgps") / "trackings_epoch.sql"))
+        print("Database initialized successfully")
+
+    def _migrate(self, target: Optional[int]):
+        applied = self._migrator.migrate(target, progress=print)
+        if not applied:
+            print("Database is up to date")
+            return
+        print(f"Migrated to version {self._migrator.current_version()}")
+
+    def _rollback(self, steps: int):
+        reverted = self._migrator.rollback(steps, progress=print)
+        if not reverted:
+            print("Nothing to roll back")
+            return
+        print(f"Rolled back to version {self._migrator.current_version()}")
+
+    def _status(self):
+        for s in self._migrator.status():
+            print(f"{s.version:04d}  {s.name:<32} {s.state:<8} {s.applied_at or ''}".rstrip())
+
+    def _backup(self, path: str, pages: int, sleep: float):
+        if Path(path).exists():
+            print(f"Backup target already exists: {path}")
+            return
+
+        def progress(status: int, remaining: int, total: int):
+            print(f"\rCopied {total - remaining}/{total} pages", end="", flush=True)
+
+        self._database.backup(path, pages=pages, sleep=sleep, progress=progress)
+        print(f"\nBackup written to {path}")
+
+    def _vacuum(self, incremental: Optional[int]):
+        if incremental is not None:
+            if self._database.auto_vacuum() != "INCREMENTAL":
+                print("auto_vacuum is not INCREMENTAL; run `cgps db vacuum` once to convert")
+                return
+            freed = self._database.incremental_vacuum(incremental or None)
+            print(f"Released {freed} free pages")
+            return
+        self._database.vacuum()
+        print(f"Database vacuumed (auto_vacuum={self._database.auto_vacuum()})")
+
+    def _advise(self, apply: bool):
+        if apply:
+            self._migrator.migrate(progress=print)
+            self._index_advisor.analyze()
+            print("Indexes up to date, statistics refreshed (ANALYZE)\n")
+
+        advice = self._index_advisor.replay()
+        for a in advice:
+            print(f"[{'scan' if a.scans else ' ok '}] {a.label}")
+            for line in a.plan:
+                print(f"         {line}")
+        scanning = {a.label for a in advice if a.scans}
+        total = {a.label for a in advice}
+        print(f"\n{len(scanning)} of {len(total)} service queries scan a table")
+        pending = [s for s in self._migrator.status() if s.state != "applied"]
+        if pending and not apply:
+            print("Pending migrations add indexes; run `cgps db advise --apply` or `cgps db migrate`")
+
+    def _stats(self, top: int, sort: str, reset: bool):
+        if self._profiler is None:
+            print("Query profiler is not configured")
+            return
+        if reset:
+            self._profiler.reset()
+            print("Query stats cleared")
+            return
+        stmts = self._profiler.statements(_SORT_KEYS[sort])[:top]
+        if not stmts:
+            hint = "" if self._profiler.enabled else " (set database.profiler.enabled in config.yml)"
+            print(f"No queries recorded{hint}")
+            return
+
+        print(f"{'calls':>8} {'total ms':>10} {'p95 ms':>9} {'max ms':>9} {'rows':>9}  sql")
+        for s in stmts:
+            sql = s.sql if len(s.sql) <= 80 else s.sql[:77] + "..."
+            print(
+                f"{s.calls:>8} {s.total_ms:>10.1f} {s.p95_ms:>9.2f} {s.max_ms:>9.2f}"
+                f" {s.rows:>9}  {sql}"
+            )
+
+        print("\nQuery plans, slowest first by p95:")
+        for s in sorted(stmts, key=lambda s: s.p95_ms, reverse=True):
+            print(f"\n[{s.p95_ms:.2f} ms] {s.sql}")
+            try:
+                plan = self._database.explain(s.sql, null_params(s.params))
+            except sqlite3.Error as e:
+                print(f"  (no plan: {e})")
+                continue
+            for line in plan:
+                # SCAN without an index walks the whole table
+                full = line.lstrip().startswith("SCAN ") and "INDEX" not in line
+                print(f"  {line}{'   <-- full scan' if full else ''}")
+
+    def _partitions_cmd(self, drop: Optional[int]):
+        if self._partitions is None:
+            print("Tracking partitions are disabled (tracking.partitions.enabled in config.yml)")
+            return
+        if drop is not None:
+            if self._partitions.drop(drop):
+                print(f"Dropped partition {drop}")
+            else:
+                print(f"No partition for {drop}")
+            return
+        months = self._partitions.months()
+        if not months:
+            print("No tracking partitions")
+            return
+        for month in months:
+            path = self._partitions.path(month)
+            size = sum(
+                p.stat().st_size
+                for p in (path, Path(f"{path}-wal"))
+                if p.exists()
             )
+            print(f"{month}  {size / 1024 / 1024:>9.1f} MiB  {path}")
+
+    def _retain(self, rollup_only: bool):
+        if self._retention is None:
+            print("Tracking retention is not configured")
+            return
+        if rollup_only:
+            rolled = self._retention.rollup(progress=print)
+            print(f"Rolled up {rolled} tracking rows")
+            return
+        result = self._retention.run(progress=print)
+        print(
+            f"Rolled up {result.rolled_up} tracking rows, purged {result.purged} raw rows"
+            f" and {result.minute_buckets_purged} minute buckets"
+        )
+        if result.compacted:
+            print(f"Compacted {result.compacted} raw rows into tracking blocks")
+        if result.dropped_months:
+            print(f"Dropped partitions: {', '.join(map(str, result.dropped_months))}")
+        if (result.purged or result.compacted) and self._database.auto_vacuum() == "INCREMENTAL":
+            print("Run `cgps db vacuum --incremental` to return the freed pages to the OS")
+
+    def _archive_cmd(self, list_only: bool):
+        if self._archiver is None or self._archive is None:
+            print("Tracking archive is not configured")
+            return
+        if not list_only:
+            days = self._archiver.export_closed(progress=print)
+            print(f"Archived {len(days)} day(s)")
+            return
+        days = self._archive.days()
+        if not days:
+            print("No archived days")
+            return
+        for day in days:
+            with self._archive.open(day) as archived:
+                size = sum(p.stat().st_size for p in archived.path.iterdir())
+                rows = len(archived)
+            print(f"{day.isoformat()}  {rows:>9} rows  {size / 1024 / 1024:>9.1f} MiB")
+
+    def _trips_cmd(self, rebuild: bool):
+        if self._trips is None or self._tracking_service is None:
+            print("Trip segmentation is not configured")
+            return
+        if rebuild:
+            ended = self._trips.rebuild(self._tracking_service, progress=print)
+            print(f"Rebuilt {ended} trip(s)")
+            return
+        row = self._database.fetchone(
+            "SELECT COUNT(*) AS n, MAX(ended_at) AS last FROM trips"
+        )
+        ongoing = self._database.fetchone(
+            "SELECT COUNT(*) AS n FROM trip_state WHERE start_id IS NOT NULL"
         )
+        print(f"Trips: {row['n']} (last ended {row['last'] or '-'}), ongoing: {ongoing['n']}")
+        if not self._trips.enabled:
+            print("Segmentation on ingest is disabled (tracking.trips.enabled in config.yml)")
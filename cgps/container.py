@@ -3,14 +3,27 @@ from cgps.cli.admin_cli import AdminCli
 from cgps.cli.app_cli import AppCli
 from cgps.cli.customer_cli import CustomerCli
 from cgps.cli.database_cli import DatabaseCli
+from cgps.core.checkpoint_manager import CheckpointManager
 from cgps.core.database import Database
+from cgps.core.geofence_engine import GeofenceEngine
+from cgps.core.index_advisor import IndexAdvisor
+from cgps.core.migrator import Migrator
+from cgps.core.query_profiler import QueryProfiler
+from cgps.core.snapshot_flusher import SnapshotFlusher
 from cgps.core.services.admin_auth_service import AdminAuthService
 from cgps.core.services.customer_auth_service import CustomerAuthService
 from cgps.core.services.car_service import CarService
 from cgps.core.services.customer_service import CustomerService
+from cgps.core.services.geofence_service import GeofenceService
 from cgps.core.services.gps_service import GpsService
 from cgps.core.services.order_service import OrderService
 from cgps.core.services.tracking_service import TrackingService
+from cgps.core.services.trip_service import TripService
+from cgps.core.tracking_archive import TrackingArchive, TrackingArchiver
+from cgps.core.tracking_blocks import TrackingBlocks
+from cgps.core.tracking_partitions import TrackingPartitions
+from cgps.core.tracking_retention import TrackingRetention
+from cgps.core.trip_segmenter import TripSegmenter
 from cgps.ui.car_list_ui import CarListUi
 from cgps.ui.customer_search_ui import CustomerSearchUi
 from cgps.ui.gps_list_ui import GpsListUi
@@ -28,10 +41,79 @@ from dependency_injector.containers import DeclarativeContainer
 class Container(DeclarativeContainer):
     config = Configuration()
 
+    query_profiler = ThreadSafeSingleton(
+        QueryProfiler,
+        path=config.database.profiler.path,
+        enabled=config.database.profiler.enabled,
+    )
     database = ThreadSafeSingleton(
         Database,
         db_path=config.database.path,
+        profile=config.database.profile,
+        pragmas=config.database.pragmas,
+        readers=config.database.readers,
+        profiler=query_profiler,
+        mode=config.database.mode,
+    )
+
+    checkpoint_manager = ThreadSafeSingleton(
+        CheckpointManager,
+        database=database,
+        enabled=config.database.checkpoint.enabled,
+        interval_sec=config.database.checkpoint.interval_sec,
+        truncate_wal_bytes=config.database.checkpoint.truncate_wal_bytes,
+    )
+    snapshot_flusher = ThreadSafeSingleton(
+        SnapshotFlusher,
+        database=database,
+        interval_sec=config.database.snapshot.interval_sec,
+    )
+    tracking_partitions = ThreadSafeSingleton(
+        TrackingPartitions,
+        database=database,
+        directory=config.tracking.partitions.directory,
+        enabled=config.tracking.partitions.enabled,
+        max_attached=config.tracking.partitions.max_attached,
+    )
+    geofence_engine = ThreadSafeSingleton(
+        GeofenceEngine,
+        database=database,
+        enabled=config.tracking.geofence.enabled,
+        cell_deg=config.tracking.geofence.cell_deg,
     )
+    trip_segmenter = ThreadSafeSingleton(
+        TripSegmenter,
+        database=database,
+        enabled=config.tracking.trips.enabled,
+        min_speed_kmh=config.tracking.trips.min_speed_kmh,
+        stop_sec=config.tracking.trips.stop_sec,
+        max_gap_sec=config.tracking.trips.max_gap_sec,
+    )
+    tracking_blocks = ThreadSafeSingleton(
+        TrackingBlocks,
+        database=database,
+        enabled=config.tracking.blocks.enabled,
+        compress=config.tracking.blocks.compress,
+    )
+    tracking_retention = Factory(
+        TrackingRetention,
+        database=database,
+        partitions=tracking_partitions,
+        raw_days=config.tracking.retention.raw_days,
+        minute_days=config.tracking.retention.minute_days,
+        batch_rows=config.tracking.retention.batch_rows,
+        max_gap_sec=config.tracking.retention.max_gap_sec,
+        blocks=tracking_blocks,
+    )
+    tracking_archiver = Factory(
+        TrackingArchiver,
+        database=database,
+        partitions=tracking_partitions,
+        directory=config.tracking.archive.directory,
+    )
+    tracking_archive = Factory(TrackingArchive, directory=config.tracking.archive.directory)
+    migrator = Factory(Migrator, database=database)
+    index_advisor = Factory(IndexAdvisor, database=database)
 
     # Service Factory
     admin_auth_service = Factory(
@@ -67,7 +149,13 @@ class Container(DeclarativeContainer):
     tracking_service = Factory(
         TrackingService,
         database=database,
+        partitions=tracking_partitions,
+        geofences=geofence_engine,
+        trips=trip_segmenter,
+        blocks=tracking_blocks,
     )
+    geofence_service = Factory(GeofenceService, database=database)
+    trip_service = Factory(TripService, database=database)
 
     # UI Factory
     login_ui = Factory(LoginUi)
@@ -99,6 +187,9 @@ class Container(DeclarativeContainer):
         gps_service=gps_service,
         tracking_service=tracking_service,
         tracking_report_ui=tracking_report_ui,
+        database=database,
+        geofence_service=geofence_service,
+        trip_service=trip_service,
     )
     customer_cli = Factory(
         CustomerCli,
@@ -115,6 +206,16 @@ class Container(DeclarativeContainer):
     database_cli = Factory(
         DatabaseCli,
         database=database,
+        migrator=migrator,
+        index_advisor=index_advisor,
+        tracking_timestamps=config.tracking.timestamps,
+        profiler=query_profiler,
+        partitions=tracking_partitions,
+        retention=tracking_retention,
+        archiver=tracking_archiver,
+        archive=tracking_archive,
+        trips=trip_segmenter,
+        tracking_service=tracking_service,
     )
     app_cli = Factory(
         AppCli,
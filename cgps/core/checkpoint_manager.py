@@ -0,0 +1,79 @@
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from cgps.core.database import Database
+
+
+@dataclass
+class CheckpointResult:
+    mode: str
+    busy: int
+    wal_frames: int
+    checkpointed: int
+    wal_bytes: int
+
+
+class CheckpointManager:
+    """Background WAL checkpoints for a ``Database``.
+
+    Every ``interval_sec`` a PASSIVE checkpoint copies whatever it can without
+    waiting on readers or the writer. Once the ``-wal`` file has grown past
+    ``truncate_wal_bytes`` a TRUNCATE checkpoint instead waits (up to
+    ``busy_timeout``) for readers to move to the latest snapshot and resets the
+    file to zero bytes, so a long ingest cannot balloon it. ``stop()`` finishes
+    with a TRUNCATE if anything is left in the ``-wal`` file.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        enabled: bool = True,
+        interval_sec: float = 30.0,
+        truncate_wal_bytes: int = 64 * 1024 * 1024,
+    ):
+        self._database = database
+        self._enabled = bool(enabled)
+        self._interval = float(interval_sec)
+        self._truncate_bytes = int(truncate_wal_bytes)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last: Optional[CheckpointResult] = None
+
+    def start(self) -> None:
+        if not self._enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="cgps-checkpoint", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        # an empty -wal means nothing was written since the last checkpoint
+        if self._database.wal_size() > 0:
+            self._checkpoint("TRUNCATE")
+
+    def run_once(self) -> Optional[CheckpointResult]:
+        wal_bytes = self._database.wal_size()
+        mode = "TRUNCATE" if wal_bytes >= self._truncate_bytes else "PASSIVE"
+        return self._checkpoint(mode)
+
+    def _checkpoint(self, mode: str) -> Optional[CheckpointResult]:
+        try:
+            busy, frames, done = self._database.checkpoint(mode)
+        except sqlite3.Error:
+            # e.g. the database is locked past busy_timeout; try again next tick
+            return None
+        self.last = CheckpointResult(mode, busy, frames, done, self._database.wal_size())
+        return self.last
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self.run_once()
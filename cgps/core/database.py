@@ -1,53 +1,693 @@
+import os
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Iterable, List, Mapping, Optional
+from typing import Any, Callable, Iterable, Iterator, List, Mapping, Optional, Sequence, TypeVar
+
+from cgps.core.query_profiler import QueryProfiler, format_plan
+
+T = TypeVar("T")
+
+# Builds a row -> value function from the cursor's column names; called once per query.
+RowReaderFactory = Callable[[Sequence[str]], Callable[[Sequence[Any]], T]]
+
+
+# Applied in this order: busy_timeout first so the journal_mode switch waits on locks.
+PRAGMAS = (
+    "busy_timeout",
+    # only takes effect on a new file or at the next VACUUM (`cgps db vacuum`)
+    "auto_vacuum",
+    "journal_mode",
+    "synchronous",
+    "temp_store",
+    "cache_size",
+    "mmap_size",
+    "wal_autocheckpoint",
+)
+# The subset a read-only reader connection may set.
+READER_PRAGMAS = ("busy_timeout", "temp_store", "cache_size", "mmap_size")
+
+# file: db_path is the live database. memory_snapshot: the live database is
+# :memory:, loaded from db_path at startup and written back by save_snapshot().
+MODES = ("file", "memory_snapshot")
+
+CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+AUTO_VACUUM_MODES = ("NONE", "FULL", "INCREMENTAL")
+
+# backup progress: (status, remaining pages, total pages)
+BackupProgress = Callable[[int, int, int], None]
+
+
+@dataclass
+class _GroupCommit:
+    max_writes: int
+    max_delay: float
+    pending: int = 0
+    started: float = field(default_factory=time.monotonic)
+    # only this thread's transactions join the window
+    owner: int = field(default_factory=threading.get_ident)
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.started >= self.max_delay
+
+    def due(self) -> bool:
+        return self.pending >= self.max_writes or self.expired()
 
 
 class Database:
-    def __init__(self, db_path: str) -> None:
+    def __init__(
+        self,
+        db_path: str,
+        profile: Optional[str] = None,
+        pragmas: Optional[Mapping[str, Mapping[str, Any]]] = None,
+        readers: int = 0,
+        profiler: Optional[QueryProfiler] = None,
+        mode: str = "file",
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown database mode: {mode}")
         self._db_path = db_path
+        self._snapshot_path = db_path if mode == "memory_snapshot" else None
+        self._in_memory = db_path == ":memory:" or self._snapshot_path is not None
+        # None unless profiling is switched on, so the hot paths only pay a check
+        self._profiler = profiler if profiler is not None and profiler.enabled else None
+        self._pragmas = self._resolve_pragmas(profile, pragmas or {})
         self._conn = None
+        self._writer_lock = threading.RLock()
+        # one entry per open transaction level: a savepoint name, or None for BEGIN
+        self._frames: list[Optional[str]] = []
+        self._group: Optional[_GroupCommit] = None
+        # a private :memory: database is only visible to the connection that made it
+        self._max_readers = 0 if self._in_memory else (readers or 0)
+        self._readers: list[sqlite3.Connection] = []
+        self._idle_readers: queue.LifoQueue = queue.LifoQueue()
+        self._readers_lock = threading.Lock()
+        # per thread: pin (open transaction/group window) and snapshot connection
+        self._local = threading.local()
+        # separate connection so checkpoints never queue behind the writer lock
+        self._checkpointer: Optional[sqlite3.Connection] = None
+        self._checkpoint_lock = threading.Lock()
+        # ATTACHed databases: (version, {alias: path}), swapped whole so readers can
+        # take it without a lock; each connection catches up lazily outside a
+        # transaction (ATTACH/DETACH are refused inside one).
+        self._attach_state: tuple[int, dict[str, str]] = (0, {})
+        self._conn_attached: dict[int, tuple[int, dict[str, str]]] = {}
+
+    @staticmethod
+    def _resolve_pragmas(
+        profile: Optional[str], pragmas: Mapping[str, Mapping[str, Any]]
+    ) -> dict[str, Any]:
+        if profile is None:
+            return {}
+        if profile not in pragmas:
+            raise ValueError(f"Unknown database profile: {profile}")
+        settings = dict(pragmas[profile] or {})
+        for name, value in settings.items():
+            if name not in PRAGMAS:
+                raise ValueError(f"Unsupported pragma: {name}")
+            if not isinstance(value, int) and not str(value).isalnum():
+                raise ValueError(f"Invalid value for pragma {name}: {value}")
+        return settings
+
+    def _apply_pragmas(self, conn: sqlite3.Connection, names: Sequence[str]) -> None:
+        for name in names:
+            if name in self._pragmas:
+                conn.execute(f"PRAGMA {name} = {self._pragmas[name]}").close()
+
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        if readonly:
+            target, uri = f"{Path(self._db_path).resolve().as_uri()}?mode=ro", True
+        elif self._in_memory:
+            target, uri = ":memory:", False
+        else:
+            target, uri = self._db_path, False
+        conn = sqlite3.connect(
+            target,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            uri=uri,
+        )
+        conn.row_factory = sqlite3.Row
+        if self._snapshot_path is not None and not readonly:
+            self._load_snapshot(conn)
+        if readonly:
+            self._apply_pragmas(conn, READER_PRAGMAS)
+            conn.execute("PRAGMA query_only = ON").close()
+        else:
+            self._apply_pragmas(conn, PRAGMAS)
+        return conn
 
     def connection(self) -> sqlite3.Connection:
         if self._conn is None:
-            self._conn = sqlite3.connect(
-                self._db_path,
-                detect_types=sqlite3.PARSE_DECLTYPES,
-            )
-            self._conn.row_factory = sqlite3.Row
+            self._conn = self._connect()
         return self._conn
 
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        with self._writer_lock:
+            conn = self.connection()
+            self._sync_attached(conn, readonly=False)
+            yield conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        if self._max_readers == 0:
+            with self.writer() as conn:
+                yield conn
+            return
+        conn = self._lease_reader()
+        try:
+            self._sync_attached(conn, readonly=True)
+            yield conn
+        finally:
+            # an open read transaction would pin its WAL snapshot past the lease
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle_readers.put(conn)
+
+    def _lease_reader(self) -> sqlite3.Connection:
+        try:
+            return self._idle_readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._readers_lock:
+            if len(self._readers) < self._max_readers:
+                # mode=ro cannot create the file, so the writer does the first time
+                if not Path(self._db_path).exists():
+                    with self.writer():
+                        pass
+                conn = self._connect(readonly=True)
+                self._readers.append(conn)
+                return conn
+        # every reader is leased, possibly by open iterate() generators of this very
+        # thread, so waiting forever could deadlock
+        timeout = int(self._pragmas.get("busy_timeout", 5000)) / 1000
+        try:
+            return self._idle_readers.get(timeout=timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"No idle reader connection after {timeout:g}s ({self._max_readers} leased)"
+            ) from None
+
+    @property
+    def memory_snapshot(self) -> bool:
+        return self._snapshot_path is not None
+
+    def _load_snapshot(self, conn: sqlite3.Connection) -> None:
+        if not Path(self._snapshot_path).exists():
+            return
+        # a plain read-write open, so a -wal left by file mode is recovered first
+        src = sqlite3.connect(self._snapshot_path)
+        try:
+            src.backup(conn)
+        finally:
+            src.close()
+
+    def save_snapshot(self) -> bool:
+        # memory_snapshot mode: writes the committed in-memory database to db_path.
+        # The writer lock is held only for a memory-to-memory copy; the disk write
+        # goes to a temp file that then replaces the snapshot, so a crash leaves the
+        # previous snapshot intact. An open group-commit window is committed first.
+        if self._snapshot_path is None or self._conn is None:
+            return False
+        scratch = sqlite3.connect(":memory:")
+        try:
+            with self._writer_lock:
+                if self._frames:
+                    return False
+                conn = self.connection()
+                self._commit_group_window(conn)
+                conn.backup(scratch)
+            tmp = f"{self._snapshot_path}.tmp"
+            Path(tmp).unlink(missing_ok=True)
+            dest = sqlite3.connect(tmp)
+            try:
+                scratch.backup(dest)
+            finally:
+                dest.close()
+            # WAL files of an older on-disk database would be replayed over the new file
+            for suffix in ("-wal", "-shm"):
+                Path(f"{self._snapshot_path}{suffix}").unlink(missing_ok=True)
+            os.replace(tmp, self._snapshot_path)
+        finally:
+            scratch.close()
+        return True
+
     def close(self) -> None:
-        if self._conn is not None:
-            self._conn.close()
-            self._conn = None
-    
+        if self._profiler is not None:
+            self._profiler.save()
+        self.save_snapshot()
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers = []
+            self._idle_readers = queue.LifoQueue()
+            self._conn_attached = {}
+        with self._checkpoint_lock:
+            if self._checkpointer is not None:
+                self._checkpointer.close()
+                self._checkpointer = None
+        with self._writer_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def attach(self, alias: str, path: str) -> None:
+        # Registers `path` as schema `alias` on every connection. The writer attaches
+        # (and so creates the file) right away; readers attach it read-only on their
+        # next lease. Not allowed inside a transaction; an open group-commit window
+        # is committed first.
+        if not alias.isidentifier():
+            raise ValueError(f"Invalid database alias: {alias}")
+        with self._writer_lock:
+            version, attached = self._attach_state
+            self._attach_state = (version + 1, {**attached, alias: str(Path(path).resolve())})
+            self._sync_writer_now()
+
+    def detach(self, alias: str) -> None:
+        with self._writer_lock:
+            version, attached = self._attach_state
+            if alias not in attached:
+                return
+            attached = {a: p for a, p in attached.items() if a != alias}
+            self._attach_state = (version + 1, attached)
+            self._sync_writer_now()
+
+    def attached(self) -> dict[str, str]:
+        return dict(self._attach_state[1])
+
+    def _sync_writer_now(self) -> None:
+        if self._frames:
+            raise sqlite3.OperationalError("cannot ATTACH or DETACH inside a transaction")
+        conn = self.connection()
+        self._commit_group_window(conn)
+        self._sync_attached(conn, readonly=False)
+
+    def _commit_group_window(self, conn: sqlite3.Connection) -> None:
+        # only called with the writer lock held and no transaction frames open
+        if conn.in_transaction:
+            conn.commit()
+            if self._group is not None:
+                self._group.pending = 0
+
+    def _sync_attached(self, conn: sqlite3.Connection, readonly: bool) -> None:
+        version, wanted = self._attach_state
+        seen_version, current = self._conn_attached.get(id(conn), (0, {}))
+        if seen_version == version or conn.in_transaction:
+            return
+        current = dict(current)
+        for alias, path in list(current.items()):
+            if wanted.get(alias) != path:
+                conn.execute(f"DETACH DATABASE {alias}").close()
+                del current[alias]
+        for alias, path in wanted.items():
+            if alias not in current:
+                target = f"{Path(path).as_uri()}?mode=ro" if readonly else path
+                conn.execute(f"ATTACH DATABASE ? AS {alias}", (target,)).close()
+                current[alias] = path
+        self._conn_attached[id(conn)] = (version, current)
+
+    @contextmanager
+    def snapshot(self) -> Iterator[None]:
+        # Pins one reader for this thread and holds a read transaction on it, so every
+        # read in the block sees the same WAL snapshot while the writer carries on.
+        # Without WAL a held read lock would block the writer's commit, so reads are
+        # only routed to the pooled reader; with no readers this is a no-op.
+        if self._max_readers == 0 or getattr(self._local, "snapshot", None) is not None:
+            yield
+            return
+        with self.reader() as conn:
+            wal = conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            if wal:
+                conn.execute("BEGIN")
+                # the snapshot is taken at the first read, not at BEGIN
+                conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            self._local.snapshot = conn
+            try:
+                yield
+            finally:
+                self._local.snapshot = None
+                if wal:
+                    conn.rollback()
+
+    @contextmanager
+    def _pinned(self) -> Iterator[None]:
+        self._local.pins = getattr(self._local, "pins", 0) + 1
+        try:
+            yield
+        finally:
+            self._local.pins -= 1
+
+    @contextmanager
+    def _read_connection(self, schema: Optional[str] = None) -> Iterator[sqlite3.Connection]:
+        # Reads inside this thread's own transaction or group window must see its
+        # uncommitted writes, so they stay on the writer; everything else reads from
+        # the snapshot or a pooled read-only connection. A snapshot cannot ATTACH
+        # mid-transaction, so reads of a schema attached after it began use a reader.
+        if getattr(self._local, "pins", 0):
+            with self.writer() as conn:
+                yield conn
+            return
+        conn = getattr(self._local, "snapshot", None)
+        if conn is not None and (
+            schema is None or schema in self._conn_attached.get(id(conn), (0, {}))[1]
+        ):
+            yield conn
+            return
+        with self.reader() as conn:
+            yield conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._writer_lock, self._pinned():
+            conn = self._open()
+            try:
+                yield conn
+            except BaseException:
+                self._close(commit=False)
+                raise
+            self._close(commit=True)
+
+    @contextmanager
+    def group_commit(self, max_writes: int = 100, max_delay: float = 1.0) -> Iterator[None]:
+        # Outermost transactions of this thread inside the window become savepoints of
+        # one physical transaction, committed every max_writes logical commits, at the
+        # first transaction or logical commit after max_delay seconds, and when the
+        # window closes. Logical commits are not durable until that physical commit.
+        # Another thread's transaction first commits the window's pending work and
+        # then runs as a plain BEGIN/COMMIT, so its commit is real.
+        with self._writer_lock:
+            if self._group is None:
+                self._group = _GroupCommit(max_writes=max_writes, max_delay=max_delay)
+                owner = True
+            else:
+                owner = False
+                foreign = self._group.owner != threading.get_ident()
+        if not owner:
+            if foreign:
+                yield
+            else:
+                with self._pinned():
+                    yield
+            return
+        try:
+            with self._pinned():
+                yield
+        finally:
+            with self._writer_lock:
+                self._group = None
+                conn = self.connection()
+                if not self._frames and conn.in_transaction:
+                    conn.commit()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = self.connection()
+        group = self._group
+        if group is not None and not self._frames and conn.in_transaction:
+            # between the window's logical commits: flush it for another thread, or
+            # once max_delay has passed
+            if group.owner != threading.get_ident() or group.expired():
+                conn.commit()
+                group.pending = 0
+        if group is not None and group.owner != threading.get_ident():
+            group = None
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+            if group is None:
+                self._frames.append(None)
+                return conn
+            group.started = time.monotonic()
+        name = f"sp_{len(self._frames)}"
+        conn.execute(f"SAVEPOINT {name}")
+        self._frames.append(name)
+        return conn
+
+    def _close(self, commit: bool) -> None:
+        conn = self.connection()
+        name = self._frames.pop()
+        if name is None:
+            if commit:
+                conn.commit()
+            else:
+                conn.rollback()
+            return
+        if not commit:
+            conn.execute(f"ROLLBACK TO {name}")
+        conn.execute(f"RELEASE {name}")
+        if commit and not self._frames and self._group is not None:
+            self._group.pending += 1
+            if self._group.due():
+                conn.commit()
+                self._group.pending = 0
+
+    # begin()/commit()/rollback() are the manual form of transaction(); the writer
+    # lock is held in between so no other thread can slip into the transaction.
     def begin(self) -> None:
-        self.connection().execute("BEGIN")
+        self._writer_lock.acquire()
+        try:
+            self._open()
+        except BaseException:
+            self._writer_lock.release()
+            raise
+        self._local.pins = getattr(self._local, "pins", 0) + 1
 
     def commit(self) -> None:
-        self.connection().commit()
+        self._end(commit=True)
+
+    def rollback(self) -> None:
+        self._end(commit=False)
+
+    def _end(self, commit: bool) -> None:
+        with self._writer_lock:
+            if not self._frames:
+                conn = self.connection()
+                conn.commit() if commit else conn.rollback()
+                return
+            try:
+                self._close(commit=commit)
+            finally:
+                self._local.pins -= 1
+                self._writer_lock.release()
+
+    def _record(self, sql: str, params: Any, seconds: float, rows: int) -> None:
+        if self._profiler is not None:
+            self._profiler.record(sql, params, seconds, rows)
 
     def execute(self, sql: str, params: Mapping[str, Any]) -> int:
-        cur = self.connection().execute(sql, params)
-        rc = cur.lastrowid
-        cur.close()
+        with self.writer() as conn:
+            started = time.perf_counter()
+            cur = conn.execute(sql, params)
+            rc = cur.lastrowid
+            self._record(sql, params, time.perf_counter() - started, cur.rowcount)
+            cur.close()
         return rc
 
+    def executemany(self, sql: str, params: Iterable[Mapping[str, Any]]) -> range:
+        with self.writer() as conn:
+            started = time.perf_counter()
+            cur = conn.executemany(sql, params)
+            count = cur.rowcount
+            # a generator cannot be peeked after the fact; its shape is recorded as empty
+            shape = params[0] if isinstance(params, list) and params else ()
+            self._record(sql, shape, time.perf_counter() - started, count)
+            cur.close()
+            # executemany() leaves lastrowid untouched, but inside one transaction an
+            # AUTOINCREMENT table hands out a contiguous block ending at last_insert_rowid().
+            last = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return range(last - count + 1, last + 1)
+
     def fetchone(
         self, sql: str, params: Iterable[Any] = ()
     ) -> Optional[dict[str, Any]]:
-        cur = self.connection().execute(sql, tuple(params))
-        row = cur.fetchone()
-        cur.close()
+        params = tuple(params)
+        with self._read_connection() as conn:
+            started = time.perf_counter()
+            cur = conn.execute(sql, params)
+            row = cur.fetchone()
+            self._record(sql, params, time.perf_counter() - started, row is not None)
+            cur.close()
         return dict(row) if row is not None else None
 
     def fetchall(self, sql: str, params: Iterable[Any] = ()) -> List[dict[str, any]]:
-        cur = self.connection().execute(sql, params)
-        rows = [dict(r) for r in cur.fetchall()]
-        cur.close()
+        with self._read_connection() as conn:
+            started = time.perf_counter()
+            cur = conn.execute(sql, params)
+            rows = [dict(r) for r in cur.fetchall()]
+            self._record(sql, params, time.perf_counter() - started, len(rows))
+            cur.close()
         return rows
 
+    # Holds a reader lease until the generator is exhausted or closed.
+    def iterate(
+        self, sql: str, params: Iterable[Any] = (), chunk_size: int = 500
+    ) -> Iterator[dict[str, Any]]:
+        with self._read_connection() as conn:
+            # time spent by the consumer between chunks is not counted
+            started = time.perf_counter()
+            cur = conn.execute(sql, params)
+            elapsed, count = time.perf_counter() - started, 0
+            try:
+                while True:
+                    started = time.perf_counter()
+                    rows = cur.fetchmany(chunk_size)
+                    elapsed += time.perf_counter() - started
+                    if not rows:
+                        break
+                    count += len(rows)
+                    for r in rows:
+                        yield dict(r)
+            finally:
+                cur.close()
+                self._record(sql, params, elapsed, count)
+
+    def fetchall_as(
+        self, sql: str, params: Iterable[Any], make_reader: RowReaderFactory
+    ) -> List[T]:
+        with self._read_connection() as conn:
+            started = time.perf_counter()
+            cur = self._tuple_cursor(conn, sql, params)
+            read = make_reader([d[0] for d in cur.description])
+            out = [read(r) for r in cur.fetchall()]
+            self._record(sql, params, time.perf_counter() - started, len(out))
+            cur.close()
+        return out
+
+    def iterate_as(
+        self,
+        sql: str,
+        params: Iterable[Any],
+        make_reader: RowReaderFactory,
+        chunk_size: int = 500,
+        schema: Optional[str] = None,
+    ) -> Iterator[T]:
+        # schema: an ATTACHed database the query reads, see _read_connection
+        with self._read_connection(schema) as conn:
+            started = time.perf_counter()
+            cur = self._tuple_cursor(conn, sql, params)
+            elapsed, count = time.perf_counter() - started, 0
+            try:
+                read = make_reader([d[0] for d in cur.description])
+                while True:
+                    started = time.perf_counter()
+                    rows = cur.fetchmany(chunk_size)
+                    elapsed += time.perf_counter() - started
+                    if not rows:
+                        break
+                    count += len(rows)
+                    for r in rows:
+                        yield read(r)
+            finally:
+                cur.close()
+                self._record(sql, params, elapsed, count)
+
+    @staticmethod
+    def _tuple_cursor(
+        conn: sqlite3.Connection, sql: str, params: Iterable[Any]
+    ) -> sqlite3.Cursor:
+        cur = conn.cursor()
+        cur.row_factory = None
+        cur.execute(sql, params)
+        return cur
+
+    @contextmanager
+    def profiling(self, profiler: QueryProfiler) -> Iterator[QueryProfiler]:
+        # Routes this thread's and every other thread's queries to profiler for the
+        # duration; meant for one-shot tooling such as `cgps db advise`.
+        previous, self._profiler = self._profiler, profiler
+        try:
+            yield profiler
+        finally:
+            self._profiler = previous
+
+    def explain(self, sql: str, params: Any = ()) -> List[str]:
+        with self.reader() as conn:
+            cur = conn.cursor()
+            cur.row_factory = None
+            # EXPLAIN opens no read transaction, so it neither reloads a schema changed
+            # by another connection nor gets re-prepared from the statement cache: read
+            # sqlite_master first and key the statement text on the schema version.
+            cur.execute("SELECT count(*) FROM sqlite_master").fetchone()
+            version = cur.execute("PRAGMA schema_version").fetchone()[0]
+            rows = cur.execute(
+                f"EXPLAIN QUERY PLAN /* schema {version} */ {sql}", params
+            ).fetchall()
+            cur.close()
+        return format_plan(rows)
+
+    def backup(
+        self,
+        target: str,
+        pages: int = 256,
+        sleep: float = 0.0,
+        progress: Optional[BackupProgress] = None,
+    ) -> None:
+        # Copies `pages` pages per step from a reader while ingest carries on. The read
+        # transaction held on the source keeps every step on one snapshot; without it
+        # each commit by the writer would restart the copy from the first page.
+        dest = sqlite3.connect(target)
+        try:
+            with self.reader() as src:
+                if src is not self._conn and not src.in_transaction:
+                    src.execute("BEGIN")
+                    src.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+                src.backup(dest, pages=pages, progress=progress, sleep=sleep)
+        finally:
+            dest.close()
+
+    def auto_vacuum(self) -> str:
+        with self.writer() as conn:
+            mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        return AUTO_VACUUM_MODES[mode]
+
+    def vacuum(self) -> None:
+        # Rebuilds the file; also where a changed auto_vacuum setting takes effect.
+        with self.writer() as conn:
+            conn.execute("VACUUM").close()
+
+    def incremental_vacuum(self, pages: Optional[int] = None) -> int:
+        # Returns free pages handed back to the OS; a no-op unless auto_vacuum is
+        # INCREMENTAL. pages=None frees the whole freelist.
+        with self.writer() as conn:
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # execute() stops after the first step, which frees a single page;
+            # executescript() steps it to completion (committing any open group window)
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages or 0)});")
+            after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return before - after
+
+    def checkpoint(self, mode: str = "PASSIVE") -> tuple[int, int, int]:
+        # (busy, wal frames, frames checkpointed); (0, -1, -1) when not in WAL mode,
+        # or when nothing has opened the database yet (so this never creates it)
+        mode = mode.upper()
+        if mode not in CHECKPOINT_MODES:
+            raise ValueError(f"Unsupported checkpoint mode: {mode}")
+        if self._in_memory or not Path(self._db_path).exists():
+            return (0, -1, -1)
+        if self._conn is None and not self._readers:
+            return (0, -1, -1)
+        with self._checkpoint_lock:
+            if self._checkpointer is None:
+                self._checkpointer = self._connect()
+            row = self._checkpointer.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        return tuple(row)
+
+    def wal_size(self) -> int:
+        if self._in_memory:
+            return 0
+        wal = Path(f"{self._db_path}-wal")
+        return wal.stat().st_size if wal.exists() else 0
+
     def migrate_from_file(self, path: Path) -> None:
         sql_text = path.read_text(encoding="utf-8")
-        self.connection().executescript(sql_text)
+        with self.writer() as conn:
+            conn.executescript(sql_text)
+
+
+def stores_epoch(database: Database) -> bool:
+    # trackings.created_at is INTEGER epoch-ms after trackings_epoch.sql, else ISO text
+    columns = database.fetchall("PRAGMA main.table_info(trackings)")
+    return any(c["name"] == "created_at" and c["type"].upper() == "INTEGER" for c in columns)
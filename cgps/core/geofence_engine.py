@@ -0,0 +1,200 @@
+import json
+import math
+from array import array
+from collections import defaultdict
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+from cgps.core.database import Database
+from cgps.core.models.geofence import Geofence, GeofenceEvent
+from cgps.core.utils import EARTH_RADIUS_KM, distance_km
+
+# a fence spanning more grid cells than this is checked against every point
+_MAX_CELLS = 4096
+
+
+class _Fence:
+    __slots__ = ("id", "min_lat", "max_lat", "min_lng", "max_lng", "contains")
+
+    def __init__(self, geofence: Geofence):
+        self.id = geofence.id
+        if geofence.kind == "circle":
+            lat, lng, radius_km = geofence.center_lat, geofence.center_lng, geofence.radius_m / 1000
+            dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+            dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+            self.min_lat, self.max_lat = lat - dlat, lat + dlat
+            self.min_lng, self.max_lng = lng - dlng, lng + dlng
+            self.contains = lambda y, x: distance_km(lat, lng, y, x) <= radius_km
+        else:
+            lats = [p[0] for p in geofence.points]
+            lngs = [p[1] for p in geofence.points]
+            self.min_lat, self.max_lat = min(lats), max(lats)
+            self.min_lng, self.max_lng = min(lngs), max(lngs)
+            self.contains = _polygon(lats, lngs)
+
+
+def _polygon(lats: Sequence[float], lngs: Sequence[float]) -> Callable[[float, float], bool]:
+    # Even-odd ray casting along lng. Edges are flattened once into
+    # (lat0, lat1, lng0, dlng/dlat) arrays; horizontal edges never cross the ray.
+    lat0, lat1, lng0, slope = array("d"), array("d"), array("d"), array("d")
+    n = len(lats)
+    for i in range(n):
+        j = i - 1 if i else n - 1
+        if lats[i] == lats[j]:
+            continue
+        lat0.append(lats[i])
+        lat1.append(lats[j])
+        lng0.append(lngs[i])
+        slope.append((lngs[j] - lngs[i]) / (lats[j] - lats[i]))
+    edges = list(zip(lat0, lat1, lng0, slope))
+
+    def contains(lat: float, lng: float) -> bool:
+        inside = False
+        for y0, y1, x0, k in edges:
+            if (y0 > lat) != (y1 > lat) and lng < x0 + k * (lat - y0):
+                inside = not inside
+        return inside
+
+    return contains
+
+
+class GeofenceEngine:
+    """Enter/exit detection for ``geofences``, run by ``TrackingService.insert_batch``
+    inside its transaction.
+
+    Fences are compiled once into a uniform lat/lng grid of ``cell_deg`` cells, so a
+    point is only tested against the fences whose bounding box overlaps its cell,
+    then against their bounds, before the exact circle or polygon test. Which fences
+    each car is inside is kept in ``geofence_presence``; a change between two
+    consecutive samples of a car writes a ``geofence_events`` row. Samples without a
+    position leave the state unchanged. Fences are reloaded when ``geofences``
+    changes.
+    """
+
+    def __init__(self, database: Database, enabled: bool = True, cell_deg: float = 0.05):
+        self._database = database
+        self.enabled = bool(enabled)
+        self._cell = float(cell_deg)
+        self._signature: Optional[tuple] = None
+        self._fences: dict[int, _Fence] = {}
+        self._grid: dict[tuple[int, int], List[_Fence]] = {}
+        self._large: List[_Fence] = []
+
+    def _load(self) -> None:
+        row = self._database.fetchone(
+            "SELECT COUNT(*) AS n, MAX(id) AS last, MAX(updated_at) AS changed FROM geofences"
+        )
+        signature = (row["n"], row["last"], row["changed"])
+        if signature == self._signature:
+            return
+        fences = self._database.fetchall_as("SELECT * FROM geofences", (), Geofence.reader)
+        self._fences = {f.id: _Fence(f) for f in fences}
+        self._grid = defaultdict(list)
+        self._large = []
+        for fence in self._fences.values():
+            rows = range(self._key(fence.min_lat), self._key(fence.max_lat) + 1)
+            cols = range(self._key(fence.min_lng), self._key(fence.max_lng) + 1)
+            if len(rows) * len(cols) > _MAX_CELLS:
+                self._large.append(fence)
+                continue
+            for r in rows:
+                for c in cols:
+                    self._grid[(r, c)].append(fence)
+        self._signature = signature
+
+    def _key(self, degrees: float) -> int:
+        return math.floor(degrees / self._cell)
+
+    def containing(self, lat: float, lng: float) -> set[int]:
+        found = set()
+        cell = self._grid.get((self._key(lat), self._key(lng)), ())
+        for fence in (*cell, *self._large) if self._large else cell:
+            if (
+                fence.min_lat <= lat <= fence.max_lat
+                and fence.min_lng <= lng <= fence.max_lng
+                and fence.contains(lat, lng)
+            ):
+                found.add(fence.id)
+        return found
+
+    def evaluate(self, rows: Sequence[dict[str, Any]], ids: Sequence[int]) -> List[GeofenceEvent]:
+        # rows as insert_batch writes them, ids the trackings ids they got
+        self._load()
+        if not self._fences:
+            return []
+        samples = sorted(
+            (str(r["car_id"]), r["created_at"], new_id, r["latitude"], r["longitude"])
+            for r, new_id in zip(rows, ids)
+            if r.get("car_id") is not None
+        )
+        before = self._presence({s[0] for s in samples})
+        state = {car: dict(fences) for car, fences in before.items()}
+        events: List[dict[str, Any]] = []
+        for car, created_at, tracking_id, lat, lng in samples:
+            if lat is None or lng is None:
+                continue
+            inside = self.containing(lat, lng)
+            current = state.setdefault(car, {})
+            for fence_id in sorted(current.keys() - inside):
+                del current[fence_id]
+                events.append(_event(fence_id, car, tracking_id, "exit", created_at))
+            for fence_id in sorted(inside - current.keys()):
+                current[fence_id] = tracking_id
+                events.append(_event(fence_id, car, tracking_id, "enter", created_at))
+        if not events:
+            return []
+        self._save_presence(before, state)
+        new_ids = self._database.executemany(
+            "INSERT INTO geofence_events (geofence_id, car_id, tracking_id, event, created_at)"
+            " VALUES (:geofence_id, :car_id, :tracking_id, :event, :created_at)",
+            events,
+        )
+        return [GeofenceEvent(id=i, **e) for i, e in zip(new_ids, events)]
+
+    def _presence(self, cars: Iterable[str]) -> dict[str, dict[int, int]]:
+        # {car_id: {geofence_id: entering tracking id}} for fences that still exist
+        found: dict[str, dict[int, int]] = defaultdict(dict)
+        for r in self._database.fetchall(
+            "SELECT car_id, geofence_id, tracking_id FROM geofence_presence"
+            " WHERE car_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(sorted(cars)),),
+        ):
+            if r["geofence_id"] in self._fences:
+                found[r["car_id"]][r["geofence_id"]] = r["tracking_id"]
+        return found
+
+    def _save_presence(
+        self, before: dict[str, dict[int, int]], after: dict[str, dict[int, int]]
+    ) -> None:
+        left = [
+            {"car_id": car, "geofence_id": fence_id}
+            for car, fences in before.items()
+            for fence_id in fences.keys() - after.get(car, {}).keys()
+        ]
+        entered = [
+            {"car_id": car, "geofence_id": fence_id, "tracking_id": tracking_id}
+            for car, fences in after.items()
+            for fence_id, tracking_id in fences.items()
+            if before.get(car, {}).get(fence_id) != tracking_id
+        ]
+        if left:
+            self._database.executemany(
+                "DELETE FROM geofence_presence WHERE car_id = :car_id AND geofence_id = :geofence_id",
+                left,
+            )
+        if entered:
+            self._database.executemany(
+                "INSERT INTO geofence_presence (car_id, geofence_id, tracking_id)"
+                " VALUES (:car_id, :geofence_id, :tracking_id)"
+                " ON CONFLICT (car_id, geofence_id) DO UPDATE SET tracking_id = excluded.tracking_id",
+                entered,
+            )
+
+
+def _event(fence_id: int, car: str, tracking_id: int, event: str, created_at: Any) -> dict:
+    return {
+        "geofence_id": fence_id,
+        "car_id": car,
+        "tracking_id": tracking_id,
+        "event": event,
+        "created_at": created_at,
+    }
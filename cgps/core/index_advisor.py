@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+
+from cgps.core.database import Database
+from cgps.core.query_profiler import QueryProfiler, null_params
+from cgps.core.services.car_service import CarService
+from cgps.core.services.customer_service import CustomerService
+from cgps.core.services.gps_service import GpsService
+from cgps.core.services.order_service import OrderService
+from cgps.core.services.tracking_service import TrackingService
+
+
+@dataclass
+class QueryAdvice:
+    label: str
+    sql: str
+    plan: List[str]
+
+    @property
+    def scans(self) -> List[str]:
+        # "SCAN x USING ... INDEX" reads an index in order; a bare SCAN reads the table
+        return [
+            line.strip()
+            for line in self.plan
+            if line.lstrip().startswith("SCAN ") and "INDEX" not in line
+        ]
+
+
+def _workload(database: Database) -> List[Tuple[str, Callable[[], object]]]:
+    now = datetime.now()
+    cars = CarService(database)
+    orders = OrderService(database)
+    trackings = TrackingService(database)
+    gps = GpsService(database)
+    customers = CustomerService(database)
+    start, end = now, now + timedelta(days=3)
+    return [
+        ("CarService.list_available", lambda: cars.list_available(start, end)),
+        ("OrderService.list", lambda: orders.list()),
+        ("OrderService.list(customer_id)", lambda: orders.list(customer_id=1)),
+        ("TrackingService.list_with_car", lambda: trackings.list_with_car(limit=100)),
+        (
+            "TrackingService.list_with_car(car_id)",
+            lambda: trackings.list_with_car(car_id=1, limit=100),
+        ),
+        (
+            "TrackingService.load_batch(car_id)",
+            lambda: trackings.load_batch(car_id=1, limit=100),
+        ),
+        (
+            "TrackingService.list_range(car_id)",
+            lambda: trackings.list_range(car_id=1, since=now - timedelta(days=1), until=now),
+        ),
+        (
+            "TrackingService.list_range",
+            lambda: trackings.list_range(since=now - timedelta(days=1), until=now),
+        ),
+        (
+            "TrackingService.within_bbox",
+            lambda: trackings.within_bbox(
+                -90, -180, 90, 180, since=now - timedelta(days=1), until=now
+            ),
+        ),
+        ("GpsService.get_available", lambda: gps.get_available(None)),
+        ("CustomerService.search_users", lambda: customers.search_users("AC", None, None)),
+    ]
+
+
+class IndexAdvisor:
+    """Runs the read paths of the services against the database, capturing the
+    statements they issue, and replays each through ``EXPLAIN QUERY PLAN``."""
+
+    def __init__(self, database: Database):
+        self._database = database
+
+    def replay(self) -> List[QueryAdvice]:
+        advice = []
+        for label, call in _workload(self._database):
+            with self._database.profiling(QueryProfiler(path=None, enabled=True)) as p:
+                call()
+            for stats in p.statements():
+                plan = self._database.explain(stats.sql, null_params(stats.params))
+                advice.append(QueryAdvice(label=label, sql=stats.sql, plan=plan))
+        return advice
+
+    def analyze(self) -> None:
+        with self._database.transaction() as conn:
+            conn.execute("ANALYZE")
@@ -0,0 +1,214 @@
+import re
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime
+from importlib.resources import files
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from cgps.core.database import Database
+from cgps.core.utils import ISO_DT
+
+_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+_SECTION = re.compile(r"^--\s*migrate:(up|online|down)\s*$", re.MULTILINE)
+# online statements of these kinds are repeated until they stop changing rows
+_BATCHED = ("UPDATE", "DELETE", "INSERT")
+
+APPLIED = "applied"
+ONLINE = "online"
+PENDING = "pending"
+
+Progress = Callable[[str], None]
+
+
+def _quiet(_: str) -> None:
+    pass
+
+
+def split_statements(sql: str) -> List[str]:
+    statements, buf = [], []
+    for line in sql.splitlines(keepends=True):
+        buf.append(line)
+        text = "".join(buf)
+        if sqlite3.complete_statement(text):
+            stmt = _strip_comments(text)
+            if stmt:
+                statements.append(stmt)
+            buf = []
+    rest = _strip_comments("".join(buf))
+    if rest:
+        raise ValueError(f"Incomplete SQL statement: {rest[:60]}")
+    return statements
+
+
+def _strip_comments(sql: str) -> str:
+    lines = [line for line in sql.splitlines() if not line.lstrip().startswith("--")]
+    return "\n".join(lines).strip()
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    up: List[str] = field(default_factory=list)
+    online: List[str] = field(default_factory=list)
+    down: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_file(cls, path: Path) -> "Migration":
+        match = _FILE.match(path.name)
+        if match is None:
+            raise ValueError(f"Invalid migration file name: {path.name}")
+        text = path.read_text(encoding="utf-8")
+        parts = _SECTION.split(text)
+        sections = dict(zip(parts[1::2], parts[2::2]))
+        if "up" not in sections:
+            raise ValueError(f"Migration {path.name} has no '-- migrate:up' section")
+        return cls(
+            version=int(match.group(1)),
+            name=match.group(2),
+            up=split_statements(sections["up"]),
+            online=split_statements(sections.get("online", "")),
+            down=split_statements(sections.get("down", "")),
+        )
+
+
+@dataclass
+class MigrationStatus:
+    version: int
+    name: str
+    state: str
+    applied_at: Optional[str] = None
+
+
+class Migrator:
+    """Versioned schema migrations from ``cgps/migrations/NNNN_name.sql``.
+
+    Each file has up to three sections:
+
+    ``-- migrate:up``
+        applied in one transaction together with its ``schema_version`` row.
+    ``-- migrate:online``
+        run after ``up`` commits, one transaction per statement so the writer
+        lock is released in between. UPDATE/DELETE/INSERT statements are
+        repeated until they change no rows, so a backfill written as
+        ``... WHERE id IN (SELECT id ... WHERE <not done> LIMIT 1000)`` runs in
+        batches. The version stays ``online`` until every step finishes and is
+        resumed by the next ``migrate()``, so steps must be idempotent
+        (``CREATE INDEX IF NOT EXISTS``, a "not done yet" predicate).
+    ``-- migrate:down``
+        reverts ``up`` in one transaction for ``rollback()``.
+    """
+
+    def __init__(self, database: Database, directory: Optional[Path] = None):
+        self._database = database
+        self._directory = Path(directory or files("cgps") / "migrations")
+
+    def migrations(self) -> List[Migration]:
+        found = [
+            Migration.from_file(p)
+            for p in sorted(self._directory.glob("*.sql"))
+            if _FILE.match(p.name)
+        ]
+        versions = [m.version for m in found]
+        if len(set(versions)) != len(versions):
+            raise ValueError("Duplicate migration version")
+        return sorted(found, key=lambda m: m.version)
+
+    def _ensure_table(self) -> None:
+        with self._database.transaction() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_version (
+                  version    INTEGER PRIMARY KEY,
+                  name       TEXT NOT NULL,
+                  state      TEXT NOT NULL,
+                  applied_at TEXT
+                )
+                """
+            )
+
+    def _recorded(self) -> dict[int, MigrationStatus]:
+        self._ensure_table()
+        rows = self._database.fetchall(
+            "SELECT version, name, state, applied_at FROM schema_version"
+        )
+        return {r["version"]: MigrationStatus(**r) for r in rows}
+
+    def status(self) -> List[MigrationStatus]:
+        recorded = self._recorded()
+        out = [
+            recorded.pop(m.version, None) or MigrationStatus(m.version, m.name, PENDING)
+            for m in self.migrations()
+        ]
+        # versions in the database whose files are gone still show up
+        return sorted(out + list(recorded.values()), key=lambda s: s.version)
+
+    def current_version(self) -> int:
+        recorded = self._recorded()
+        return max(recorded, default=0)
+
+    def migrate(
+        self, target: Optional[int] = None, progress: Progress = _quiet
+    ) -> List[int]:
+        recorded = self._recorded()
+        done = []
+        for m in self.migrations():
+            if target is not None and m.version > target:
+                break
+            state = recorded.get(m.version)
+            if state is not None and state.state == APPLIED:
+                continue
+            if state is None:
+                progress(f"Applying {m.version:04d}_{m.name}")
+                self._apply_up(m)
+            if m.online:
+                self._apply_online(m, progress)
+            done.append(m.version)
+        return done
+
+    def _apply_up(self, m: Migration) -> None:
+        with self._database.transaction() as conn:
+            for stmt in m.up:
+                conn.execute(stmt)
+            conn.execute(
+                "INSERT INTO schema_version (version, name, state, applied_at)"
+                " VALUES (?, ?, ?, ?)",
+                (
+                    m.version,
+                    m.name,
+                    ONLINE if m.online else APPLIED,
+                    datetime.now().strftime(ISO_DT),
+                ),
+            )
+
+    def _apply_online(self, m: Migration, progress: Progress) -> None:
+        for i, stmt in enumerate(m.online, start=1):
+            progress(f"  online step {i}/{len(m.online)} of {m.version:04d}_{m.name}")
+            batched = stmt.lstrip().upper().startswith(_BATCHED)
+            while True:
+                with self._database.transaction() as conn:
+                    changed = conn.execute(stmt).rowcount
+                if not batched or changed <= 0:
+                    break
+        with self._database.transaction() as conn:
+            conn.execute(
+                "UPDATE schema_version SET state = ? WHERE version = ?",
+                (APPLIED, m.version),
+            )
+
+    def rollback(self, steps: int = 1, progress: Progress = _quiet) -> List[int]:
+        recorded = self._recorded()
+        by_version = {m.version: m for m in self.migrations()}
+        undone = []
+        for version in sorted(recorded, reverse=True)[:steps]:
+            m = by_version.get(version)
+            if m is None:
+                raise ValueError(f"Migration file for version {version} not found")
+            progress(f"Reverting {m.version:04d}_{m.name}")
+            with self._database.transaction() as conn:
+                for stmt in m.down:
+                    conn.execute(stmt)
+                conn.execute("DELETE FROM schema_version WHERE version = ?", (version,))
+            undone.append(version)
+        return undone
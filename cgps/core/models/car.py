@@ -9,7 +9,7 @@ from cgps.core.models.tracking_device import TrackingDevice
 from cgps.core.utils import to_bool, to_date, to_decimal, to_dt
 
 
-@dataclass
+@dataclass(slots=True)
 class Car(DBModel):
     id: int
     plate_license: Optional[str] = None
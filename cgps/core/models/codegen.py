@@ -0,0 +1,132 @@
+"""Per-class generated row mapping for DBModel.
+
+Like the ``__init__`` that dataclasses writes for each class, these build one
+straight-line function per model (and per cursor layout for tuple readers)
+with the ``_converters`` and the value encoders inlined, so the hot paths no
+longer walk ``dataclasses.fields()`` or run ``isinstance`` chains per row.
+"""
+
+from __future__ import annotations
+
+import typing
+from dataclasses import fields
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, Union
+
+from cgps.core.utils import format_dt
+
+
+def encode_value(v: Any) -> Any:
+    if v is None:
+        return None
+    if isinstance(v, bool):
+        return 1 if v else 0
+    if isinstance(v, datetime):
+        return format_dt(v)
+    if isinstance(v, date):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return str(v)
+    return v
+
+
+# Exact-type fast path per declared field type; anything else (a subclass, a
+# value of an unexpected type, nested models) falls back to encode_value().
+_ENCODERS = {
+    bool: "(1 if _v else 0)",
+    datetime: "_fmt(_v)",
+    date: "_v.isoformat()",
+    Decimal: "str(_v)",
+    str: "_v",
+    int: "_v",
+    float: "_v",
+}
+
+
+def _field_names(cls: type) -> list[str]:
+    return [f.name for f in fields(cls) if not f.name.startswith("_")]
+
+
+def _declared_types(cls: type) -> Dict[str, Any]:
+    try:
+        hints = typing.get_type_hints(cls)
+    except Exception:
+        return {}
+    out = {}
+    for name, tp in hints.items():
+        if typing.get_origin(tp) is Union:
+            args = [a for a in typing.get_args(tp) if a is not type(None)]
+            tp = args[0] if len(args) == 1 else None
+        out[name] = tp
+    return out
+
+
+def _compile(name: str, src: str, namespace: Dict[str, Any]) -> Callable:
+    exec(compile(src, f"<cgps {name}>", "exec"), namespace)
+    return namespace[name]
+
+
+def _convert_expr(name: str, value: str, conv: Dict[str, Any], ns: Dict[str, Any]) -> str:
+    if name not in conv:
+        return value
+    ns[f"_c_{name}"] = conv[name]
+    return f"(None if (_v := {value}) is None else _c_{name}(_v))"
+
+
+def make_from_row(cls: type) -> Callable[[Dict[str, Any]], Any]:
+    conv = getattr(cls, "_converters", {}) or {}
+    ns: Dict[str, Any] = {"_cls": cls}
+    args = [
+        f"        {n}={_convert_expr(n, f'get({n!r})', conv, ns)},"
+        for n in _field_names(cls)
+    ]
+    src = "\n".join(
+        ["def from_row(row):", "    get = row.get", "    return _cls(", *args, "    )"]
+    )
+    return _compile("from_row", src, ns)
+
+
+def make_reader(
+    cls: type, columns: Tuple[str, ...], prefix: str
+) -> Callable[[Sequence[Any]], Any]:
+    positions: Dict[str, int] = {}
+    for i, c in enumerate(columns):
+        if c.startswith(prefix):
+            # like dict(row): a repeated column name keeps its last position
+            positions[c[len(prefix) :]] = i
+    conv = getattr(cls, "_converters", {}) or {}
+    ns: Dict[str, Any] = {"_cls": cls}
+    args = []
+    for n in _field_names(cls):
+        i: Optional[int] = positions.get(n)
+        value = "None" if i is None else _convert_expr(n, f"row[{i}]", conv, ns)
+        args.append(f"        {n}={value},")
+    src = "\n".join(["def read(row):", "    return _cls(", *args, "    )"])
+    return _compile("read", src, ns)
+
+
+def make_to_db(
+    cls: type, keys: Optional[Tuple[str, ...]] = None
+) -> Callable[[Any], Dict[str, Any]]:
+    names = _field_names(cls)
+    types = _declared_types(cls)
+    ns: Dict[str, Any] = {"_fmt": format_dt, "_enc": encode_value}
+    items = []
+    for n in names if keys is None else keys:
+        if n not in names:
+            # like only_keys(): a requested key the model lacks comes out as None
+            items.append(f"        {n!r}: None,")
+            continue
+        tp = types.get(n)
+        fast = _ENCODERS.get(tp)
+        if fast is None:
+            items.append(f"        {n!r}: _enc(self.{n}),")
+            continue
+        ns[f"_t_{n}"] = tp
+        items.append(
+            f"        {n!r}: (None if (_v := self.{n}) is None"
+            f" else {fast} if _v.__class__ is _t_{n} else _enc(_v)),"
+        )
+    src = "\n".join(["def to_db(self):", "    return {", *items, "    }"])
+    return _compile("to_db", src, ns)
@@ -1,47 +1,50 @@
 from __future__ import annotations
-from dataclasses import dataclass, fields
-from datetime import date, datetime
-from decimal import Decimal
-from typing import ClassVar, Dict, Any
+from dataclasses import dataclass
+from typing import Any, Callable, ClassVar, Dict, Sequence, Tuple
 
-from cgps.core.utils import ISO_DT
+from cgps.core.models import codegen
 
 @dataclass
 class DBModel:
     """Base for SQLite rows."""
 
+    # empty so that subclasses declared with @dataclass(slots=True) carry no __dict__
+    __slots__ = ()
+
     _converters: ClassVar[Dict[str, Any]] = {}
 
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        # generated methods are installed per class; a subclass starts generic again
+        cls.from_row = DBModel.__dict__["from_row"]
+        cls.to_db = DBModel.__dict__["to_db"]
+
     @classmethod
     def from_row(cls, row: Dict[str, Any]) -> "DBModel":
-        conv = getattr(cls, "_converters", {}) or {}
-        kw = {}
-        for f in fields(cls):
-            if f.name.startswith("_"):
-                continue
-            v = row.get(f.name)
-            if v is not None and f.name in conv:
-                v = conv[f.name](v)
-            kw[f.name] = v
-        return cls(**kw)
+        from_row = codegen.make_from_row(cls)
+        cls.from_row = staticmethod(from_row)
+        return from_row(row)
+
+    @classmethod
+    def reader(
+        cls, columns: Sequence[str], prefix: str = ""
+    ) -> Callable[[Sequence[Any]], "DBModel"]:
+        """Row-tuple -> model function for one cursor description.
+
+        Columns are matched to fields once; ``prefix`` selects a joined model's
+        aliased columns (e.g. ``car__``). Readers are cached per column layout.
+        """
+        key = (cls, tuple(columns), prefix)
+        read = _READERS.get(key)
+        if read is None:
+            read = _READERS[key] = codegen.make_reader(cls, key[1], prefix)
+        return read
 
     def to_db(self) -> Dict[str, Any]:
-        out: Dict[str, Any] = {}
-        for f in fields(self):
-            if f.name.startswith("_"):
-                continue
-            v = getattr(self, f.name)
-            if v is None:
-                out[f.name] = None
-                continue
-            if isinstance(v, bool):
-                out[f.name] = 1 if v else 0
-            elif isinstance(v, datetime):
-                out[f.name] = v.strftime(ISO_DT)
-            elif isinstance(v, date):
-                out[f.name] = v.isoformat()
-            elif isinstance(v, Decimal):
-                out[f.name] = str(v)
-            else:
-                out[f.name] = v
-        return out
+        cls = type(self)
+        to_db = codegen.make_to_db(cls)
+        cls.to_db = to_db
+        return to_db(self)
+
+
+_READERS: Dict[Tuple[type, Tuple[str, ...], str], Callable[[Sequence[Any]], DBModel]] = {}
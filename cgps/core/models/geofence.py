@@ -0,0 +1,48 @@
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from cgps.core.models.db_model import DBModel
+from cgps.core.utils import to_dt
+
+
+def to_points(v) -> Optional[list[tuple[float, float]]]:
+    if v is None:
+        return None
+    if isinstance(v, str):
+        v = json.loads(v)
+    return [(float(lat), float(lng)) for lat, lng in v]
+
+
+@dataclass
+class Geofence(DBModel):
+    id: int
+    name: Optional[str] = None
+    # "polygon" (points) or "circle" (center_lat, center_lng, radius_m)
+    kind: Optional[str] = None
+    points: Optional[list[tuple[float, float]]] = None
+    center_lat: Optional[float] = None
+    center_lng: Optional[float] = None
+    radius_m: Optional[float] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    _converters = {
+        "points": to_points,
+        "created_at": to_dt,
+        "updated_at": to_dt,
+    }
+
+
+@dataclass
+class GeofenceEvent(DBModel):
+    id: int
+    geofence_id: Optional[int] = None
+    car_id: Optional[int] = None
+    tracking_id: Optional[int] = None
+    # "enter" or "exit"
+    event: Optional[str] = None
+    created_at: Optional[datetime] = None
+    _converters = {
+        "created_at": to_dt,
+    }
@@ -6,7 +6,7 @@ from cgps.core.models.db_model import DBModel
 from cgps.core.utils import to_bool, to_dt
 
 
-@dataclass
+@dataclass(slots=True)
 class Tracking(DBModel):
     id: int
     latitude: Optional[float] = None
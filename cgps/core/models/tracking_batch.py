@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from array import array
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from cgps.core.models.tracking import Tracking
+from cgps.core.timestamp_codec import from_epoch_ms, to_epoch_ms
+from cgps.core.utils import to_dt
+
+# Column-wise storage: floats use NaN for NULL, integers use _NULL_INT.
+FLOAT_COLUMNS = (
+    "latitude",
+    "longitude",
+    "fuel_level",
+    "fuel_litre",
+    "fuel_kwh",
+    "speed_kmh",
+    "gps_signal_level",
+    "gsm_signal_level",
+)
+INT_COLUMNS = ("id", "car_id", "tracking_device_id")
+# epoch milliseconds, see cgps.core.timestamp_codec
+TIME_COLUMNS = ("created_at", "updated_at")
+
+_NULL_INT = -(2**63)
+
+
+def _to_float(v) -> float:
+    return float("nan") if v is None else float(v)
+
+
+def _from_float(v: float) -> Optional[float]:
+    return None if v != v else v
+
+
+def _to_int(v) -> int:
+    return _NULL_INT if v is None else int(v)
+
+
+def _from_int(v: int) -> Optional[int]:
+    return None if v == _NULL_INT else v
+
+
+def _to_ms(v) -> int:
+    dt = to_dt(v)
+    return _NULL_INT if dt is None else to_epoch_ms(dt)
+
+
+def _from_ms(v: int) -> Optional[datetime]:
+    return None if v == _NULL_INT else from_epoch_ms(v)
+
+
+class TrackingBatch:
+    """Array-backed tracking points, roughly 100 bytes each instead of a
+    ``Tracking`` object plus its boxed floats and datetimes.
+
+    Columns are exposed as ``array`` attributes for analytics; indexing or
+    iterating materialises ``Tracking`` objects on demand. ``car_id`` and
+    ``tracking_device_id`` come back as ``int``.
+    """
+
+    def __init__(self) -> None:
+        for name in FLOAT_COLUMNS:
+            setattr(self, name, array("d"))
+        for name in INT_COLUMNS + TIME_COLUMNS:
+            setattr(self, name, array("q"))
+        # -1 = NULL, 0 = off, 1 = on
+        self.engine_status = array("b")
+
+    @classmethod
+    def from_trackings(cls, trackings: Iterable[Tracking]) -> "TrackingBatch":
+        batch = cls()
+        batch.extend(trackings)
+        return batch
+
+    def append(self, t: Tracking) -> None:
+        for name in FLOAT_COLUMNS:
+            getattr(self, name).append(_to_float(getattr(t, name)))
+        for name in INT_COLUMNS:
+            getattr(self, name).append(_to_int(getattr(t, name)))
+        for name in TIME_COLUMNS:
+            getattr(self, name).append(_to_ms(getattr(t, name)))
+        status = t.engine_status
+        self.engine_status.append(-1 if status is None else int(bool(status)))
+
+    def extend(self, trackings: Iterable[Tracking]) -> None:
+        for t in trackings:
+            self.append(t)
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def __getitem__(self, i: int) -> Tracking:
+        status = self.engine_status[i]
+        kw = {name: _from_float(getattr(self, name)[i]) for name in FLOAT_COLUMNS}
+        kw.update({name: _from_int(getattr(self, name)[i]) for name in INT_COLUMNS})
+        kw.update({name: _from_ms(getattr(self, name)[i]) for name in TIME_COLUMNS})
+        return Tracking(engine_status=None if status < 0 else bool(status), **kw)
+
+    def __iter__(self) -> Iterator[Tracking]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def nbytes(self) -> int:
+        columns = FLOAT_COLUMNS + INT_COLUMNS + TIME_COLUMNS + ("engine_status",)
+        return sum(
+            getattr(self, name).itemsize * len(getattr(self, name)) for name in columns
+        )
@@ -0,0 +1,30 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from cgps.core.models.db_model import DBModel
+from cgps.core.utils import to_dt
+
+
+@dataclass
+class Trip(DBModel):
+    id: int
+    car_id: Optional[int] = None
+    start_tracking_id: Optional[int] = None
+    end_tracking_id: Optional[int] = None
+    started_at: Optional[datetime] = None
+    ended_at: Optional[datetime] = None
+    start_lat: Optional[float] = None
+    start_lng: Optional[float] = None
+    end_lat: Optional[float] = None
+    end_lng: Optional[float] = None
+    distance_km: Optional[float] = None
+    duration_sec: Optional[float] = None
+    max_speed_kmh: Optional[float] = None
+    fuel_used: Optional[float] = None
+    fuel_used_litre: Optional[float] = None
+    fuel_used_kwh: Optional[float] = None
+    _converters = {
+        "started_at": to_dt,
+        "ended_at": to_dt,
+    }
@@ -0,0 +1,145 @@
+import json
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Union
+
+# Latencies kept per statement for the p95; older samples fall off the window.
+SAMPLES = 512
+
+
+def normalize_sql(sql: str) -> str:
+    # whole-line "--" comments go first, or joining the lines would comment out the rest
+    lines = (line for line in sql.splitlines() if not line.lstrip().startswith("--"))
+    return " ".join(" ".join(lines).split())
+
+
+def param_shape(params: Any) -> Union[int, List[str]]:
+    # Only the shape of the parameters is kept (never the values, which include
+    # password hashes) so EXPLAIN QUERY PLAN can be replayed with NULLs later.
+    if params is None:
+        return 0
+    if hasattr(params, "keys"):
+        return sorted(params.keys())
+    return len(params) if hasattr(params, "__len__") else 0
+
+
+@dataclass
+class StatementStats:
+    sql: str
+    params: Union[int, List[str]] = 0
+    calls: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    rows: int = 0
+    samples: deque = field(default_factory=lambda: deque(maxlen=SAMPLES))
+
+    @property
+    def p95_ms(self) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "sql": self.sql,
+            "params": self.params,
+            "calls": self.calls,
+            "total_ms": self.total_ms,
+            "max_ms": self.max_ms,
+            "rows": self.rows,
+            "samples": list(self.samples),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "StatementStats":
+        stats = cls(
+            sql=data["sql"],
+            params=data.get("params", 0),
+            calls=data.get("calls", 0),
+            total_ms=data.get("total_ms", 0.0),
+            max_ms=data.get("max_ms", 0.0),
+            rows=data.get("rows", 0),
+        )
+        stats.samples.extend(data.get("samples", ()))
+        return stats
+
+
+class QueryProfiler:
+    """Per-statement call counts, latency and row counts for ``Database``.
+
+    Stats are keyed by the whitespace-normalised SQL text and accumulate across
+    runs in a JSON file: loaded when the profiler is created, written back by
+    ``save()`` (``Database.close()`` calls it).
+    """
+
+    def __init__(
+        self, path: Optional[str] = "cgps-profile.json", enabled: bool = False
+    ) -> None:
+        # path=None keeps the stats in memory only
+        self.enabled = bool(enabled)
+        self._path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._stats: dict[str, StatementStats] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if self._path is None or not self._path.exists():
+            return
+        try:
+            data = json.loads(self._path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        for item in data.get("statements", []):
+            stats = StatementStats.from_dict(item)
+            self._stats[stats.sql] = stats
+
+    def record(self, sql: str, params: Any, seconds: float, rows: int) -> None:
+        key = normalize_sql(sql)
+        ms = seconds * 1000
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StatementStats(sql=key, params=param_shape(params))
+            stats.calls += 1
+            stats.total_ms += ms
+            stats.max_ms = max(stats.max_ms, ms)
+            stats.rows += max(rows, 0)
+            stats.samples.append(ms)
+
+    def statements(self, order_by: str = "total_ms") -> List[StatementStats]:
+        with self._lock:
+            items = list(self._stats.values())
+        return sorted(items, key=lambda s: getattr(s, order_by), reverse=True)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+        if self._path is not None:
+            self._path.unlink(missing_ok=True)
+
+    def save(self) -> None:
+        if not self.enabled or self._path is None:
+            return
+        with self._lock:
+            data = {"statements": [s.to_dict() for s in self._stats.values()]}
+        self._path.write_text(json.dumps(data), encoding="utf-8")
+
+
+def null_params(shape: Union[int, List[str]]) -> Union[tuple, dict[str, None]]:
+    if isinstance(shape, int):
+        return (None,) * shape
+    return dict.fromkeys(shape)
+
+
+def format_plan(rows: Iterable[tuple]) -> List[str]:
+    # EXPLAIN QUERY PLAN rows are (id, parent, notused, detail); indent by depth.
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
@@ -1,13 +1,63 @@
 from datetime import datetime
 from math import ceil
+from cgps.core import statements
 from cgps.core.database import Database
 from cgps.core.models.car import Car
 from cgps.core.utils import (
     ISO_DT,
-    only_keys,
     to_days,
-    to_insert_column,
-    to_update_column,
+)
+
+
+_INSERT_CARS = statements.insert(
+    Car,
+    "cars",
+    (
+        "plate_license",
+        "engine_number",
+        "fuel_type",
+        "make",
+        "model",
+        "year",
+        "color",
+        "type",
+        "seat",
+        "factory_date",
+        "weekday_rate",
+        "weekend_rate",
+        "available",
+        "tracking_device_id",
+        "created_at",
+        "updated_at",
+        "mileage",
+        "minimum_rent",
+        "maximum_rent",
+    ),
+)
+_UPDATE_CARS = statements.update(
+    Car,
+    "cars",
+    (
+        "id",
+        "plate_license",
+        "engine_number",
+        "fuel_type",
+        "make",
+        "model",
+        "year",
+        "color",
+        "type",
+        "seat",
+        "factory_date",
+        "weekday_rate",
+        "weekend_rate",
+        "available",
+        "tracking_device_id",
+        "updated_at",
+        "mileage",
+        "minimum_rent",
+        "maximum_rent",
+    ),
 )
 
 
@@ -17,96 +67,44 @@ class CarService:
 
     def list_available(self, started_at: datetime, ended_at: datetime):
         days = to_days(started_at, ended_at)
-        cars_data = self._database.fetchall(
+        # orders.car_id is TEXT: compare as text so idx_orders_car_period applies
+        return self._database.fetchall_as(
             """
             SELECT *
-            FROM cars
+            FROM cars c
             WHERE available = 1
-            AND id NOT IN (
-                SELECT car_id
-                FROM orders
-                WHERE ended_at > :started_at
-                AND started_at < :ended_at
-                AND rejected_at IS NULL
+            AND NOT EXISTS (
+                SELECT 1
+                FROM orders o
+                WHERE o.car_id = CAST(c.id AS TEXT)
+                AND o.started_at < :ended_at
+                AND o.ended_at > :started_at
+                AND o.rejected_at IS NULL
             )
             AND minimum_rent <= :days
             AND maximum_rent >= :days
             ORDER BY weekday_rate ASC;
             """,
             {"started_at": started_at, "ended_at": ended_at, "days": days},
+            Car.reader,
         )
-        return [Car.from_row(d) for d in cars_data]
 
     def all(self) -> list[Car]:
-        data = self._database.fetchall("SELECT * FROM cars")
-        return [Car.from_row(d) for d in data]
+        return self._database.fetchall_as("SELECT * FROM cars", (), Car.reader)
 
     def register(self, car: Car):
         now = datetime.now().strftime(ISO_DT)
 
-        car_data = car.to_db()
-        car_data = only_keys(
-            car_data,
-            [
-                "plate_license",
-                "engine_number",
-                "fuel_type",
-                "make",
-                "model",
-                "year",
-                "color",
-                "type",
-                "seat",
-                "factory_date",
-                "weekday_rate",
-                "weekend_rate",
-                "available",
-                "tracking_device_id",
-                "created_at",
-                "updated_at",
-                "mileage",
-                "minimum_rent",
-                "maximum_rent",
-            ],
-        )
+        car_data = _INSERT_CARS.params(car)
         car_data.update(created_at=now, updated_at=now)
-        car_sql = f"INSERT INTO cars {to_insert_column(car_data)}"
-        self._database.begin()
-        self._database.execute(car_sql, car_data)
-        self._database.commit()
+        with self._database.transaction():
+            self._database.execute(_INSERT_CARS.sql, car_data)
         return True
 
     def update(self, car: Car):
         now = datetime.now().strftime(ISO_DT)
-        car_data = car.to_db()
-        print(car_data)
-        car_data = only_keys(
-            car_data,
-            [
-                "id",
-                "plate_license",
-                "engine_number",
-                "fuel_type",
-                "make",
-                "model",
-                "year",
-                "color",
-                "type",
-                "seat",
-                "factory_date",
-                "weekday_rate",
-                "weekend_rate",
-                "available",
-                "tracking_device_id",
-                "updated_at",
-                "mileage",
-                "minimum_rent",
-                "maximum_rent",
-            ],
-        )
+        car_data = _UPDATE_CARS.params(car)
         car_data.update(updated_at=now)
-        car_sql = f"UPDATE cars SET {to_update_column(car_data)} WHERE id=:id"
-        self._database.begin()
-        self._database.execute(car_sql, car_data)
-        self._database.commit()
+        with self._database.transaction():
+            self._database.execute(_UPDATE_CARS.sql, car_data)
         return True
@@ -1,8 +1,50 @@
 from datetime import datetime
+from cgps.core import statements
 from cgps.core.database import Database
 from cgps.core.models.customer import Customer
+from cgps.core.models.driver_license import DriverLicense
+from cgps.core.models.passport import Passport
 from cgps.core.services.auth_service import AuthService
-from cgps.core.utils import ISO_DT, only_keys, to_insert_column
+from cgps.core.utils import ISO_DT
+
+
+_INSERT_PASSPORTS = statements.insert(
+    Passport,
+    "passports",
+    (
+        "no",
+        "country_code",
+        "gender",
+        "first_name",
+        "last_name",
+        "expired_at",
+    ),
+)
+_INSERT_DRIVER_LICENSES = statements.insert(
+    DriverLicense,
+    "driver_licenses",
+    (
+        "no",
+        "country_code",
+        "expired_at",
+    ),
+)
+_INSERT_CUSTOMERS = statements.insert(
+    Customer,
+    "customers",
+    (
+        "username",
+        "password",
+        "email_address",
+        "address",
+        "birthdate",
+        "mobile_no",
+        "passport_id",
+        "driver_license_id",
+        "created_at",
+        "updated_at",
+    ),
+)
 
 
 class CustomerAuthService(AuthService):
@@ -53,60 +95,22 @@ class CustomerAuthService(AuthService):
 
         now = datetime.now().strftime(ISO_DT)
 
-        self._database.begin()
-        passport_data = data.passport.to_db()
-        passport_data = only_keys(
-            passport_data,
-            [
-                "no",
-                "country_code",
-                "gender",
-                "first_name",
-                "last_name",
-                "expired_at",
-            ],
-        )
-        passport_data.update(created_at=now, updated_at=now)
-        passport_sql = f"INSERT INTO passports {to_insert_column(passport_data)}"
-        passport_id = self._database.execute(passport_sql, passport_data)
+        with self._database.transaction():
+            passport_data = _INSERT_PASSPORTS.params(data.passport)
+            passport_data.update(created_at=now, updated_at=now)
+            passport_id = self._database.execute(_INSERT_PASSPORTS.sql, passport_data)
 
-        license_data = data.driver_license.to_db()
-        license_data = only_keys(
-            license_data,
-            [
-                "no",
-                "country_code",
-                "expired_at",
-            ],
-        )
-        license_data.update(created_at=now, updated_at=now)
-        license_sql = f"INSERT INTO driver_licenses {to_insert_column(license_data)}"
-        license_id = self._database.execute(license_sql, license_data)
+            license_data = _INSERT_DRIVER_LICENSES.params(data.driver_license)
+            license_data.update(created_at=now, updated_at=now)
+            license_id = self._database.execute(_INSERT_DRIVER_LICENSES.sql, license_data)
 
-        customer_data = data.to_db()
-        customer_data.update(
-            password=self._encrypt_password(data.password),
-            created_at=now,
-            updated_at=now,
-            passport_id=passport_id,
-            driver_license_id=license_id,
-        )
-        customer_data = only_keys(
-            customer_data,
-            [
-                "username",
-                "password",
-                "email_address",
-                "address",
-                "birthdate",
-                "mobile_no",
-                "passport_id",
-                "driver_license_id",
-                "created_at",
-                "updated_at",
-            ],
-        )
-        customer_sql = f"INSERT INTO customers {to_insert_column(customer_data)}"
-        self._database.execute(customer_sql, customer_data)
-        self._database.commit()
+            customer_data = _INSERT_CUSTOMERS.params(data)
+            customer_data.update(
+                password=self._encrypt_password(data.password),
+                created_at=now,
+                updated_at=now,
+                passport_id=passport_id,
+                driver_license_id=license_id,
+            )
+            self._database.execute(_INSERT_CUSTOMERS.sql, customer_data)
         return True
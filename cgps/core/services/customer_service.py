@@ -1,10 +1,53 @@
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Sequence
+from cgps.core import statements
 from cgps.core.database import Database
 from cgps.core.models.customer import Customer
 from cgps.core.models.driver_license import DriverLicense
 from cgps.core.models.passport import Passport
-from cgps.core.utils import ISO_DT, only_keys, strip_prefix, to_update_column
+from cgps.core.utils import ISO_DT
+
+
+_UPDATE_PASSPORTS = statements.update(
+    Passport,
+    "passports",
+    (
+        "id",
+        "no",
+        "country_code",
+        "gender",
+        "first_name",
+        "last_name",
+        "expired_at",
+        "updated_at",
+    ),
+)
+_UPDATE_DRIVER_LICENSES = statements.update(
+    DriverLicense,
+    "driver_licenses",
+    (
+        "id",
+        "no",
+        "country_code",
+        "expired_at",
+        "updated_at",
+    ),
+)
+_UPDATE_CUSTOMERS = statements.update(
+    Customer,
+    "customers",
+    (
+        "id",
+        "username",
+        "email_address",
+        "address",
+        "birthdate",
+        "mobile_no",
+        "passport_id",
+        "driver_license_id",
+        "updated_at",
+    ),
+)
 
 
 class CustomerService:
@@ -70,78 +113,34 @@ class CustomerService:
             {where_clause}
         """
 
-        rows = self._database.fetchall(query, params)
-
-        invoices: list[Customer] = []
-        for row in rows:
-            passport_data = strip_prefix(row, "passport__")
-            customer: Customer = Customer.from_row(row)
-            passport: Passport = Passport.from_row(passport_data)
-            customer.passport = passport
-            invoices.append(customer)
-        return invoices
+        return self._database.fetchall_as(query, params, _customer_reader)
 
     def update_info(self, customer: Customer) -> Customer:
         now = datetime.now().strftime(ISO_DT)
 
-        self._database.begin()
-        passport_data = customer.passport.to_db()
-        passport_data = only_keys(
-            passport_data,
-            [
-                "id",
-                "no",
-                "country_code",
-                "gender",
-                "first_name",
-                "last_name",
-                "expired_at",
-                "updated_at",
-            ],
-        )
-        passport_data.update(updated_at=now)
-        passport_sql = (
-            f"UPDATE passports SET {to_update_column(passport_data)} WHERE id=:id"
-        )
-        self._database.execute(passport_sql, passport_data)
-
-        license_data = customer.driver_license.to_db()
-        license_data = only_keys(
-            license_data,
-            [
-                "id",
-                "no",
-                "country_code",
-                "expired_at",
-                "updated_at",
-            ],
-        )
-        license_data.update(updated_at=now)
-        license_sql = (
-            f"UPDATE driver_licenses SET {to_update_column(license_data)} WHERE id=:id"
-        )
-        self._database.execute(license_sql, license_data)
-
-        customer_data = customer.to_db()
-        customer_data.update(updated_at=now)
-        customer_data = only_keys(
-            customer_data,
-            [
-                "id",
-                "username",
-                "email_address",
-                "address",
-                "birthdate",
-                "mobile_no",
-                "passport_id",
-                "driver_license_id",
-                "updated_at",
-            ],
-        )
-        customer_sql = (
-            f"UPDATE customers SET {to_update_column(customer_data)} WHERE id=:id"
-        )
-        self._database.execute(customer_sql, customer_data)
-        self._database.commit()
+        with self._database.transaction():
+            passport_data = _UPDATE_PASSPORTS.params(customer.passport)
+            passport_data.update(updated_at=now)
+            self._database.execute(_UPDATE_PASSPORTS.sql, passport_data)
+
+            license_data = _UPDATE_DRIVER_LICENSES.params(customer.driver_license)
+            license_data.update(updated_at=now)
+            self._database.execute(_UPDATE_DRIVER_LICENSES.sql, license_data)
+
+            customer_data = _UPDATE_CUSTOMERS.params(customer)
+            customer_data.update(updated_at=now)
+            self._database.execute(_UPDATE_CUSTOMERS.sql, customer_data)
 
         return True
+
+
+def _customer_reader(columns: Sequence[str]):
+    read_customer = Customer.reader(columns)
+    read_passport = Passport.reader(columns, "passport__")
+
+    def read(row) -> Customer:
+        customer: Customer = read_customer(row)
+        customer.passport = read_passport(row)
+        return customer
+
+    return read
@@ -0,0 +1,96 @@
+import json
+from datetime import datetime
+from typing import Optional, Sequence
+
+from cgps.core.database import Database
+from cgps.core.models.geofence import Geofence, GeofenceEvent
+from cgps.core.utils import ISO_DT
+
+_INSERT_GEOFENCE = (
+    "INSERT INTO geofences"
+    " (name, kind, points, center_lat, center_lng, radius_m, created_at, updated_at)"
+    " VALUES (:name, :kind, :points, :center_lat, :center_lng, :radius_m, :now, :now)"
+)
+
+
+class GeofenceService:
+    def __init__(self, database: Database):
+        self._database = database
+
+    def all(self) -> list[Geofence]:
+        return self._database.fetchall_as(
+            "SELECT * FROM geofences ORDER BY id", (), Geofence.reader
+        )
+
+    def add_polygon(self, name: str, points: Sequence[tuple[float, float]]) -> int:
+        if len(points) < 3:
+            raise ValueError("A polygon geofence needs at least 3 points")
+        for lat, lng in points:
+            _check_position(lat, lng)
+        return self._insert(
+            name=name,
+            kind="polygon",
+            points=json.dumps([[float(lat), float(lng)] for lat, lng in points]),
+        )
+
+    def add_circle(self, name: str, lat: float, lng: float, radius_m: float) -> int:
+        _check_position(lat, lng)
+        if radius_m <= 0:
+            raise ValueError("A circle geofence needs a positive radius")
+        return self._insert(
+            name=name, kind="circle", center_lat=lat, center_lng=lng, radius_m=radius_m
+        )
+
+    def _insert(self, **fields) -> int:
+        data = {
+            "points": None,
+            "center_lat": None,
+            "center_lng": None,
+            "radius_m": None,
+            "now": datetime.now().strftime(ISO_DT),
+            **fields,
+        }
+        with self._database.transaction():
+            return self._database.execute(_INSERT_GEOFENCE, data)
+
+    def delete(self, geofence_id: int) -> bool:
+        with self._database.transaction() as conn:
+            conn.execute("DELETE FROM geofence_presence WHERE geofence_id = ?", (geofence_id,))
+            conn.execute("DELETE FROM geofence_events WHERE geofence_id = ?", (geofence_id,))
+            deleted = conn.execute("DELETE FROM geofences WHERE id = ?", (geofence_id,)).rowcount
+        return deleted > 0
+
+    def inside(self, geofence_id: int) -> list[int]:
+        # cars currently inside the fence
+        rows = self._database.fetchall(
+            "SELECT car_id FROM geofence_presence WHERE geofence_id = ? ORDER BY car_id",
+            (geofence_id,),
+        )
+        return [int(r["car_id"]) for r in rows]
+
+    def events(
+        self,
+        geofence_id: Optional[int] = None,
+        car_id: Optional[int] = None,
+        limit: int = 50,
+    ) -> list[GeofenceEvent]:
+        # newest first
+        conditions = []
+        params: dict[str, object] = {"limit": limit}
+        if geofence_id is not None:
+            conditions.append("geofence_id = :geofence_id")
+            params["geofence_id"] = geofence_id
+        if car_id is not None:
+            conditions.append("car_id = :car_id")
+            params["car_id"] = str(car_id)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._database.fetchall_as(
+            f"SELECT * FROM geofence_events{where} ORDER BY id DESC LIMIT :limit",
+            params,
+            GeofenceEvent.reader,
+        )
+
+
+def _check_position(lat: float, lng: float) -> None:
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError(f"Invalid position: {lat}, {lng}")
@@ -1,9 +1,32 @@
 from datetime import datetime
 from typing import Optional
 import uuid
+from cgps.core import statements
 from cgps.core.database import Database
 from cgps.core.models.tracking_device import TrackingDevice
-from cgps.core.utils import ISO_DT, only_keys, to_insert_column, to_update_column
+from cgps.core.utils import ISO_DT
+
+
+_INSERT_TRACKING_DEVICES = statements.insert(
+    TrackingDevice,
+    "tracking_devices",
+    (
+        "gsm_provider",
+        "gsm_no",
+        "created_at",
+        "updated_at",
+    ),
+)
+_UPDATE_TRACKING_DEVICES = statements.update(
+    TrackingDevice,
+    "tracking_devices",
+    (
+        "id",
+        "gsm_provider",
+        "gsm_no",
+        "updated_at",
+    ),
+)
 
 
 class GpsService:
@@ -14,8 +37,9 @@ class GpsService:
         self._database = database
 
     def all(self) -> list[TrackingDevice]:
-        data = self._database.fetchall("SELECT * FROM tracking_devices")
-        return [TrackingDevice.from_row(d) for d in data]
+        return self._database.fetchall_as(
+            "SELECT * FROM tracking_devices", (), TrackingDevice.reader
+        )
 
     def get_available(self, car_id: Optional[int]) -> list[TrackingDevice]:
         where_clause = "WHERE tracking_device_id IS NOT NULL"
@@ -34,46 +58,21 @@ class GpsService:
                 {where_clause}
             )
         """
-        rows = self._database.fetchall(query, params)
-        return [TrackingDevice.from_row(d) for d in rows]
+        return self._database.fetchall_as(query, params, TrackingDevice.reader)
 
     def register(self, device: TrackingDevice):
         now = datetime.now().strftime(ISO_DT)
 
-        device_data = device.to_db()
-        device_data = only_keys(
-            device_data,
-            [
-                "gsm_provider",
-                "gsm_no",
-                "created_at",
-                "updated_at",
-            ],
-        )
+        device_data = _INSERT_TRACKING_DEVICES.params(device)
         device_data.update(created_at=now, updated_at=now)
-        device_sql = f"INSERT INTO tracking_devices {to_insert_column(device_data)}"
-        self._database.begin()
-        self._database.execute(device_sql, device_data)
-        self._database.commit()
+        with self._database.transaction():
+            self._database.execute(_INSERT_TRACKING_DEVICES.sql, device_data)
         return True
 
     def update(self, device: TrackingDevice) -> bool:
         now = datetime.now().strftime(ISO_DT)
-        device_data = device.to_db()
-        device_data = only_keys(
-            device_data,
-            [
-                "id",
-                "gsm_provider",
-                "gsm_no",
-                "updated_at",
-            ],
-        )
+        device_data = _UPDATE_TRACKING_DEVICES.params(device)
         device_data.update(updated_at=now)
-        device_sql = (
-            f"UPDATE tracking_devices SET {to_update_column(device_data)} WHERE id=:id"
-        )
-        self._database.begin()
-        self._database.execute(device_sql, device_data)
-        self._database.commit()
+        with self._database.transaction():
+            self._database.execute(_UPDATE_TRACKING_DEVICES.sql, device_data)
         return True
@@ -1,27 +1,59 @@
 from datetime import datetime
+from typing import Iterator, Sequence
+from cgps.core import statements
 from cgps.core.database import Database
 from cgps.core.models.car import Car
 from cgps.core.models.invoice import Invoice
 from cgps.core.models.order import Order
 from cgps.core.utils import (
     ISO_DT,
-    only_keys,
-    strip_prefix,
-    to_insert_column,
     to_update_column,
 )
 
 
+_INSERT_ORDERS = statements.insert(
+    Order,
+    "orders",
+    (
+        "customer_id",
+        "car_id",
+        "started_at",
+        "ended_at",
+        "total_day",
+        "total_weekday_amount",
+        "total_weekend_amount",
+        "total_amount",
+        "created_at",
+        "updated_at",
+    ),
+)
+_INSERT_INVOICES = statements.insert(
+    Invoice,
+    "invoices",
+    (
+        "order_id",
+        "amount",
+        "paid_amount",
+        "paid_at",
+        "created_at",
+        "updated_at",
+    ),
+)
+
+
 class OrderService:
     def __init__(self, database: Database):
         self._database = database
 
     def list(self, customer_id: int = None) -> list[Invoice]:
+        return [invoice for invoice in self.iter(customer_id)]
+
+    def iter(self, customer_id: int = None, chunk_size: int = 500) -> Iterator[Invoice]:
         extra_sql = (
             "WHERE o.customer_id = :customer_id" if customer_id is not None else ""
         )
         extra_params = {"customer_id": customer_id} if customer_id is not None else {}
-        rows = self._database.fetchall(
+        return self._database.iterate_as(
             (
             f"""
             SELECT
@@ -60,125 +92,98 @@ class OrderService:
             """
             ),
             extra_params,
+            _invoice_reader,
+            chunk_size,
         )
-        invoices: list[Invoice] = []
-        for row in rows:
-            car_data = strip_prefix(row, "car__")
-            order: Order = Order.from_row(row)
-            order.car = Car.from_row(car_data)
-            invoice_data = strip_prefix(row, "invoice__")
-            invoice: Invoice = Invoice.from_row(invoice_data)
-            invoice.order = order
-            invoices.append(invoice)
-        return invoices
 
     def rent_and_pay(self, customer_id: int, invoice: Invoice) -> bool:
         now = datetime.now().strftime(ISO_DT)
 
-        self._database.begin()
-        order_data = invoice.order.to_db()
-        order_data = only_keys(
-            order_data,
-            [
-                "customer_id",
-                "car_id",
-                "started_at",
-                "ended_at",
-                "total_day",
-                "total_weekday_amount",
-                "total_weekend_amount",
-                "total_amount",
-                "created_at",
-                "updated_at",
-            ],
-        )
-        order_data.update(customer_id=customer_id, created_at=now, updated_at=now)
-        order_sql = f"INSERT INTO orders {to_insert_column(order_data)}"
-        order_id = self._database.execute(order_sql, order_data)
-
-        invoice_data = invoice.to_db()
-        invoice_data = only_keys(
-            invoice_data,
-            [
-                "order_id",
-                "amount",
-                "paid_amount",
-                "paid_at",
-                "created_at",
-                "updated_at",
-            ],
-        )
-        invoice_data.update(
-            order_id=order_id, created_at=now, updated_at=now
-        )
-        invoice_sql = f"INSERT INTO invoices {to_insert_column(invoice_data)}"
-        self._database.execute(invoice_sql, invoice_data)
-        self._database.commit()
+        with self._database.transaction():
+            order_data = _INSERT_ORDERS.params(invoice.order)
+            order_data.update(customer_id=customer_id, created_at=now, updated_at=now)
+            order_id = self._database.execute(_INSERT_ORDERS.sql, order_data)
+
+            invoice_data = _INSERT_INVOICES.params(invoice)
+            invoice_data.update(
+                order_id=order_id, created_at=now, updated_at=now
+            )
+            self._database.execute(_INSERT_INVOICES.sql, invoice_data)
         return True
 
     def reject(self, order_id: int) -> bool:
         now = datetime.now().strftime(ISO_DT)
 
-        self._database.begin()
-        order_data = {
-            "approved_at": None,
-            "rejected_at": now,
-            "updated_at": now,
-        }
-        order_sql = f"UPDATE orders SET {to_update_column(order_data)} WHERE id=:id"
-        self._database.execute(order_sql, {"id": order_id, **order_data})
-        self._database.commit()
+        with self._database.transaction():
+            order_data = {
+                "approved_at": None,
+                "rejected_at": now,
+                "updated_at": now,
+            }
+            order_sql = f"UPDATE orders SET {to_update_column(order_data)} WHERE id=:id"
+            self._database.execute(order_sql, {"id": order_id, **order_data})
         return True
 
     def approve(self, order_id: int) -> bool:
         now = datetime.now().strftime(ISO_DT)
 
-        self._database.begin()
-        order_data = {
-            "rejected_at": None,
-            "approved_at": now,
-            "updated_at": now,
-        }
-        order_sql = f"UPDATE orders SET {to_update_column(order_data)} WHERE id=:id"
-        self._database.execute(order_sql, {"id": order_id, **order_data})
-        self._database.commit()
+        with self._database.transaction():
+            order_data = {
+                "rejected_at": None,
+                "approved_at": now,
+                "updated_at": now,
+            }
+            order_sql = f"UPDATE orders SET {to_update_column(order_data)} WHERE id=:id"
+            self._database.execute(order_sql, {"id": order_id, **order_data})
         return True
     
     def paid(self, invoice_id: int) -> bool:
         now = datetime.now().strftime(ISO_DT)
 
-        self._database.begin()
-        invoice_data = {
-            "paid_at": now,
-            "updated_at": now,
-        }
-        invoice_sql = f"UPDATE invoices SET {to_update_column(invoice_data)} WHERE id=:id"
-        self._database.execute(invoice_sql, {"id": invoice_id, **invoice_data})
-        self._database.commit()
+        with self._database.transaction():
+            invoice_data = {
+                "paid_at": now,
+                "updated_at": now,
+            }
+            invoice_sql = f"UPDATE invoices SET {to_update_column(invoice_data)} WHERE id=:id"
+            self._database.execute(invoice_sql, {"id": invoice_id, **invoice_data})
         return True
 
     def pick_up(self, order_id: int) -> bool:
         now = datetime.now().strftime(ISO_DT)
 
-        self._database.begin()
-        order_data = {
-            "receive_at": now,
-            "updated_at": now,
-        }
-        order_sql = f"UPDATE orders SET {to_update_column(order_data)} WHERE id=:id"
-        self._database.execute(order_sql, {"id": order_id, **order_data})
-        self._database.commit()
+        with self._database.transaction():
+            order_data = {
+                "receive_at": now,
+                "updated_at": now,
+            }
+            order_sql = f"UPDATE orders SET {to_update_column(order_data)} WHERE id=:id"
+            self._database.execute(order_sql, {"id": order_id, **order_data})
         return True
 
     def drop_off(self, order_id: int) -> bool:
         now = datetime.now().strftime(ISO_DT)
 
-        self._database.begin()
-        order_data = {
-            "return_at": now,
-            "updated_at": now,
-        }
-        order_sql = f"UPDATE orders SET {to_update_column(order_data)} WHERE id=:id"
-        self._database.execute(order_sql, {"id": order_id, **order_data})
-        self._database.commit()
+        with self._database.transaction():
+            order_data = {
+                "return_at": now,
+                "updated_at": now,
+            }
+            order_sql = f"UPDATE orders SET {to_update_column(order_data)} WHERE id=:id"
+            self._database.execute(order_sql, {"id": order_id, **order_data})
         return True
+
+
+def _invoice_reader(columns: Sequence[str]):
+    read_order = Order.reader(columns)
+    read_car = Car.reader(columns, "car__")
+    read_invoice = Invoice.reader(columns, "invoice__")
+
+    def read(row) -> Invoice:
+        order: Order = read_order(row)
+        order.car = read_car(row)
+        invoice: Invoice = read_invoice(row)
+        invoice.order = order
+        return invoice
+
+    return read
@@ -1,83 +1,61 @@
 from __future__ import annotations
 
+import heapq
 from datetime import datetime
-from typing import Iterable, List, Optional
+from itertools import groupby, islice
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
 
-from cgps.core.database import Database
+from cgps.core import statements
+from cgps.core.database import Database, RowReaderFactory, stores_epoch
+from cgps.core.geofence_engine import GeofenceEngine
 from cgps.core.models.tracking import Tracking
+from cgps.core.models.tracking_batch import TrackingBatch
 from cgps.core.models.car import Car
-from cgps.core.utils import ISO_DT, only_keys, to_insert_column, strip_prefix
+from cgps.core.tracking_blocks import TrackingBlocks
+from cgps.core.trip_segmenter import TripSegmenter
+from cgps.core.tracking_partitions import ID_SPAN, TrackingPartitions, month_key, month_of_id
+from cgps.core.timestamp_codec import to_epoch_ms
+from cgps.core.utils import ISO_DT, insert_columns, to_dt
 
 
-class TrackingService:
-    def __init__(self, database: Database):
-        self._database = database
+_INSERT_TRACKINGS = statements.insert(
+    Tracking,
+    "trackings",
+    (
+        "latitude",
+        "longitude",
+        "fuel_level",
+        "fuel_litre",
+        "fuel_kwh",
+        "speed_kmh",
+        "engine_status",
+        "gps_signal_level",
+        "gsm_signal_level",
+        "car_id",
+        "tracking_device_id",
+        "created_at",
+        "updated_at",
+    ),
+)
 
-    def insert_batch(self, batch: Iterable[Tracking]) -> int:
-        now = datetime.now().strftime(ISO_DT)
-        inserted = 0
-        self._database.begin()
-        for t in batch:
-            data = t.to_db()
-            data = only_keys(
-                data,
-                [
-                    "latitude",
-                    "longitude",
-                    "fuel_level",
-                    "fuel_litre",
-                    "fuel_kwh",
-                    "speed_kmh",
-                    "engine_status",
-                    "gps_signal_level",
-                    "gsm_signal_level",
-                    "car_id",
-                    "tracking_device_id",
-                    "created_at",
-                    "updated_at",
-                ],
-            )
-            if data.get("created_at") is None:
-                data.update(created_at=now)
-            if data.get("updated_at") is None:
-                data.update(updated_at=now)
-            sql = f"INSERT INTO trackings {to_insert_column(data)}"
-            new_id = self._database.execute(sql, data)
-            try:
-                t.id = int(new_id)
-            except Exception:
-                pass
-            inserted += 1
-        self._database.commit()
-        return inserted
+_LATEST_COLUMNS = ("car_id", "id") + tuple(
+    c for c in _INSERT_TRACKINGS.columns if c != "car_id"
+)
+# a row only replaces the stored one if it is newer (higher trackings.id)
+_UPSERT_LATEST = (
+    f"INSERT INTO tracking_latest {insert_columns(_LATEST_COLUMNS)}"
+    " ON CONFLICT (car_id) DO UPDATE SET "
+    + ", ".join(f"{c}=excluded.{c}" for c in _LATEST_COLUMNS if c != "car_id")
+    + " WHERE excluded.id > tracking_latest.id"
+)
 
-    def insert(self, batches: Iterable[List[Tracking]], max_rows: Optional[int] = None) -> int:
-        total = 0
-        for batch in batches:
-            if not batch:
-                continue
-            count = self.insert_batch(batch)
-            total += count
-            if max_rows is not None and total >= max_rows:
-                break
-        return total
+# one point box per position; min_t/max_t are created_at in epoch seconds
+_INSERT_RTREE = (
+    "INSERT INTO tracking_rtree (id, min_lat, max_lat, min_lng, max_lng, min_t, max_t)"
+    " VALUES (:id, :lat, :lat, :lng, :lng, :t, :t)"
+)
 
-    def list_with_car(
-        self, car_id: Optional[int] = None, limit: Optional[int] = None
-    ) -> list[tuple[Tracking, Car]]:
-        where = ""
-        params: dict[str, object] = {}
-        if car_id is not None:
-            where = " WHERE t.car_id = :car_id"
-            params["car_id"] = car_id
-        extra = ""
-        if limit is not None:
-            extra = " LIMIT :limit"
-            params["limit"] = limit
-        rows = self._database.fetchall(
-            f"""
-            SELECT
-                t.*,
+_CAR_COLUMNS = """
                 c.id              AS car__id,
                 c.plate_license   AS car__plate_license,
                 c.engine_number   AS car__engine_number,
@@ -97,18 +75,474 @@ class TrackingService:
                 c.available       AS car__available,
                 c.tracking_device_id AS car__tracking_device_id,
                 c.created_at      AS car__created_at,
-                c.updated_at      AS car__updated_at
-            FROM trackings t
+                c.updated_at      AS car__updated_at"""
+
+
+class TrackingService:
+    def __init__(
+        self,
+        database: Database,
+        partitions: Optional[TrackingPartitions] = None,
+        geofences: Optional[GeofenceEngine] = None,
+        trips: Optional[TripSegmenter] = None,
+        blocks: Optional[TrackingBlocks] = None,
+    ):
+        self._database = database
+        self._partitions = partitions if partitions is not None and partitions.enabled else None
+        self._geofences = geofences if geofences is not None and geofences.enabled else None
+        self._trips = trips if trips is not None and trips.enabled else None
+        # read whether or not compaction is enabled, so compacted history stays visible
+        self._blocks = blocks
+        self._epoch_created_at: Optional[bool] = None
+        if self._partitions is not None:
+            self._partitions.warm()
+
+    def _stores_epoch(self) -> bool:
+        if self._epoch_created_at is None:
+            self._epoch_created_at = stores_epoch(self._database)
+        return self._epoch_created_at
+
+    def insert_batch(self, batch: Iterable[Tracking]) -> int:
+        now = datetime.now().strftime(ISO_DT)
+        trackings = list(batch)
+        if not trackings:
+            return 0
+        epoch = self._stores_epoch()
+        rows = []
+        for t in trackings:
+            data = _INSERT_TRACKINGS.params(t)
+            if data.get("created_at") is None:
+                data.update(created_at=now)
+            if data.get("updated_at") is None:
+                data.update(updated_at=now)
+            if epoch:
+                data.update(created_at=to_epoch_ms(to_dt(data["created_at"])))
+            rows.append(data)
+        # ATTACH is not allowed inside the transaction, so partitions are resolved first
+        groups = self._partition_groups(rows) if self._partitions is not None else None
+        with self._database.transaction():
+            if groups is None:
+                ids = self._database.executemany(_INSERT_TRACKINGS.sql, rows)
+            else:
+                ids = self._insert_partitioned(rows, groups)
+            self._upsert_latest(rows, ids)
+            self._index_positions(rows, ids)
+            if self._geofences is not None:
+                self._geofences.evaluate(rows, ids)
+            if self._trips is not None:
+                self._trips.process(rows, ids)
+        for t, new_id in zip(trackings, ids):
+            t.id = new_id
+        return len(trackings)
+
+    def _partition_groups(self, rows: List[dict[str, Any]]) -> List[tuple[str, List[int]]]:
+        # (partition alias, row indexes) per created_at month
+        months = [month_key(r["created_at"]) for r in rows]
+        order = sorted(range(len(rows)), key=months.__getitem__)
+        aliases = self._partitions.ensure_many(months)
+        return [
+            (aliases[month], list(idx))
+            for month, idx in groupby(order, key=months.__getitem__)
+        ]
+
+    def _insert_partitioned(
+        self, rows: List[dict[str, Any]], groups: List[tuple[str, List[int]]]
+    ) -> List[int]:
+        # ids come back in the original row order
+        ids: List[int] = [0] * len(rows)
+        for alias, idx in groups:
+            stmt = statements.insert(Tracking, f"{alias}.trackings", _INSERT_TRACKINGS.columns)
+            new_ids = self._database.executemany(stmt.sql, [rows[i] for i in idx])
+            for i, new_id in zip(idx, new_ids):
+                ids[i] = new_id
+        return ids
+
+    def _upsert_latest(self, rows: List[dict[str, Any]], ids: Sequence[int]) -> None:
+        latest: dict[Any, dict[str, Any]] = {}
+        for data, new_id in zip(rows, ids):
+            current = latest.get(data["car_id"])
+            if current is None or new_id > current["id"]:
+                latest[data["car_id"]] = {**data, "id": new_id}
+        self._database.executemany(_UPSERT_LATEST, list(latest.values()))
+
+    def _index_positions(self, rows: List[dict[str, Any]], ids: Sequence[int]) -> None:
+        boxes = [
+            {
+                "id": new_id,
+                "lat": data["latitude"],
+                "lng": data["longitude"],
+                "t": _epoch_sec(data["created_at"]),
+            }
+            for data, new_id in zip(rows, ids)
+            if data.get("latitude") is not None and data.get("longitude") is not None
+        ]
+        if boxes:
+            self._database.executemany(_INSERT_RTREE, boxes)
+
+    def latest_positions(self, car_id: Optional[int] = None) -> list[tuple[Tracking, Car]]:
+        # current fleet state, one row per car, newest first
+        where = ""
+        params: dict[str, object] = {}
+        if car_id is not None:
+            where = " WHERE t.car_id = :car_id"
+            params["car_id"] = car_id
+        return self._database.fetchall_as(
+            f"""
+            SELECT
+                t.*,{_CAR_COLUMNS}
+            FROM tracking_latest t
+            JOIN cars c ON c.id = t.car_id
+            {where}
+            ORDER BY t.id DESC
+            """,
+            params,
+            _tracking_with_car_reader,
+        )
+
+    def insert(self, batches: Iterable[List[Tracking]], max_rows: Optional[int] = None) -> int:
+        total = 0
+        with self._database.group_commit():
+            for batch in batches:
+                if not batch:
+                    continue
+                count = self.insert_batch(batch)
+                total += count
+                if max_rows is not None and total >= max_rows:
+                    break
+        return total
+
+    def list_with_car(
+        self,
+        car_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> list[tuple[Tracking, Car]]:
+        return list(self.iter_with_car(car_id=car_id, limit=limit, since=since, until=until))
+
+    def _sources(
+        self,
+        since: Optional[datetime],
+        until: Optional[datetime],
+        oldest_first: bool = False,
+        from_month: Optional[int] = None,
+    ) -> Iterator[tuple[str, Optional[str]]]:
+        # (table, attached schema) pairs to read, newest first: the partitions
+        # overlapping the range, then main.trackings with the rows written before
+        # partitioning. Each partition is attached only when its turn comes, so a
+        # long range never needs more than one extra attach slot. from_month (oldest
+        # first only) starts at that partition, skipping main.trackings too.
+        if self._partitions is None:
+            yield "trackings", None
+            return
+        months = self._partitions.months_between(since, until)
+        if oldest_first:
+            if from_month is None:
+                yield "main.trackings", None
+            months = [m for m in reversed(months) if from_month is None or m >= from_month]
+        for month in months:
+            alias = self._partitions.ensure(month, create=False)
+            if alias is not None:
+                yield f"{alias}.trackings", alias
+        if not oldest_first:
+            yield "main.trackings", None
+
+    def _table_of(self, tracking_id: int) -> str:
+        if self._partitions is None:
+            return "trackings"
+        month = month_of_id(tracking_id)
+        if month is None:
+            return "main.trackings"
+        alias = self._partitions.ensure(month, create=False)
+        if alias is None:
+            raise ValueError(f"No partition for tracking id: {tracking_id}")
+        return f"{alias}.trackings"
+
+    def _filters(
+        self,
+        prefix: str,
+        car_id: Optional[int],
+        since: Optional[datetime],
+        until: Optional[datetime],
+    ) -> tuple[str, dict[str, object]]:
+        conditions = []
+        params: dict[str, object] = {}
+        if car_id is not None:
+            conditions.append(f"{prefix}car_id = :car_id")
+            params["car_id"] = car_id
+        encode = to_epoch_ms if self._stores_epoch() else lambda dt: dt.strftime(ISO_DT)
+        if since is not None:
+            conditions.append(f"{prefix}created_at >= :since")
+            params["since"] = encode(since)
+        if until is not None:
+            conditions.append(f"{prefix}created_at < :until")
+            params["until"] = encode(until)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
+
+    def _chain(
+        self,
+        sources: Iterable[tuple[str, Optional[str]]],
+        query: Callable[[str, str], str],
+        params: dict[str, object],
+        limit: Optional[int],
+        make_reader: RowReaderFactory,
+        chunk_size: int = 500,
+    ) -> Iterator[Any]:
+        # one query per source table; the LIMIT carries over to the next table
+        remaining = limit
+        for table, schema in sources:
+            if remaining is not None and remaining <= 0:
+                return
+            extra = ""
+            args = dict(params)
+            if remaining is not None:
+                extra = " LIMIT :limit"
+                args["limit"] = remaining
+            for item in self._database.iterate_as(
+                query(table, extra), args, make_reader, chunk_size, schema
+            ):
+                if remaining is not None:
+                    remaining -= 1
+                yield item
+
+    def list_range(
+        self,
+        car_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        after_id: Optional[int] = None,
+        page_size: int = 500,
+    ) -> list[Tracking]:
+        # One page in (created_at, id) order, oldest first; pass the last id of a page
+        # as after_id for the next. Each page seeks idx_trackings_car_time (or
+        # idx_trackings_created_at without car_id) past the previous one, so page
+        # 10,000 costs the same as page 1. Compacted blocks are merged in by the same
+        # key, since a late row can still sit in the tables behind newer blocks.
+        where, params = self._filters("", car_id, since, until)
+        from_month = None
+        after = None
+        if after_id is not None:
+            row = None
+            try:
+                table = self._table_of(after_id)
+                row = self._database.fetchone(
+                    f"SELECT created_at FROM {table} WHERE id = ?", (after_id,)
+                )
+            except ValueError:
+                if self._blocks is None:
+                    raise
+            if row is not None:
+                created_at = row["created_at"]
+                # tables older than the cursor's were read by earlier pages
+                from_month = month_of_id(after_id) if self._partitions is not None else None
+                after = (_epoch_ms(created_at), after_id)
+            else:
+                located = self._blocks.locate(after_id) if self._blocks is not None else None
+                if located is None:
+                    raise ValueError(f"Unknown tracking id: {after_id}")
+                after = (to_epoch_ms(located.created_at), after_id)
+                created_at = (
+                    after[0] if self._stores_epoch() else located.created_at.strftime(ISO_DT)
+                )
+            params.update(after_created_at=created_at, after_id=after_id)
+        keyset = (
+            f"{' AND' if where else ' WHERE'}"
+            " (created_at, id) > (:after_created_at, :after_id)"
+        )
+        sources = self._sources(since, until, oldest_first=True, from_month=from_month)
+
+        def query(table: str, extra: str) -> str:
+            seek = keyset if after is not None else ""
+            return f"SELECT * FROM {table}{where}{seek} ORDER BY created_at, id{extra}"
+
+        page = list(self._chain(sources, query, params, page_size, Tracking.reader))
+        if self._blocks is None:
+            return page
+        blocks = self._block_page(car_id, since, until, after, page_size)
+        if not blocks:
+            return page
+        merged = heapq.merge(
+            blocks, page, key=lambda t: (to_epoch_ms(t.created_at), t.id)
+        )
+        return list(islice(merged, page_size))
+
+    def _block_page(
+        self,
+        car_id: Optional[int],
+        since: Optional[datetime],
+        until: Optional[datetime],
+        after: Optional[tuple[int, int]],
+        page_size: int,
+    ) -> list[Tracking]:
+        rows = self._blocks.rows(car_id, since, until, after=after)
+        try:
+            return list(islice(rows, page_size))
+        finally:
+            rows.close()
+
+    def _with_blocks(
+        self,
+        items: Iterable[Any],
+        car_id: Optional[int],
+        since: Optional[datetime],
+        until: Optional[datetime],
+        limit: Optional[int],
+        wrap: Callable[[Tracking], Any] = lambda t: t,
+    ) -> Iterator[Any]:
+        # newest first: the table rows, then the compacted blocks (all older) up to
+        # what is left of limit; wrap returns None to skip a row
+        remaining = limit
+        for item in items:
+            if remaining is not None:
+                remaining -= 1
+            yield item
+        if self._blocks is None or (remaining is not None and remaining <= 0):
+            return
+        rows = self._blocks.rows(car_id, since, until, newest_first=True)
+        try:
+            for t in rows:
+                item = wrap(t)
+                if item is None:
+                    continue
+                yield item
+                if remaining is not None:
+                    remaining -= 1
+                    if remaining <= 0:
+                        return
+        finally:
+            rows.close()
+
+    def within_bbox(
+        self,
+        min_lat: float,
+        min_lng: float,
+        max_lat: float,
+        max_lng: float,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ) -> list[Tracking]:
+        # Trackings positioned inside the box, newest first. tracking_rtree finds the
+        # candidates (the time range is its third dimension) and each is fetched by
+        # id; the exact bounds are re-checked since R*Tree boxes are rounded outward.
+        # Rows compacted into tracking_blocks are not indexed and never match.
+        where, params = self._filters("t.", None, since, until)
+        params.update(min_lat=min_lat, min_lng=min_lng, max_lat=max_lat, max_lng=max_lng)
+        conditions = [
+            "r.min_lat <= :max_lat AND r.max_lat >= :min_lat",
+            "r.min_lng <= :max_lng AND r.max_lng >= :min_lng",
+            "t.latitude BETWEEN :min_lat AND :max_lat",
+            "t.longitude BETWEEN :min_lng AND :max_lng",
+        ]
+        if since is not None:
+            conditions.append("r.max_t >= :since_t")
+            params["since_t"] = to_epoch_ms(since) // 1000
+        if until is not None:
+            conditions.append("r.min_t <= :until_t")
+            params["until_t"] = -(-to_epoch_ms(until) // 1000)
+        where = f"{where}{' AND' if where else ' WHERE'} {' AND '.join(conditions)}"
+
+        def query(table: str, extra: str) -> str:
+            # CROSS JOIN keeps the R*Tree as the outer loop
+            return f"""
+            SELECT t.*
+            FROM tracking_rtree r
+            CROSS JOIN {table} t ON t.id = r.id
+            {where}{self._id_range(table)}
+            ORDER BY t.id DESC{extra}
+            """
+
+        return list(
+            self._chain(self._sources(since, until), query, params, limit, Tracking.reader)
+        )
+
+    def _id_range(self, table: str) -> str:
+        # tracking_rtree indexes every table; keep the hits whose ids live in `table`
+        if self._partitions is None:
+            return ""
+        if table == "main.trackings":
+            return f" AND r.id < {ID_SPAN}"
+        month = int(table[len("trk_") : table.index(".")])
+        return f" AND r.id >= {month * ID_SPAN} AND r.id < {(month + 1) * ID_SPAN}"
+
+    def load_batch(
+        self,
+        car_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> TrackingBatch:
+        where, params = self._filters("", car_id, since, until)
+        return TrackingBatch.from_trackings(
+            self._with_blocks(
+                self._chain(
+                    self._sources(since, until),
+                    lambda table, extra: f"SELECT * FROM {table}{where} ORDER BY id DESC{extra}",
+                    params,
+                    limit,
+                    Tracking.reader,
+                ),
+                car_id,
+                since,
+                until,
+                limit,
+            )
+        )
+
+    def iter_with_car(
+        self,
+        car_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        chunk_size: int = 500,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Iterator[tuple[Tracking, Car]]:
+        where, params = self._filters("t.", car_id, since, until)
+        rows = self._chain(
+            self._sources(since, until),
+            lambda table, extra: f"""
+            SELECT
+                t.*,{_CAR_COLUMNS}
+            FROM {table} t
             JOIN cars c ON c.id = t.car_id
             {where}
             ORDER BY t.id DESC{extra}
             """,
             params,
+            limit,
+            _tracking_with_car_reader,
+            chunk_size,
         )
-        out: list[tuple[Tracking, Car]] = []
-        for row in rows:
-            car_data = strip_prefix(row, "car__")
-            t = Tracking.from_row(row)
-            c = Car.from_row(car_data)
-            out.append((t, c))
-        return out
+        if self._blocks is None:
+            return rows
+        cars: Optional[dict[str, Car]] = None
+
+        def with_car(t: Tracking) -> Optional[tuple[Tracking, Car]]:
+            # cars are loaded once the blocks are reached; a missing car skips the
+            # row like the JOIN does
+            nonlocal cars
+            if cars is None:
+                cars = {
+                    str(car.id): car
+                    for car in self._database.fetchall_as("SELECT * FROM cars", (), Car.reader)
+                }
+            car = cars.get(str(t.car_id))
+            return None if car is None else (t, car)
+
+        return self._with_blocks(rows, car_id, since, until, limit, with_car)
+
+
+def _epoch_ms(created_at: Any) -> int:
+    # created_at as insert_batch stores it: epoch ms or ISO text
+    return created_at if isinstance(created_at, int) else to_epoch_ms(to_dt(created_at))
+
+
+def _epoch_sec(created_at: Any) -> int:
+    return _epoch_ms(created_at) // 1000
+
+
+def _tracking_with_car_reader(columns: Sequence[str]):
+    read_tracking = Tracking.reader(columns)
+    read_car = Car.reader(columns, "car__")
+    return lambda row: (read_tracking(row), read_car(row))
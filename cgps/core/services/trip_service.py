@@ -0,0 +1,49 @@
+from datetime import datetime
+from typing import Any, List, Optional
+
+from cgps.core.database import Database
+from cgps.core.models.trip import Trip
+from cgps.core.utils import ISO_DT
+
+
+class TripService:
+    def __init__(self, database: Database):
+        self._database = database
+
+    def list(
+        self,
+        car_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = 100,
+    ) -> List[Trip]:
+        # ended trips started in [since, until), newest first, off idx_trips_car_started
+        # (idx_trips_started without car_id)
+        conditions = []
+        params: dict[str, object] = {}
+        if car_id is not None:
+            conditions.append("car_id = :car_id")
+            params["car_id"] = str(car_id)
+        if since is not None:
+            conditions.append("started_at >= :since")
+            params["since"] = since.strftime(ISO_DT)
+        if until is not None:
+            conditions.append("started_at < :until")
+            params["until"] = until.strftime(ISO_DT)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        extra = ""
+        if limit is not None:
+            extra = " LIMIT :limit"
+            params["limit"] = limit
+        return self._database.fetchall_as(
+            f"SELECT * FROM trips{where} ORDER BY started_at DESC{extra}",
+            params,
+            Trip.reader,
+        )
+
+    def ongoing(self) -> List[dict[str, Any]]:
+        # cars on a trip right now: car_id, started_at, distance_km so far
+        return self._database.fetchall(
+            "SELECT car_id, start_id, started_at, distance_km, max_speed_kmh, moving_at"
+            " FROM trip_state WHERE start_id IS NOT NULL ORDER BY started_at"
+        )
@@ -0,0 +1,60 @@
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from cgps.core.database import Database
+
+
+@dataclass
+class FlushResult:
+    seconds: float
+    ok: bool
+
+
+class SnapshotFlusher:
+    """Background ``save_snapshot()`` for a ``Database`` in memory_snapshot mode.
+
+    Every ``interval_sec`` the in-memory database is written to
+    ``database.path``; whatever was committed since the last flush is lost if
+    the process dies. ``Database.close()`` writes the final snapshot. Does
+    nothing in file mode.
+    """
+
+    def __init__(self, database: Database, interval_sec: float = 60.0):
+        self._database = database
+        self._interval = float(interval_sec)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last: Optional[FlushResult] = None
+
+    def start(self) -> None:
+        if not self._database.memory_snapshot or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="cgps-snapshot", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def run_once(self) -> Optional[FlushResult]:
+        started = time.perf_counter()
+        try:
+            ok = self._database.save_snapshot()
+        except (sqlite3.Error, OSError):
+            # e.g. the disk is full; keep the previous snapshot and retry next tick
+            ok = False
+        self.last = FlushResult(time.perf_counter() - started, ok)
+        return self.last
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self.run_once()
@@ -0,0 +1,45 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Tuple
+
+from cgps.core.models import codegen
+from cgps.core.utils import insert_columns, update_columns
+
+
+@dataclass(frozen=True)
+class Statement:
+    sql: str
+    columns: Tuple[str, ...]
+    _encode: Callable[[Any], Dict[str, Any]]
+
+    def params(self, obj: Any) -> Dict[str, Any]:
+        # the model encoded to exactly self.columns, as only_keys(obj.to_db(), columns)
+        return self._encode(obj)
+
+
+_REGISTRY: Dict[Tuple[str, type, str, Tuple[str, ...], str], Statement] = {}
+
+
+def insert(model: type, table: str, columns: Tuple[str, ...]) -> Statement:
+    return _get("insert", model, table, columns, "")
+
+
+def update(
+    model: type, table: str, columns: Tuple[str, ...], key: str = "id"
+) -> Statement:
+    return _get("update", model, table, columns, key)
+
+
+def _get(
+    kind: str, model: type, table: str, columns: Tuple[str, ...], key: str
+) -> Statement:
+    registry_key = (kind, model, table, columns, key)
+    stmt = _REGISTRY.get(registry_key)
+    if stmt is None:
+        if kind == "insert":
+            sql = f"INSERT INTO {table} {insert_columns(columns)}"
+        else:
+            sql = f"UPDATE {table} SET {update_columns(columns)} WHERE {key}=:{key}"
+        stmt = _REGISTRY[registry_key] = Statement(
+            sql=sql, columns=columns, _encode=codegen.make_to_db(model, columns)
+        )
+    return stmt
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Optional
+
+ISO_DT = "%Y-%m-%d %H:%M:%S"
+
+# Epoch timestamps carry the naive wall-clock time as if it were UTC, which is
+# what SQLite's strftime('%s', ...) produces from the stored ISO text.
+_EPOCH = datetime(1970, 1, 1)
+_MS = timedelta(milliseconds=1)
+
+
+# Trackings in one batch share a single ``now``, so both directions see the same
+# handful of values over and over. lru_cache bounds the memos and is safe to share
+# between the ingest, report and reader threads.
+def decode(v: Any) -> Optional[datetime]:
+    if v is None or v == "":
+        return None
+    if isinstance(v, datetime):
+        return _naive(v)
+    return _decode(v)
+
+
+# typed: True and 1 must not share an entry
+@lru_cache(maxsize=1024, typed=True)
+def _decode(v: Any) -> datetime:
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return from_epoch_ms(v)
+    # accepts "YYYY-MM-DD", "YYYY-MM-DD HH:MM:SS" and the "T" form; fractional
+    # seconds are dropped as before
+    dt = _naive(datetime.fromisoformat(str(v)))
+    return dt.replace(microsecond=0) if dt.microsecond else dt
+
+
+def _naive(dt: datetime) -> datetime:
+    # stored timestamps are naive local wall-clock time (datetime.now()), so an
+    # aware value is converted to local time rather than compared as is
+    return dt if dt.tzinfo is None else dt.astimezone().replace(tzinfo=None)
+
+
+@lru_cache(maxsize=1024)
+def encode(dt: datetime) -> str:
+    dt = _naive(dt)
+    if dt.year >= 1000:
+        return dt.isoformat(sep=" ", timespec="seconds")
+    return dt.strftime(ISO_DT)
+
+
+def to_epoch_ms(dt: datetime) -> int:
+    return (_naive(dt) - _EPOCH) // _MS
+
+
+def from_epoch_ms(ms: float) -> datetime:
+    return _EPOCH + timedelta(milliseconds=ms)
@@ -0,0 +1,319 @@
+import ast
+import bisect
+import json
+import math
+import mmap
+import os
+import shutil
+import struct
+from array import array
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from itertools import compress
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
+
+from cgps.core.database import Database, stores_epoch
+from cgps.core.models.tracking_batch import (
+    _NULL_INT as NULL_INT,
+    FLOAT_COLUMNS,
+    INT_COLUMNS,
+    TIME_COLUMNS,
+)
+from cgps.core.timestamp_codec import to_epoch_ms
+from cgps.core.tracking_partitions import TrackingPartitions, month_key
+from cgps.core.utils import ISO_DT, to_dt
+
+Progress = Callable[[str], None]
+
+# Same column layout as TrackingBatch: NaN for NULL floats, _NULL_INT for NULL
+# integers, epoch ms for timestamps, -1/0/1 for engine_status.
+COLUMNS = {
+    **{name: "d" for name in FLOAT_COLUMNS},
+    **{name: "q" for name in INT_COLUMNS + TIME_COLUMNS},
+    "engine_status": "b",
+}
+_DESCR = {"d": "<f8", "q": "<i8", "b": "|i1"}
+_MAGIC = b"\x93NUMPY\x01\x00"
+_DAY = "%Y%m%d"
+
+
+def _quiet(_: str) -> None:
+    pass
+
+
+def write_npy(path: Path, values: array) -> None:
+    # NPY v1: magic, header length, a dict literal padded to 64 bytes, raw data;
+    # numpy.load(path, mmap_mode="r") reads these without numpy being needed here
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (
+        _DESCR[values.typecode],
+        len(values),
+    )
+    header += " " * (-(len(_MAGIC) + 2 + len(header) + 1) % 64) + "\n"
+    with open(path, "wb") as f:
+        f.write(_MAGIC + struct.pack("<H", len(header)) + header.encode("latin1"))
+        values.tofile(f)
+
+
+def map_npy(path: Path) -> tuple[mmap.mmap, memoryview]:
+    # memory-maps an NPY file written by write_npy; the view is zero-copy
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[: len(_MAGIC)] != _MAGIC:
+        mm.close()
+        raise ValueError(f"Not an NPY v1 file: {path}")
+    (size,) = struct.unpack_from("<H", mm, len(_MAGIC))
+    offset = len(_MAGIC) + 2 + size
+    header = ast.literal_eval(mm[len(_MAGIC) + 2 : offset].decode("latin1"))
+    typecode = {v: k for k, v in _DESCR.items()}[header["descr"]]
+    return mm, memoryview(mm)[offset:].cast(typecode)
+
+
+@dataclass
+class ColumnStats:
+    count: int = 0
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    mean: Optional[float] = None
+
+
+class ArchivedDay:
+    """One archived day: a memory-mapped ``memoryview`` per column, rows in
+    ``(created_at, id)`` order. Views stay valid until ``close()`` (or the end of a
+    ``with`` block), which needs any slices taken from them released first."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        self.day = datetime.strptime(self.meta["day"], _DAY).date()
+        self._maps: dict[str, tuple[mmap.mmap, memoryview]] = {}
+
+    def __enter__(self) -> "ArchivedDay":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        while self._maps:
+            _, (mm, view) = self._maps.popitem()
+            view.release()
+            mm.close()
+
+    def __len__(self) -> int:
+        return self.meta["rows"]
+
+    def column(self, name: str) -> memoryview:
+        if name not in COLUMNS:
+            raise ValueError(f"Unknown tracking column: {name}")
+        if name not in self._maps:
+            self._maps[name] = map_npy(self.path / f"{name}.npy")
+        return self._maps[name][1]
+
+    def rows_between(self, since: Optional[datetime], until: Optional[datetime]) -> slice:
+        # binary search on created_at, so a time range is a zero-copy slice
+        created = self.column("created_at")
+        start = 0 if since is None else bisect.bisect_left(created, to_epoch_ms(since))
+        stop = len(created) if until is None else bisect.bisect_left(created, to_epoch_ms(until))
+        return slice(start, max(start, stop))
+
+
+class TrackingArchive:
+    """Reader for the columnar archive written by ``TrackingArchiver``:
+    ``directory/YYYYMMDD/<column>.npy`` plus ``meta.json``."""
+
+    def __init__(self, directory: str = "cgps-archive"):
+        self._directory = Path(directory)
+
+    def days(self) -> List[date]:
+        if not self._directory.is_dir():
+            return []
+        return sorted(
+            datetime.strptime(p.name, _DAY).date()
+            for p in self._directory.iterdir()
+            if p.name.isdigit() and (p / "meta.json").exists()
+        )
+
+    def open(self, day: date) -> ArchivedDay:
+        return ArchivedDay(self._directory / day.strftime(_DAY))
+
+    def scan(
+        self,
+        columns: Sequence[str],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Iterator[dict[str, memoryview]]:
+        # per archived day in range: {column: view sliced to [since, until)}, valid
+        # until the next day is read
+        for day in self.days():
+            if since is not None and day < since.date():
+                continue
+            if until is not None and datetime.combine(day, time()) >= until:
+                break
+            with self.open(day) as archived:
+                rows = archived.rows_between(since, until)
+                if rows.start >= rows.stop:
+                    continue
+                views = {name: archived.column(name)[rows] for name in columns}
+                try:
+                    yield views
+                finally:
+                    for view in views.values():
+                        view.release()
+
+    def stats(
+        self,
+        column: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        car_id: Optional[int] = None,
+    ) -> ColumnStats:
+        # NULLs (NaN / NULL_INT) are skipped; one pass over the mapped views, summed
+        # with Neumaier compensation so months of values keep their precision
+        out = ColumnStats()
+        total = compensation = 0.0
+        kind = COLUMNS[column]
+        wanted = (column, "car_id") if car_id is not None else (column,)
+        for views in self.scan(wanted, since, until):
+            values: Iterable[Any] = views[column]
+            if car_id is not None:
+                values = compress(values, (c == car_id for c in views["car_id"]))
+            for v in values:
+                # NaN is the only value not equal to itself
+                if (v != v) if kind == "d" else (kind == "q" and v == NULL_INT):
+                    continue
+                out.count += 1
+                t = total + v
+                if abs(total) >= abs(v):
+                    compensation += (total - t) + v
+                else:
+                    compensation += (v - t) + total
+                total = t
+                if out.minimum is None or v < out.minimum:
+                    out.minimum = v
+                if out.maximum is None or v > out.maximum:
+                    out.maximum = v
+        if out.count:
+            out.mean = (total + compensation) / out.count
+        return out
+
+
+class TrackingArchiver:
+    """Exports closed days of ``trackings`` (before today) into the columnar
+    archive, one directory per day and one NPY file per column.
+
+    A day is written to a temp directory and renamed into place, and days already
+    archived are skipped, so ``export_closed()`` can run as often as needed. Run
+    it more often than ``tracking.retention.raw_days`` to keep full-resolution
+    history after the raw rows are purged.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        partitions: Optional[TrackingPartitions] = None,
+        directory: str = "cgps-archive",
+    ):
+        self._database = database
+        self._partitions = partitions if partitions is not None and partitions.enabled else None
+        self._directory = Path(directory)
+        self._archive = TrackingArchive(directory)
+
+    def _tables(self, day: date) -> List[tuple[str, Optional[str]]]:
+        if self._partitions is None:
+            return [("trackings", None)]
+        tables: List[tuple[str, Optional[str]]] = [("main.trackings", None)]
+        alias = self._partitions.ensure(month_key(datetime.combine(day, time())), create=False)
+        if alias is not None:
+            tables.append((f"{alias}.trackings", alias))
+        return tables
+
+    def _first_day(self) -> Optional[date]:
+        archived = self._archive.days()
+        if archived:
+            return archived[-1] + timedelta(days=1)
+        firsts = [
+            self._database.fetchone(f"SELECT MIN(created_at) AS at FROM {table}")
+            for table in ["trackings"]
+            + [f"{self._partitions.alias(m)}.trackings" for m in self._partition_months()]
+        ]
+        values = [to_dt(r["at"]) for r in firsts if r and r["at"] is not None]
+        return min(values).date() if values else None
+
+    def _partition_months(self) -> List[int]:
+        if self._partitions is None:
+            return []
+        months = self._partitions.months()[-1:]
+        for month in months:
+            self._partitions.ensure(month, create=False)
+        return months
+
+    def export_closed(
+        self, today: Optional[date] = None, progress: Progress = _quiet
+    ) -> List[date]:
+        today = today or date.today()
+        day = self._first_day()
+        done = []
+        while day is not None and day < today:
+            if self.export(day):
+                done.append(day)
+                progress(f"Archived {day.isoformat()}")
+            day += timedelta(days=1)
+        return done
+
+    def export(self, day: date) -> int:
+        target = self._directory / day.strftime(_DAY)
+        if (target / "meta.json").exists():
+            return 0
+        since = datetime.combine(day, time())
+        until = since + timedelta(days=1)
+        epoch = stores_epoch(self._database)
+        bounds = {
+            "since": to_epoch_ms(since) if epoch else since.strftime(ISO_DT),
+            "until": to_epoch_ms(until) if epoch else until.strftime(ISO_DT),
+        }
+        names = list(COLUMNS)
+        values = {name: array(code) for name, code in COLUMNS.items()}
+        tables = self._tables(day)
+        sql = " UNION ALL ".join(
+            f"SELECT {', '.join(names)} FROM {table}"
+            " WHERE created_at >= :since AND created_at < :until"
+            for table, _ in tables
+        )
+        schema = tables[-1][1]
+        rows = self._database.iterate_as(
+            f"{sql} ORDER BY created_at, id", bounds, lambda _: tuple, schema=schema
+        )
+        for row in rows:
+            for name, v in zip(names, row):
+                values[name].append(_encode(name, v))
+        if not values["id"]:
+            return 0
+        tmp = self._directory / f"{day.strftime(_DAY)}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for name, column in values.items():
+            write_npy(tmp / f"{name}.npy", column)
+        meta = {
+            "day": day.strftime(_DAY),
+            "rows": len(values["id"]),
+            "columns": COLUMNS,
+            "min_id": min(values["id"]),
+            "max_id": max(values["id"]),
+        }
+        (tmp / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, target)
+        return meta["rows"]
+
+
+def _encode(name: str, v: Any):
+    code = COLUMNS[name]
+    if code == "d":
+        return math.nan if v is None else float(v)
+    if code == "b":
+        return -1 if v is None else int(bool(v))
+    if v is None:
+        return NULL_INT
+    if name in TIME_COLUMNS:
+        return v if isinstance(v, int) else to_epoch_ms(to_dt(v))
+    return int(v)
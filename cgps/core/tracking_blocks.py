@@ -0,0 +1,293 @@
+import heapq
+import zlib
+from datetime import datetime
+from itertools import groupby
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
+
+from cgps.core.database import Database
+from cgps.core.models.tracking import Tracking
+from cgps.core.timestamp_codec import from_epoch_ms, to_epoch_ms
+from cgps.core.utils import to_dt
+
+Progress = Callable[[str], None]
+
+# one block per car and hour; a compaction batch boundary can split one further
+WINDOW_MS = 3_600_000
+PLAIN, ZLIB = 0, 1
+_VERSION = 1
+# stored as round(value * scale): 1e-6 degrees (~0.1 m), 0.01 for the rest
+_SCALED = (
+    ("latitude", 10**6),
+    ("longitude", 10**6),
+    ("speed_kmh", 100),
+    ("fuel_level", 100),
+    ("fuel_litre", 100),
+    ("fuel_kwh", 100),
+    ("engine_status", 1),
+    ("gps_signal_level", 100),
+    ("gsm_signal_level", 100),
+)
+_INSERT_BLOCK = (
+    "INSERT INTO tracking_blocks"
+    " (car_id, tracking_device_id, start_ms, end_ms, min_id, max_id, points, codec, data)"
+    " VALUES (:car_id, :tracking_device_id, :start_ms, :end_ms, :min_id, :max_id, :points,"
+    " :codec, :data)"
+)
+
+
+def _quiet(_: str) -> None:
+    pass
+
+
+def _put_column(out: bytearray, values: Iterable[Optional[int]]) -> None:
+    # Delta from the previous non-NULL value, zigzagged and shifted by one so
+    # that 0 means NULL, as a little-endian base-128 varint.
+    prev = 0
+    for v in values:
+        if v is None:
+            out.append(0)
+            continue
+        d = v - prev
+        prev = v
+        n = (d << 1 if d >= 0 else (-d << 1) - 1) + 1
+        while n > 0x7F:
+            out.append((n & 0x7F) | 0x80)
+            n >>= 7
+        out.append(n)
+
+
+def _get_column(data: bytes, pos: int, count: int) -> tuple[List[Optional[int]], int]:
+    out: List[Optional[int]] = []
+    prev = 0
+    for _ in range(count):
+        n = shift = 0
+        while True:
+            b = data[pos]
+            pos += 1
+            n |= (b & 0x7F) << shift
+            if b < 0x80:
+                break
+            shift += 7
+        if n == 0:
+            out.append(None)
+            continue
+        n -= 1
+        prev += -((n + 1) >> 1) if n & 1 else n >> 1
+        out.append(prev)
+    return out, pos
+
+
+def encode_block(points: Sequence[dict[str, Any]], compress: bool = True) -> tuple[int, bytes]:
+    # points: {"id", "created_ms", <_SCALED columns>}; returns (codec, data)
+    out = bytearray([_VERSION])
+    _put_column(out, [len(points)])
+    _put_column(out, [p["id"] for p in points])
+    _put_column(out, [p["created_ms"] for p in points])
+    for column, scale in _SCALED:
+        _put_column(
+            out, [None if p[column] is None else round(p[column] * scale) for p in points]
+        )
+    if compress:
+        return ZLIB, zlib.compress(bytes(out), 6)
+    return PLAIN, bytes(out)
+
+
+def decode_block(codec: int, data: bytes) -> dict[str, list]:
+    # column name -> values, floats unscaled; "created_ms" holds epoch ms
+    if codec == ZLIB:
+        data = zlib.decompress(data)
+    if data[0] != _VERSION:
+        raise ValueError(f"Unknown tracking block version: {data[0]}")
+    (count,), pos = _get_column(data, 1, 1)
+    columns: dict[str, list] = {}
+    columns["id"], pos = _get_column(data, pos, count)
+    columns["created_ms"], pos = _get_column(data, pos, count)
+    for column, scale in _SCALED:
+        values, pos = _get_column(data, pos, count)
+        if scale == 1:
+            columns[column] = values
+        else:
+            columns[column] = [None if v is None else v / scale for v in values]
+    return columns
+
+
+class TrackingBlocks:
+    """Delta/varint-compressed tracking history in ``tracking_blocks``.
+
+    ``compact()`` moves rows of a trackings table into blocks of one car and up to an
+    hour, each column delta-encoded as varints (positions as fixed-point 1e-6
+    degrees, other measurements to 0.01) and optionally zlib-compressed, then deletes
+    the rows. ``updated_at`` is not stored; it reads back equal to ``created_at``.
+    ``rows()`` decodes them back into ``Tracking`` objects in time order.
+    """
+
+    def __init__(self, database: Database, enabled: bool = False, compress: bool = True):
+        self._database = database
+        self.enabled = bool(enabled)
+        self._compress = bool(compress)
+
+    def compact(
+        self,
+        table: str,
+        cutoff: Any = None,
+        watermark: Optional[int] = None,
+        batch_rows: int = 5000,
+        progress: Progress = _quiet,
+    ) -> int:
+        # rows of `table` with created_at < cutoff and id <= watermark (None: no
+        # bound), car by car, one transaction per batch_rows
+        conditions, params = [], []
+        if cutoff is not None:
+            conditions.append("created_at < ?")
+            params.append(cutoff)
+        if watermark is not None:
+            conditions.append("id <= ?")
+            params.append(watermark)
+        where = "".join(f" AND {c}" for c in conditions)
+        cars = self._database.fetchall(
+            f"SELECT DISTINCT car_id FROM {table} WHERE 1 = 1{where}", tuple(params)
+        )
+        total = 0
+        for car in cars:
+            while True:
+                rows = self._database.fetchall(
+                    f"SELECT * FROM {table} WHERE car_id = ?{where}"
+                    " ORDER BY created_at, id LIMIT ?",
+                    (car["car_id"], *params, batch_rows),
+                )
+                if not rows:
+                    break
+                self._move(table, rows)
+                total += len(rows)
+                progress(f"Compacted {total} rows from {table}")
+                if len(rows) < batch_rows:
+                    break
+        return total
+
+    def _move(self, table: str, rows: List[dict[str, Any]]) -> None:
+        blocks = []
+        for r in rows:
+            created = r["created_at"]
+            r["created_ms"] = created if isinstance(created, int) else to_epoch_ms(to_dt(created))
+        # rows are in created_at order; a block is one hour of one device
+        for (_, device), group in groupby(
+            rows, key=lambda r: (r["created_ms"] // WINDOW_MS, r["tracking_device_id"])
+        ):
+            points = list(group)
+            codec, data = encode_block(points, self._compress)
+            ids = [p["id"] for p in points]
+            blocks.append(
+                {
+                    "car_id": points[0]["car_id"],
+                    "tracking_device_id": device,
+                    "start_ms": points[0]["created_ms"],
+                    "end_ms": points[-1]["created_ms"],
+                    "min_id": min(ids),
+                    "max_id": max(ids),
+                    "points": len(points),
+                    "codec": codec,
+                    "data": data,
+                }
+            )
+        ids = [(r["id"],) for r in rows]
+        with self._database.transaction() as conn:
+            self._database.executemany(_INSERT_BLOCK, blocks)
+            conn.executemany(f"DELETE FROM {table} WHERE id = ?", ids)
+            conn.executemany("DELETE FROM main.tracking_rtree WHERE id = ?", ids)
+
+    def rows(
+        self,
+        car_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        newest_first: bool = False,
+        after: Optional[tuple[int, int]] = None,
+    ) -> Iterator[Tracking]:
+        # In (created_at, id) order, or the reverse. Blocks are read lazily by start
+        # time and merged through a heap, since blocks of different cars overlap.
+        # after: (created ms, id) to continue past, oldest first only.
+        since_ms = to_epoch_ms(since) if since is not None else None
+        until_ms = to_epoch_ms(until) if until is not None else None
+        if after is not None:
+            since_ms = after[0] if since_ms is None else max(since_ms, after[0])
+        conditions, params = [], []
+        if car_id is not None:
+            conditions.append("car_id = ?")
+            params.append(str(car_id))
+        if since_ms is not None:
+            conditions.append("start_ms >= ?")
+            params.append(since_ms - WINDOW_MS)
+        if until_ms is not None:
+            conditions.append("start_ms < ?")
+            params.append(until_ms)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        blocks = self._database.iterate_as(
+            "SELECT car_id, tracking_device_id, start_ms, codec, data FROM tracking_blocks"
+            f"{where} ORDER BY start_ms {'DESC' if newest_first else 'ASC'}",
+            tuple(params),
+            lambda _: tuple,
+        )
+        sign = -1 if newest_first else 1
+        heap: list[tuple[int, int, Tracking]] = []
+        for car, device, start_ms, codec, data in blocks:
+            # nothing from this or a later block sorts before `bound`
+            bound = sign * (start_ms + WINDOW_MS if newest_first else start_ms)
+            while heap and heap[0][0] < bound:
+                yield heapq.heappop(heap)[2]
+            columns = decode_block(codec, data)
+            for i, created_ms in enumerate(columns["created_ms"]):
+                tracking_id = columns["id"][i]
+                if since_ms is not None and created_ms < since_ms:
+                    continue
+                if until_ms is not None and created_ms >= until_ms:
+                    continue
+                if after is not None and (created_ms, tracking_id) <= after:
+                    continue
+                heapq.heappush(
+                    heap,
+                    (
+                        sign * created_ms,
+                        sign * tracking_id,
+                        _tracking(columns, i, car, device, created_ms),
+                    ),
+                )
+        while heap:
+            yield heapq.heappop(heap)[2]
+
+    def locate(self, tracking_id: int) -> Optional[Tracking]:
+        for block in self._database.fetchall(
+            "SELECT car_id, tracking_device_id, codec, data FROM tracking_blocks"
+            " WHERE min_id <= ? AND max_id >= ?",
+            (tracking_id, tracking_id),
+        ):
+            columns = decode_block(block["codec"], block["data"])
+            if tracking_id in columns["id"]:
+                i = columns["id"].index(tracking_id)
+                created_ms = columns["created_ms"][i]
+                return _tracking(
+                    columns, i, block["car_id"], block["tracking_device_id"], created_ms
+                )
+        return None
+
+
+def _tracking(
+    columns: dict[str, list], i: int, car_id: Any, device: Any, created_ms: int
+) -> Tracking:
+    created_at = from_epoch_ms(created_ms)
+    engine = columns["engine_status"][i]
+    return Tracking(
+        id=columns["id"][i],
+        latitude=columns["latitude"][i],
+        longitude=columns["longitude"][i],
+        fuel_level=columns["fuel_level"][i],
+        fuel_litre=columns["fuel_litre"][i],
+        fuel_kwh=columns["fuel_kwh"][i],
+        speed_kmh=columns["speed_kmh"][i],
+        engine_status=None if engine is None else bool(engine),
+        gps_signal_level=columns["gps_signal_level"][i],
+        gsm_signal_level=columns["gsm_signal_level"][i],
+        car_id=car_id,
+        tracking_device_id=device,
+        created_at=created_at,
+        updated_at=created_at,
+    )
@@ -0,0 +1,228 @@
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, List, Optional
+
+from cgps.core.database import Database
+from cgps.core.timestamp_codec import to_epoch_ms
+from cgps.core.utils import to_dt
+
+_FILE = re.compile(r"^trackings-(\d{6})\.db$")
+_CREATE_INDEX = re.compile(r"^CREATE INDEX (?:IF NOT EXISTS )?(\w+) ON", re.IGNORECASE)
+# ids in a partition start at month * ID_SPAN, so they stay unique and keep
+# insertion order across partitions and the legacy main.trackings table
+ID_SPAN = 10**10
+
+
+def month_key(value: Any) -> int:
+    # datetime, ISO text or epoch ms -> YYYYMM
+    dt = value if isinstance(value, datetime) else to_dt(value)
+    return dt.year * 100 + dt.month
+
+
+def month_of_id(tracking_id: int) -> Optional[int]:
+    # the partition month that handed out this id; None for a main.trackings id
+    return tracking_id // ID_SPAN if tracking_id >= ID_SPAN else None
+
+
+def _next_month(month: int) -> int:
+    year, m = divmod(month, 100)
+    return (year + 1) * 100 + 1 if m == 12 else month + 1
+
+
+class TrackingPartitions:
+    """Monthly tracking partitions, one SQLite file per month.
+
+    ``trackings-YYYYMM.db`` in ``directory`` holds the month's rows in its own
+    ``trackings`` table and is ATTACHed as ``trk_YYYYMM`` when first needed. At
+    most ``max_attached`` partitions stay attached (SQLite allows 10); the least
+    recently used one is detached to make room. Dropping a month detaches it and
+    deletes the file.
+
+    A ``Database.snapshot()`` only sees partitions attached before it began, so
+    the newest months are attached up front by ``warm()``.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        directory: str = "cgps-trackings",
+        enabled: bool = False,
+        max_attached: int = 8,
+    ):
+        self._database = database
+        self._directory = Path(directory)
+        self.enabled = bool(enabled)
+        self._max_attached = max(1, min(int(max_attached), 9))
+        self._lock = threading.RLock()
+        self._attached: OrderedDict[int, str] = OrderedDict()
+
+    @staticmethod
+    def alias(month: int) -> str:
+        return f"trk_{month}"
+
+    def path(self, month: int) -> Path:
+        return self._directory / f"trackings-{month}.db"
+
+    def months(self) -> List[int]:
+        # newest first
+        if not self._directory.is_dir():
+            return []
+        found = (_FILE.match(p.name) for p in self._directory.iterdir())
+        return sorted((int(m.group(1)) for m in found if m), reverse=True)
+
+    def months_between(self, since: Any = None, until: Any = None) -> List[int]:
+        low = month_key(since) if since is not None else None
+        high = month_key(until) if until is not None else None
+        return [
+            m
+            for m in self.months()
+            if (low is None or m >= low) and (high is None or m <= high)
+        ]
+
+    def warm(self) -> None:
+        for month in reversed(self.months()[: self._max_attached]):
+            self.ensure(month, create=False)
+
+    def ensure(self, month: int, create: bool = True) -> Optional[str]:
+        # Attaches the month's partition and returns its alias; None when the file
+        # does not exist and create is False. Creating a month also creates the next
+        # one so ingest does not stall on the schema at the turn of the month.
+        alias = self._ensure(month, create)
+        if create and not self.path(_next_month(month)).exists():
+            self._ensure(_next_month(month), create=True)
+        return alias
+
+    def ensure_many(self, months: Iterable[int]) -> dict[int, str]:
+        # Creates and attaches all of `months` at once (one insert batch), so none
+        # of them is evicted by another; at most max_attached months per call.
+        months = sorted(set(months))
+        if len(months) > self._max_attached:
+            raise ValueError(
+                f"{len(months)} months in one batch; at most {self._max_attached} attach"
+            )
+        if not self.path(_next_month(months[-1])).exists():
+            self._ensure(_next_month(months[-1]), create=True)
+        with self._lock:
+            # already attached ones become most recent, so only others are evicted
+            for month in months:
+                if month in self._attached:
+                    self._attached.move_to_end(month)
+            return {month: self._ensure(month, create=True) for month in months}
+
+    def _ensure(self, month: int, create: bool) -> Optional[str]:
+        with self._lock:
+            alias = self._attached.get(month)
+            if alias is not None:
+                self._attached.move_to_end(month)
+                return alias
+            path = self.path(month)
+            if not path.exists() and not create:
+                return None
+            self._directory.mkdir(parents=True, exist_ok=True)
+            while len(self._attached) >= self._max_attached:
+                _, evicted = self._attached.popitem(last=False)
+                self._database.detach(evicted)
+            alias = self.alias(month)
+            self._database.attach(alias, str(path))
+            self._attached[month] = alias
+            if create:
+                self._create_schema(alias, month)
+            self._sync_indexes(alias)
+        return alias
+
+    def _create_schema(self, alias: str, month: int) -> None:
+        # Same columns and types as main.trackings (so the epoch_ms mode carries
+        # over), without the foreign keys, which cannot cross database files.
+        with self._database.writer() as conn:
+            # journal_mode and synchronous are per file and not inherited by ATTACH
+            for pragma in ("journal_mode", "synchronous"):
+                value = conn.execute(f"PRAGMA main.{pragma}").fetchone()[0]
+                conn.execute(f"PRAGMA {alias}.{pragma} = {value}").fetchall()
+            columns = conn.execute("PRAGMA main.table_info(trackings)").fetchall()
+        defs = []
+        for c in columns:
+            if c["name"] == "id":
+                defs.append("id INTEGER PRIMARY KEY AUTOINCREMENT")
+            else:
+                defs.append(f"{c['name']} {c['type']}{' NOT NULL' if c['notnull'] else ''}")
+        with self._database.transaction() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {alias}.trackings ({', '.join(defs)})")
+            conn.execute(
+                f"INSERT INTO {alias}.sqlite_sequence (name, seq)"
+                " SELECT 'trackings', ? WHERE NOT EXISTS"
+                f" (SELECT 1 FROM {alias}.sqlite_sequence WHERE name = 'trackings')",
+                (self._first_seq(conn, month),),
+            )
+
+    @staticmethod
+    def _first_seq(conn: sqlite3.Connection, month: int) -> int:
+        # A month dropped after its rows were compacted into main.tracking_blocks
+        # (migrations/0009) continues after their ids when it is created again.
+        seq = month * ID_SPAN
+        if conn.execute(
+            "SELECT 1 FROM main.sqlite_master WHERE name = 'tracking_blocks'"
+        ).fetchone() is None:
+            return seq
+        row = conn.execute(
+            "SELECT MAX(max_id) FROM main.tracking_blocks WHERE min_id >= ? AND min_id < ?",
+            (seq, (month + 1) * ID_SPAN),
+        ).fetchone()
+        return max(seq, row[0] or 0)
+
+    def _sync_indexes(self, alias: str) -> None:
+        # main.trackings' indexes, so a migration adding one also reaches partitions
+        # (built once, the first time an older partition is attached afterwards)
+        rows = self._database.fetchall(
+            "SELECT sql FROM main.sqlite_master"
+            " WHERE type = 'index' AND tbl_name = 'trackings' AND sql IS NOT NULL"
+        )
+        with self._database.transaction() as conn:
+            for r in rows:
+                if _CREATE_INDEX.match(r["sql"]):
+                    conn.execute(
+                        _CREATE_INDEX.sub(rf"CREATE INDEX IF NOT EXISTS {alias}.\1 ON", r["sql"])
+                    )
+
+    def drop(self, month: int) -> bool:
+        with self._lock:
+            alias = self._attached.pop(month, None)
+            if alias is not None:
+                self._database.detach(alias)
+            path = self.path(month)
+            existed = path.exists()
+            for suffix in ("", "-wal", "-shm", "-journal"):
+                Path(f"{path}{suffix}").unlink(missing_ok=True)
+            if existed:
+                self._unindex(month)
+        return existed
+
+    def _unindex(self, month: int) -> None:
+        # the month's boxes in main.tracking_rtree (migrations/0006); the time range
+        # lets the R*Tree find them instead of scanning every box
+        if self._database.fetchone(
+            "SELECT 1 FROM main.sqlite_master WHERE name = 'tracking_rtree'"
+        ) is None:
+            return
+        start = datetime(month // 100, month % 100, 1)
+        end = datetime(_next_month(month) // 100, _next_month(month) % 100, 1)
+        with self._database.transaction() as conn:
+            conn.execute(
+                "DELETE FROM main.tracking_rtree WHERE id IN (SELECT id FROM main.tracking_rtree"
+                " WHERE min_t <= ? AND max_t >= ? AND id >= ? AND id < ?)",
+                (
+                    to_epoch_ms(end) // 1000,
+                    to_epoch_ms(start) // 1000,
+                    month * ID_SPAN,
+                    (month + 1) * ID_SPAN,
+                ),
+            )
+
+    def drop_all(self) -> int:
+        months = self.months()
+        for month in months:
+            self.drop(month)
+        return len(months)
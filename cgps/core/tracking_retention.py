@@ -0,0 +1,360 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterator, List, Optional
+
+from cgps.core.database import Database, stores_epoch
+from cgps.core.timestamp_codec import to_epoch_ms
+from cgps.core.tracking_blocks import TrackingBlocks
+from cgps.core.tracking_partitions import TrackingPartitions, month_key
+from cgps.core.utils import ISO_DT, distance_km, insert_columns, to_dt
+
+Progress = Callable[[str], None]
+
+_RAW_COLUMNS = (
+    "id, car_id, created_at, latitude, longitude, speed_kmh, fuel_level,"
+    " engine_status, gps_signal_level, gsm_signal_level"
+)
+_ROLLUP_COLUMNS = (
+    "car_id",
+    "bucket",
+    "samples",
+    "avg_speed_kmh",
+    "max_speed_kmh",
+    "fuel_delta",
+    "distance_km",
+    "engine_on_sec",
+    "min_gps_signal",
+    "min_gsm_signal",
+)
+_CURSOR_COLUMNS = (
+    "car_id",
+    "id",
+    "created_at",
+    "latitude",
+    "longitude",
+    "fuel_level",
+    "engine_status",
+)
+
+
+def _quiet(_: str) -> None:
+    pass
+
+
+def _upsert_rollup(table: str) -> str:
+    # merges a partial bucket into the stored one; the SET expressions all see the
+    # old row, so the average is weighted by the old and new sample counts
+    return f"""
+        INSERT INTO {table} {insert_columns(_ROLLUP_COLUMNS)}
+        ON CONFLICT (car_id, bucket) DO UPDATE SET
+          samples = samples + excluded.samples,
+          avg_speed_kmh = CASE
+            WHEN excluded.avg_speed_kmh IS NULL THEN avg_speed_kmh
+            WHEN avg_speed_kmh IS NULL THEN excluded.avg_speed_kmh
+            ELSE (avg_speed_kmh * samples + excluded.avg_speed_kmh * excluded.samples)
+                 / (samples + excluded.samples)
+          END,
+          max_speed_kmh = MAX(
+            COALESCE(max_speed_kmh, excluded.max_speed_kmh),
+            COALESCE(excluded.max_speed_kmh, max_speed_kmh)
+          ),
+          fuel_delta = fuel_delta + excluded.fuel_delta,
+          distance_km = distance_km + excluded.distance_km,
+          engine_on_sec = engine_on_sec + excluded.engine_on_sec,
+          min_gps_signal = MIN(
+            COALESCE(min_gps_signal, excluded.min_gps_signal),
+            COALESCE(excluded.min_gps_signal, min_gps_signal)
+          ),
+          min_gsm_signal = MIN(
+            COALESCE(min_gsm_signal, excluded.min_gsm_signal),
+            COALESCE(excluded.min_gsm_signal, min_gsm_signal)
+          )
+    """
+
+
+_UPSERT_MINUTE = _upsert_rollup("tracking_rollups_minute")
+_UPSERT_HOUR = _upsert_rollup("tracking_rollups_hour")
+_UPSERT_CURSOR = (
+    f"INSERT OR REPLACE INTO tracking_rollup_cursor {insert_columns(_CURSOR_COLUMNS)}"
+)
+
+
+def _min(a: Optional[float], b: Optional[float]) -> Optional[float]:
+    if a is None:
+        return b
+    return a if b is None else min(a, b)
+
+
+@dataclass
+class _Bucket:
+    samples: int = 0
+    speed_sum: float = 0.0
+    speed_count: int = 0
+    max_speed_kmh: Optional[float] = None
+    fuel_delta: float = 0.0
+    distance_km: float = 0.0
+    engine_on_sec: float = 0.0
+    min_gps_signal: Optional[float] = None
+    min_gsm_signal: Optional[float] = None
+
+    def add(self, row: dict[str, Any]) -> None:
+        self.samples += 1
+        speed = row["speed_kmh"]
+        if speed is not None:
+            self.speed_sum += speed
+            self.speed_count += 1
+            self.max_speed_kmh = max(speed, self.max_speed_kmh or speed)
+        self.min_gps_signal = _min(self.min_gps_signal, row["gps_signal_level"])
+        self.min_gsm_signal = _min(self.min_gsm_signal, row["gsm_signal_level"])
+
+    def params(self, car_id: str, bucket: datetime) -> dict[str, Any]:
+        return {
+            "car_id": car_id,
+            "bucket": bucket.strftime(ISO_DT),
+            "samples": self.samples,
+            "avg_speed_kmh": self.speed_sum / self.speed_count if self.speed_count else None,
+            "max_speed_kmh": self.max_speed_kmh,
+            "fuel_delta": self.fuel_delta,
+            "distance_km": self.distance_km,
+            "engine_on_sec": self.engine_on_sec,
+            "min_gps_signal": self.min_gps_signal,
+            "min_gsm_signal": self.min_gsm_signal,
+        }
+
+
+@dataclass
+class RetentionResult:
+    rolled_up: int = 0
+    purged: int = 0
+    dropped_months: List[int] = field(default_factory=list)
+    minute_buckets_purged: int = 0
+    compacted: int = 0
+
+
+class TrackingRetention:
+    """Rolls raw trackings into ``tracking_rollups_minute``/``_hour`` and purges
+    what the rollups have made redundant.
+
+    ``rollup()`` reads raw rows past the watermark (``MAX(id)`` of
+    ``tracking_rollup_cursor``) in id order, ``batch_rows`` at a time, and merges
+    each batch into the rollups in its own transaction together with the per-car
+    cursors, so it can be interrupted and resumed. Consecutive samples of a car
+    more than ``max_gap_sec`` apart (device offline) add no distance, fuel delta
+    or engine time.
+
+    ``purge()`` deletes raw rows older than ``raw_days`` that are already rolled
+    up, in ``batch_rows`` transactions; with partitions, months wholly past the
+    horizon are dropped as files instead. Minute buckets older than
+    ``minute_days`` go too (0 keeps them); hour buckets are kept.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        partitions: Optional[TrackingPartitions] = None,
+        raw_days: float = 7,
+        minute_days: float = 90,
+        batch_rows: int = 5000,
+        max_gap_sec: float = 300,
+        blocks: Optional[TrackingBlocks] = None,
+    ):
+        self._database = database
+        self._partitions = partitions if partitions is not None and partitions.enabled else None
+        self._raw_days = float(raw_days)
+        self._minute_days = float(minute_days or 0)
+        self._batch_rows = max(1, int(batch_rows))
+        self._max_gap = float(max_gap_sec)
+        self._blocks = blocks if blocks is not None and blocks.enabled else None
+
+    def run(self, now: Optional[datetime] = None, progress: Progress = _quiet) -> RetentionResult:
+        result = RetentionResult(rolled_up=self.rollup(progress))
+        self.purge(result, now, progress)
+        return result
+
+    def _sources(self, until_month: Optional[int] = None) -> Iterator[str]:
+        # oldest first, matching id order: main.trackings, then partitions by month
+        if self._partitions is None:
+            yield "trackings"
+            return
+        yield "main.trackings"
+        for month in reversed(self._partitions.months()):
+            if until_month is not None and month > until_month:
+                break
+            alias = self._partitions.ensure(month, create=False)
+            if alias is not None:
+                yield f"{alias}.trackings"
+
+    def _load_cursors(self) -> dict[str, dict[str, Any]]:
+        rows = self._database.fetchall("SELECT * FROM tracking_rollup_cursor")
+        return {r["car_id"]: r for r in rows}
+
+    def watermark(self) -> int:
+        row = self._database.fetchone("SELECT MAX(id) AS id FROM tracking_rollup_cursor")
+        return (row or {}).get("id") or 0
+
+    def rollup(self, progress: Progress = _quiet) -> int:
+        cursors = self._load_cursors()
+        watermark = max((c["id"] for c in cursors.values()), default=0)
+        total = 0
+        for table in self._sources():
+            while True:
+                rows = self._database.fetchall(
+                    f"SELECT {_RAW_COLUMNS} FROM {table} WHERE id > ? ORDER BY id LIMIT ?",
+                    (watermark, self._batch_rows),
+                )
+                if not rows:
+                    break
+                self._merge(rows, cursors)
+                watermark = rows[-1]["id"]
+                total += len(rows)
+                progress(f"Rolled up {total} rows from {table}")
+                if len(rows) < self._batch_rows:
+                    break
+        return total
+
+    def _merge(self, rows: List[dict[str, Any]], cursors: dict[str, dict[str, Any]]) -> None:
+        minutes: dict[tuple[str, datetime], _Bucket] = {}
+        hours: dict[tuple[str, datetime], _Bucket] = {}
+        touched: dict[str, dict[str, Any]] = {}
+        for row in rows:
+            car_id = str(row["car_id"])
+            at = to_dt(row["created_at"])
+            minute = at.replace(second=0, microsecond=0)
+            buckets = (
+                minutes.setdefault((car_id, minute), _Bucket()),
+                hours.setdefault((car_id, minute.replace(minute=0)), _Bucket()),
+            )
+            for b in buckets:
+                b.add(row)
+            prev = cursors.get(car_id)
+            if prev is not None:
+                prev_at = to_dt(prev["created_at"])
+                if (at, row["id"]) <= (prev_at, prev["id"]):
+                    # a late row is counted but leaves the cursor where it is in
+                    # time; only its id moves up, as MAX(id) is the watermark
+                    prev["id"] = max(prev["id"], row["id"])
+                    touched[car_id] = prev
+                    continue
+                gap = (at - prev_at).total_seconds()
+                if 0 < gap <= self._max_gap:
+                    self._add_interval(buckets, prev, row, gap)
+            cursor = {
+                "car_id": car_id,
+                "id": row["id"],
+                "created_at": at.strftime(ISO_DT),
+                "latitude": row["latitude"],
+                "longitude": row["longitude"],
+                "fuel_level": row["fuel_level"],
+                "engine_status": row["engine_status"],
+            }
+            cursors[car_id] = touched[car_id] = cursor
+        with self._database.transaction():
+            self._database.executemany(
+                _UPSERT_MINUTE, [b.params(car, at) for (car, at), b in minutes.items()]
+            )
+            self._database.executemany(
+                _UPSERT_HOUR, [b.params(car, at) for (car, at), b in hours.items()]
+            )
+            self._database.executemany(_UPSERT_CURSOR, list(touched.values()))
+
+    @staticmethod
+    def _add_interval(
+        buckets: tuple[_Bucket, ...], prev: dict[str, Any], row: dict[str, Any], gap: float
+    ) -> None:
+        # the interval prev -> row is credited to row's buckets
+        coords = (prev["latitude"], prev["longitude"], row["latitude"], row["longitude"])
+        distance = distance_km(*coords) if None not in coords else 0.0
+        fuel = (
+            row["fuel_level"] - prev["fuel_level"]
+            if row["fuel_level"] is not None and prev["fuel_level"] is not None
+            else 0.0
+        )
+        engine = gap if prev["engine_status"] else 0.0
+        for b in buckets:
+            b.distance_km += distance
+            b.fuel_delta += fuel
+            b.engine_on_sec += engine
+
+    def purge(
+        self,
+        result: Optional[RetentionResult] = None,
+        now: Optional[datetime] = None,
+        progress: Progress = _quiet,
+    ) -> RetentionResult:
+        result = result or RetentionResult()
+        now = now or datetime.now()
+        cutoff = now - timedelta(days=self._raw_days)
+        watermark = self.watermark()
+        if self._partitions is not None:
+            for month in self._partitions.months():
+                # whole month before the cutoff month and fully rolled up: drop the file
+                if month >= month_key(cutoff) or not self._rolled_up(month, watermark):
+                    continue
+                if self._blocks is not None:
+                    alias = self._partitions.ensure(month, create=False)
+                    result.compacted += self._blocks.compact(
+                        f"{alias}.trackings", None, watermark, self._batch_rows, progress
+                    )
+                self._partitions.drop(month)
+                result.dropped_months.append(month)
+                progress(f"Dropped partition {month}")
+        value = to_epoch_ms(cutoff) if stores_epoch(self._database) else cutoff.strftime(ISO_DT)
+        for table in self._sources(until_month=month_key(cutoff)):
+            if self._blocks is not None:
+                result.compacted += self._blocks.compact(
+                    table, value, watermark, self._batch_rows, progress
+                )
+                continue
+            result.purged += self._delete_batches(
+                f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table}"
+                " WHERE created_at < :cutoff AND id <= :watermark LIMIT :batch)"
+                " RETURNING id",
+                {"cutoff": value, "watermark": watermark, "batch": self._batch_rows},
+                progress,
+                f"Purged raw rows from {table}",
+                unindex=True,
+            )
+        if self._minute_days > 0:
+            minute_cutoff = now - timedelta(days=self._minute_days)
+            result.minute_buckets_purged = self._delete_batches(
+                "DELETE FROM tracking_rollups_minute WHERE (car_id, bucket) IN"
+                " (SELECT car_id, bucket FROM tracking_rollups_minute"
+                " WHERE bucket < :cutoff LIMIT :batch)",
+                {"cutoff": minute_cutoff.strftime(ISO_DT), "batch": self._batch_rows},
+                progress,
+                "Purged minute rollups",
+            )
+        return result
+
+    def _rolled_up(self, month: int, watermark: int) -> bool:
+        alias = self._partitions.ensure(month, create=False)
+        row = self._database.fetchone(f"SELECT MAX(id) AS id FROM {alias}.trackings")
+        last = (row or {}).get("id")
+        return last is None or last <= watermark
+
+    def _delete_batches(
+        self,
+        sql: str,
+        params: dict[str, Any],
+        progress: Progress,
+        label: str,
+        unindex: bool = False,
+    ) -> int:
+        # one transaction per batch so ingest gets the writer lock in between;
+        # unindex: sql returns trackings ids, removed from tracking_rtree as well
+        total = 0
+        while True:
+            with self._database.transaction() as conn:
+                if unindex:
+                    ids = conn.execute(sql, params).fetchall()
+                    conn.executemany(
+                        "DELETE FROM main.tracking_rtree WHERE id = ?", [(r[0],) for r in ids]
+                    )
+                    deleted = len(ids)
+                else:
+                    deleted = conn.execute(sql, params).rowcount
+            total += max(deleted, 0)
+            if deleted < self._batch_rows:
+                break
+            progress(f"{label}: {total}")
+        return total
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Iterable, List, Optional, Sequence
+
+from cgps.core.database import Database
+from cgps.core.utils import ISO_DT, distance_km, insert_columns, to_dt
+
+if TYPE_CHECKING:
+    from cgps.core.services.tracking_service import TrackingService
+
+Progress = Callable[[str], None]
+
+# tracking column -> the trip / trip_state column summing its drops
+_FUELS = (
+    ("fuel_level", "fuel_used"),
+    ("fuel_litre", "fuel_used_litre"),
+    ("fuel_kwh", "fuel_used_kwh"),
+)
+_STATE_COLUMNS = (
+    "car_id",
+    "last_id",
+    "last_at",
+    "last_lat",
+    "last_lng",
+    "last_fuel_level",
+    "last_fuel_litre",
+    "last_fuel_kwh",
+    "start_id",
+    "started_at",
+    "start_lat",
+    "start_lng",
+    "distance_km",
+    "max_speed_kmh",
+    "fuel_used",
+    "fuel_used_litre",
+    "fuel_used_kwh",
+    "moving_id",
+    "moving_at",
+    "moving_lat",
+    "moving_lng",
+)
+_TRIP_COLUMNS = (
+    "car_id",
+    "start_tracking_id",
+    "end_tracking_id",
+    "started_at",
+    "ended_at",
+    "start_lat",
+    "start_lng",
+    "end_lat",
+    "end_lng",
+    "distance_km",
+    "duration_sec",
+    "max_speed_kmh",
+    "fuel_used",
+    "fuel_used_litre",
+    "fuel_used_kwh",
+)
+_UPSERT_STATE = f"INSERT OR REPLACE INTO trip_state {insert_columns(_STATE_COLUMNS)}"
+_INSERT_TRIP = f"INSERT INTO trips {insert_columns(_TRIP_COLUMNS)}"
+
+
+def _quiet(_: str) -> None:
+    pass
+
+
+class TripSegmenter:
+    """Incremental trip segmentation, run by ``TrackingService.insert_batch`` inside
+    its transaction (see ``migrations/0008_trips.sql`` for the trip rules).
+
+    Only each car's ``trip_state`` row is read per batch, never the history, and a
+    trip becomes a ``trips`` row when it ends. A sample older than the last one seen
+    for its car is ignored. ``rebuild()`` replays the stored history for databases
+    that had trackings before this existed.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        enabled: bool = True,
+        min_speed_kmh: float = 3.0,
+        stop_sec: float = 300,
+        max_gap_sec: float = 300,
+    ):
+        self._database = database
+        self.enabled = bool(enabled)
+        self._min_speed = float(min_speed_kmh)
+        self._stop_sec = float(stop_sec)
+        self._max_gap = float(max_gap_sec)
+
+    def process(self, rows: Sequence[dict[str, Any]], ids: Sequence[int]) -> int:
+        # rows as insert_batch writes them, ids the trackings ids they got;
+        # returns the number of trips that ended
+        samples = sorted(
+            (str(r["car_id"]), to_dt(r["created_at"]), new_id, r)
+            for r, new_id in zip(rows, ids)
+            if r.get("car_id") is not None and r.get("created_at") is not None
+        )
+        if not samples:
+            return 0
+        states = self._load({s[0] for s in samples})
+        trips: List[dict[str, Any]] = []
+        for car, at, tracking_id, row in samples:
+            states[car] = self._step(states.get(car), car, at, tracking_id, row, trips)
+        self._database.executemany(_UPSERT_STATE, list(states.values()))
+        if trips:
+            self._database.executemany(_INSERT_TRIP, trips)
+        return len(trips)
+
+    def _load(self, cars: Iterable[str]) -> dict[str, dict[str, Any]]:
+        rows = self._database.fetchall(
+            "SELECT * FROM trip_state WHERE car_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(sorted(cars)),),
+        )
+        return {r["car_id"]: r for r in rows}
+
+    def _step(
+        self,
+        state: Optional[dict[str, Any]],
+        car: str,
+        at: datetime,
+        tracking_id: int,
+        row: dict[str, Any],
+        trips: List[dict[str, Any]],
+    ) -> dict[str, Any]:
+        if state is None:
+            state = dict.fromkeys(_STATE_COLUMNS)
+            state["car_id"] = car
+        else:
+            last_at = to_dt(state["last_at"])
+            if (at, tracking_id) <= (last_at, state["last_id"]):
+                return state
+            if state["start_id"] is not None:
+                if (at - last_at).total_seconds() > self._max_gap:
+                    self._close(state, trips)
+                else:
+                    self._add_interval(state, row)
+        speed = row.get("speed_kmh")
+        engine = row.get("engine_status")
+        driving = bool(engine) and speed is not None and speed > self._min_speed
+        if state["start_id"] is None:
+            if driving:
+                self._open(state, at, tracking_id, row)
+        else:
+            if speed is not None:
+                state["max_speed_kmh"] = max(speed, state["max_speed_kmh"] or speed)
+            if driving:
+                self._moving(state, at, tracking_id, row)
+            if engine is not None and not engine:
+                self._moving(state, at, tracking_id, row)
+                self._close(state, trips)
+            elif (at - to_dt(state["moving_at"])).total_seconds() > self._stop_sec:
+                self._close(state, trips)
+        state["last_id"] = tracking_id
+        state["last_at"] = at.strftime(ISO_DT)
+        if row.get("latitude") is not None and row.get("longitude") is not None:
+            state["last_lat"], state["last_lng"] = row["latitude"], row["longitude"]
+        for column, _ in _FUELS:
+            if row.get(column) is not None:
+                state[f"last_{column}"] = row[column]
+        return state
+
+    @staticmethod
+    def _add_interval(state: dict[str, Any], row: dict[str, Any]) -> None:
+        coords = (state["last_lat"], state["last_lng"], row.get("latitude"), row.get("longitude"))
+        if None not in coords:
+            state["distance_km"] += distance_km(*coords)
+        for column, used in _FUELS:
+            prev, current = state[f"last_{column}"], row.get(column)
+            if prev is not None and current is not None and current < prev:
+                state[used] = (state[used] or 0.0) + prev - current
+
+    def _open(
+        self, state: dict[str, Any], at: datetime, tracking_id: int, row: dict[str, Any]
+    ) -> None:
+        state.update(
+            start_id=tracking_id,
+            started_at=at.strftime(ISO_DT),
+            start_lat=row.get("latitude"),
+            start_lng=row.get("longitude"),
+            distance_km=0.0,
+            max_speed_kmh=row.get("speed_kmh"),
+            fuel_used=None,
+            fuel_used_litre=None,
+            fuel_used_kwh=None,
+        )
+        self._moving(state, at, tracking_id, row)
+
+    @staticmethod
+    def _moving(
+        state: dict[str, Any], at: datetime, tracking_id: int, row: dict[str, Any]
+    ) -> None:
+        state.update(moving_id=tracking_id, moving_at=at.strftime(ISO_DT))
+        if row.get("latitude") is not None and row.get("longitude") is not None:
+            state.update(moving_lat=row["latitude"], moving_lng=row["longitude"])
+
+    @staticmethod
+    def _close(state: dict[str, Any], trips: List[dict[str, Any]]) -> None:
+        # the trip ends at its last moving sample; a trip of one instant is dropped
+        duration = (to_dt(state["moving_at"]) - to_dt(state["started_at"])).total_seconds()
+        if duration > 0:
+            trips.append(
+                {
+                    "car_id": state["car_id"],
+                    "start_tracking_id": state["start_id"],
+                    "end_tracking_id": state["moving_id"],
+                    "started_at": state["started_at"],
+                    "ended_at": state["moving_at"],
+                    "start_lat": state["start_lat"],
+                    "start_lng": state["start_lng"],
+                    "end_lat": state["moving_lat"],
+                    "end_lng": state["moving_lng"],
+                    "distance_km": state["distance_km"],
+                    "duration_sec": duration,
+                    "max_speed_kmh": state["max_speed_kmh"],
+                    "fuel_used": state["fuel_used"],
+                    "fuel_used_litre": state["fuel_used_litre"],
+                    "fuel_used_kwh": state["fuel_used_kwh"],
+                }
+            )
+        for column in _STATE_COLUMNS[8:]:
+            state[column] = None
+
+    def reset(self) -> None:
+        with self._database.transaction() as conn:
+            conn.execute("DELETE FROM trips")
+            conn.execute("DELETE FROM trip_state")
+
+    def rebuild(
+        self, trackings: TrackingService, batch_rows: int = 5000, progress: Progress = _quiet
+    ) -> int:
+        # Replays all stored trackings oldest first through a TrackingService, one
+        # transaction per page; run it while nothing is ingesting.
+        self.reset()
+        total = ended = 0
+        after_id = None
+        while True:
+            page = trackings.list_range(after_id=after_id, page_size=batch_rows)
+            if not page:
+                break
+            with self._database.transaction():
+                ended += self.process([t.to_db() for t in page], [t.id for t in page])
+            total += len(page)
+            after_id = page[-1].id
+            progress(f"Segmented {total} trackings into {ended} trips")
+        return ended
@@ -1,9 +1,11 @@
 from datetime import date, datetime, timedelta
 from decimal import Decimal
+from functools import lru_cache
 import math
 from typing import Mapping, Optional
 
-ISO_DT = "%Y-%m-%d %H:%M:%S"
+from cgps.core import timestamp_codec
+from cgps.core.timestamp_codec import ISO_DT
 
 
 def to_bool(v) -> Optional[bool]:
@@ -27,16 +29,9 @@ def to_date(v) -> Optional[date]:
     return date.fromisoformat(str(v)[:10])
 
 
-def to_dt(v) -> Optional[datetime]:
-    if v in (None, ""):
-        return None
-    if isinstance(v, datetime):
-        return v
-    s = str(v).replace("T", " ").split(".")[0]
-    # expect "YYYY-MM-DD HH:MM:SS" or "YYYY-MM-DD"
-    if " " in s:
-        return datetime.strptime(s, "%Y-%m-%d %H:%M:%S")
-    return datetime.combine(date.fromisoformat(s), datetime.min.time())
+# ISO text or epoch milliseconds -> datetime and back to ISO text, memoised per value
+to_dt = timestamp_codec.decode
+format_dt = timestamp_codec.encode
 
 
 def to_decimal(v) -> Optional[Decimal]:
@@ -54,12 +49,20 @@ def strip_prefix(d: dict, prefix: str) -> dict:
 
 
 def to_update_column(data: dict[str, any]) -> str:
-    cols = list(data.keys())
-    return ", ".join(f"{c}=:{c}" for c in cols)
+    return update_columns(tuple(data))
 
 
 def to_insert_column(data: dict[str, any]) -> str:
-    cols = list(data.keys())
+    return insert_columns(tuple(data))
+
+
+@lru_cache(maxsize=None)
+def update_columns(cols: tuple[str, ...]) -> str:
+    return ", ".join(f"{c}=:{c}" for c in cols)
+
+
+@lru_cache(maxsize=None)
+def insert_columns(cols: tuple[str, ...]) -> str:
     return f"({','.join(cols)}) VALUES ({','.join(':'+c for c in cols)})"
 
 
@@ -87,3 +90,14 @@ def calculate_age(birthdate: date) -> int:
         - birthdate.year
         - ((today.month, today.day) < (birthdate.month, birthdate.day))
     )
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def distance_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    # great-circle (haversine) distance
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
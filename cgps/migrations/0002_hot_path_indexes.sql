@@ -0,0 +1,25 @@
+-- Secondary indexes for the service hot paths (see `cgps db advise`). Built in
+-- the online section so a large trackings table is indexed after the version
+-- row commits, one index per transaction.
+
+-- migrate:up
+
+-- migrate:online
+-- CarService.list_available: per-car overlap check on the rental period
+CREATE INDEX IF NOT EXISTS idx_orders_car_period ON orders (car_id, started_at, ended_at);
+-- OrderService.list(customer_id)
+CREATE INDEX IF NOT EXISTS idx_orders_customer_id ON orders (customer_id);
+-- invoices -> orders join
+CREATE INDEX IF NOT EXISTS idx_invoices_order_id ON invoices (order_id);
+-- TrackingService.*(car_id): WHERE car_id = ? ORDER BY id DESC straight off the index
+CREATE INDEX IF NOT EXISTS idx_trackings_car_id ON trackings (car_id, id);
+-- GpsService.get_available
+CREATE INDEX IF NOT EXISTS idx_cars_tracking_device_id ON cars (tracking_device_id);
+ANALYZE;
+
+-- migrate:down
+DROP INDEX IF EXISTS idx_cars_tracking_device_id;
+DROP INDEX IF EXISTS idx_trackings_car_id;
+DROP INDEX IF EXISTS idx_invoices_order_id;
+DROP INDEX IF EXISTS idx_orders_customer_id;
+DROP INDEX IF EXISTS idx_orders_car_period;
@@ -0,0 +1,42 @@
+-- Latest tracking per car, upserted by TrackingService.insert_batch in the same
+-- transaction as the trackings rows, so "where is each car now" reads one row
+-- per car instead of walking trackings.
+
+-- migrate:up
+CREATE TABLE IF NOT EXISTS tracking_latest (
+  car_id              TEXT PRIMARY KEY,
+  -- trackings.id of the row copied here; a row only replaces a lower id
+  id                  INTEGER NOT NULL,
+  latitude            REAL,
+  longitude           REAL,
+  fuel_level          REAL,
+  fuel_litre          REAL,
+  fuel_kwh            REAL,
+  speed_kmh           REAL,
+  engine_status       INTEGER,
+  gps_signal_level    REAL,
+  gsm_signal_level    REAL,
+  tracking_device_id  TEXT,
+  -- no declared type: ISO text or epoch ms, whatever trackings.created_at holds
+  created_at,
+  updated_at          TEXT,
+  FOREIGN KEY (car_id)  REFERENCES cars(id)
+);
+
+-- migrate:online
+-- backfill from existing history; MAX(id) per car comes off idx_trackings_car_id
+INSERT INTO tracking_latest (
+  car_id, id, latitude, longitude, fuel_level, fuel_litre, fuel_kwh, speed_kmh,
+  engine_status, gps_signal_level, gsm_signal_level, tracking_device_id,
+  created_at, updated_at
+)
+SELECT
+  car_id, id, latitude, longitude, fuel_level, fuel_litre, fuel_kwh, speed_kmh,
+  engine_status, gps_signal_level, gsm_signal_level, tracking_device_id,
+  created_at, updated_at
+FROM trackings
+WHERE id IN (SELECT MAX(id) FROM trackings GROUP BY car_id)
+ON CONFLICT (car_id) DO NOTHING;
+
+-- migrate:down
+DROP TABLE IF EXISTS tracking_latest;
@@ -0,0 +1,15 @@
+-- Seek paths for TrackingService.list_range: pages walk (created_at, id) per car
+-- or across the fleet without OFFSET. Built online like 0002.
+
+-- migrate:up
+
+-- migrate:online
+-- list_range(car_id, ...): WHERE car_id = ? AND created_at range, (created_at, id) order
+CREATE INDEX IF NOT EXISTS idx_trackings_car_time ON trackings (car_id, created_at, id);
+-- list_range(car_id=None, ...): the rowid rides along, so this is (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_trackings_created_at ON trackings (created_at);
+ANALYZE;
+
+-- migrate:down
+DROP INDEX IF EXISTS idx_trackings_created_at;
+DROP INDEX IF EXISTS idx_trackings_car_time;
@@ -0,0 +1,57 @@
+-- Per-minute and per-hour tracking aggregates kept by cgps.core.tracking_retention
+-- (`cgps db retain`), so raw trackings only need to live for a few days.
+-- Interval metrics (distance, fuel delta, engine-on seconds) belong to the
+-- bucket of the sample that ends the interval, which keeps every column
+-- mergeable when a bucket is filled over several runs.
+
+-- migrate:up
+CREATE TABLE IF NOT EXISTS tracking_rollups_minute (
+  car_id            TEXT NOT NULL,
+  -- bucket start, "YYYY-MM-DD HH:MM:00"
+  bucket            TEXT NOT NULL,
+  samples           INTEGER NOT NULL,
+  avg_speed_kmh     REAL,
+  max_speed_kmh     REAL,
+  fuel_delta        REAL NOT NULL DEFAULT 0,
+  distance_km       REAL NOT NULL DEFAULT 0,
+  engine_on_sec     REAL NOT NULL DEFAULT 0,
+  min_gps_signal    REAL,
+  min_gsm_signal    REAL,
+  PRIMARY KEY (car_id, bucket)
+) WITHOUT ROWID;
+-- minute buckets past tracking.retention.minute_days are purged by age
+CREATE INDEX IF NOT EXISTS idx_tracking_rollups_minute_bucket
+  ON tracking_rollups_minute (bucket);
+
+CREATE TABLE IF NOT EXISTS tracking_rollups_hour (
+  car_id            TEXT NOT NULL,
+  -- bucket start, "YYYY-MM-DD HH:00:00"
+  bucket            TEXT NOT NULL,
+  samples           INTEGER NOT NULL,
+  avg_speed_kmh     REAL,
+  max_speed_kmh     REAL,
+  fuel_delta        REAL NOT NULL DEFAULT 0,
+  distance_km       REAL NOT NULL DEFAULT 0,
+  engine_on_sec     REAL NOT NULL DEFAULT 0,
+  min_gps_signal    REAL,
+  min_gsm_signal    REAL,
+  PRIMARY KEY (car_id, bucket)
+) WITHOUT ROWID;
+
+-- last raw sample rolled up per car: the start of its next interval, and
+-- MAX(id) is the watermark raw rows are read from
+CREATE TABLE IF NOT EXISTS tracking_rollup_cursor (
+  car_id            TEXT PRIMARY KEY,
+  id                INTEGER NOT NULL,
+  created_at        TEXT NOT NULL,
+  latitude          REAL,
+  longitude         REAL,
+  fuel_level        REAL,
+  engine_status     INTEGER
+);
+
+-- migrate:down
+DROP TABLE IF EXISTS tracking_rollup_cursor;
+DROP TABLE IF EXISTS tracking_rollups_hour;
+DROP INDEX IF EXISTS idx_tracking_rollups_minute_bucket;
+DROP TABLE IF EXISTS tracking_rollups_minute;
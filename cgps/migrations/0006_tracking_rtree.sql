@@ -0,0 +1,33 @@
+-- R*Tree over tracking positions and times for area queries
+-- (TrackingService.within_bbox), kept in sync by TrackingService.insert_batch.
+-- One point box per trackings row with a position; the rowid is trackings.id, so
+-- rows of monthly partitions are indexed here too. R*Tree coordinates are 32-bit
+-- floats rounded outward, so hits are re-checked against trackings.
+
+-- migrate:up
+CREATE VIRTUAL TABLE IF NOT EXISTS tracking_rtree USING rtree(
+  id,
+  min_lat, max_lat,
+  min_lng, max_lng,
+  -- created_at as epoch seconds
+  min_t, max_t
+);
+
+-- migrate:online
+-- created_at is ISO text, or epoch ms after trackings_epoch.sql; rows written to
+-- partitions before this migration are not indexed
+INSERT INTO tracking_rtree (id, min_lat, max_lat, min_lng, max_lng, min_t, max_t)
+SELECT id, latitude, latitude, longitude, longitude, t, t
+FROM (
+  SELECT id, latitude, longitude,
+    CASE typeof(created_at)
+      WHEN 'text' THEN CAST(strftime('%s', created_at) AS INTEGER)
+      ELSE created_at / 1000
+    END AS t
+  FROM trackings
+  WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    AND NOT EXISTS (SELECT 1 FROM tracking_rtree r WHERE r.id = trackings.id)
+);
+
+-- migrate:down
+DROP TABLE IF EXISTS tracking_rtree;
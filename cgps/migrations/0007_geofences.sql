@@ -0,0 +1,47 @@
+-- Admin-defined geofences and the enter/exit events cgps.core.geofence_engine
+-- derives from every TrackingService.insert_batch, in the same transaction.
+
+-- migrate:up
+CREATE TABLE IF NOT EXISTS geofences (
+  id                INTEGER PRIMARY KEY AUTOINCREMENT,
+  name              TEXT NOT NULL,
+  kind              TEXT NOT NULL CHECK (kind IN ('polygon', 'circle')),
+  -- polygon: JSON [[lat, lng], ...], closed implicitly
+  points            TEXT,
+  -- circle: center and radius in metres
+  center_lat        REAL,
+  center_lng        REAL,
+  radius_m          REAL,
+  created_at        TEXT,
+  updated_at        TEXT
+);
+
+-- which fences each car is inside right now
+CREATE TABLE IF NOT EXISTS geofence_presence (
+  car_id            TEXT NOT NULL,
+  geofence_id       INTEGER NOT NULL,
+  -- trackings.id of the sample that entered
+  tracking_id       INTEGER NOT NULL,
+  PRIMARY KEY (car_id, geofence_id),
+  FOREIGN KEY (geofence_id) REFERENCES geofences(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS geofence_events (
+  id                INTEGER PRIMARY KEY AUTOINCREMENT,
+  geofence_id       INTEGER NOT NULL,
+  car_id            TEXT NOT NULL,
+  tracking_id       INTEGER NOT NULL,
+  event             TEXT NOT NULL CHECK (event IN ('enter', 'exit')),
+  -- no declared type: ISO text or epoch ms, whatever trackings.created_at holds
+  created_at,
+  FOREIGN KEY (geofence_id) REFERENCES geofences(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_geofence_events_fence ON geofence_events (geofence_id, id);
+CREATE INDEX IF NOT EXISTS idx_geofence_events_car ON geofence_events (car_id, id);
+
+-- migrate:down
+DROP INDEX IF EXISTS idx_geofence_events_car;
+DROP INDEX IF EXISTS idx_geofence_events_fence;
+DROP TABLE IF EXISTS geofence_events;
+DROP TABLE IF EXISTS geofence_presence;
+DROP TABLE IF EXISTS geofences;
@@ -0,0 +1,61 @@
+-- Trips segmented from the tracking stream by cgps.core.trip_segmenter, in the
+-- same transaction as each TrackingService.insert_batch. A trip starts at the
+-- first sample with the engine on and moving, and ends at an engine-off sample,
+-- at the last moving sample once the car has stood still for stop_sec, or at the
+-- last sample before a gap longer than max_gap_sec. Times are "YYYY-MM-DD HH:MM:SS".
+
+-- migrate:up
+CREATE TABLE IF NOT EXISTS trips (
+  id                INTEGER PRIMARY KEY AUTOINCREMENT,
+  car_id            TEXT NOT NULL,
+  start_tracking_id INTEGER NOT NULL,
+  end_tracking_id   INTEGER NOT NULL,
+  started_at        TEXT NOT NULL,
+  ended_at          TEXT NOT NULL,
+  start_lat         REAL,
+  start_lng         REAL,
+  end_lat           REAL,
+  end_lng           REAL,
+  distance_km       REAL NOT NULL DEFAULT 0,
+  duration_sec      REAL NOT NULL DEFAULT 0,
+  max_speed_kmh     REAL,
+  -- drops only (refuelling is not subtracted): fuel_level points, litres, kWh
+  fuel_used         REAL,
+  fuel_used_litre   REAL,
+  fuel_used_kwh     REAL
+);
+CREATE INDEX IF NOT EXISTS idx_trips_car_started ON trips (car_id, started_at);
+CREATE INDEX IF NOT EXISTS idx_trips_started ON trips (started_at);
+
+-- segmenter state per car: the last sample seen and the open trip, if any
+CREATE TABLE IF NOT EXISTS trip_state (
+  car_id            TEXT PRIMARY KEY,
+  last_id           INTEGER NOT NULL,
+  last_at           TEXT NOT NULL,
+  last_lat          REAL,
+  last_lng          REAL,
+  last_fuel_level   REAL,
+  last_fuel_litre   REAL,
+  last_fuel_kwh     REAL,
+  -- open trip; start_id IS NULL when the car is not on a trip
+  start_id          INTEGER,
+  started_at        TEXT,
+  start_lat         REAL,
+  start_lng         REAL,
+  distance_km       REAL,
+  max_speed_kmh     REAL,
+  fuel_used         REAL,
+  fuel_used_litre   REAL,
+  fuel_used_kwh     REAL,
+  -- last moving sample of the open trip
+  moving_id         INTEGER,
+  moving_at         TEXT,
+  moving_lat        REAL,
+  moving_lng        REAL
+);
+
+-- migrate:down
+DROP TABLE IF EXISTS trip_state;
+DROP INDEX IF EXISTS idx_trips_started;
+DROP INDEX IF EXISTS idx_trips_car_started;
+DROP TABLE IF EXISTS trips;
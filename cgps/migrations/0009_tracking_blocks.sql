@@ -0,0 +1,29 @@
+-- Compressed tracking history written by cgps.core.tracking_blocks: with
+-- tracking.blocks.enabled, `cgps db retain` moves raw rows past raw_days into one
+-- block per car and hour instead of deleting them, and TrackingService reads them
+-- back together with the raw rows. Times are epoch milliseconds.
+
+-- migrate:up
+CREATE TABLE IF NOT EXISTS tracking_blocks (
+  id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+  car_id              TEXT NOT NULL,
+  tracking_device_id  TEXT,
+  -- created_at of the first and last point; a block never spans more than an hour
+  start_ms            INTEGER NOT NULL,
+  end_ms              INTEGER NOT NULL,
+  min_id              INTEGER NOT NULL,
+  max_id              INTEGER NOT NULL,
+  points              INTEGER NOT NULL,
+  -- 0: varint columns, 1: the same zlib-compressed
+  codec               INTEGER NOT NULL,
+  data                BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tracking_blocks_car_start ON tracking_blocks (car_id, start_ms);
+CREATE INDEX IF NOT EXISTS idx_tracking_blocks_start ON tracking_blocks (start_ms);
+CREATE INDEX IF NOT EXISTS idx_tracking_blocks_min_id ON tracking_blocks (min_id);
+
+-- migrate:down
+DROP INDEX IF EXISTS idx_tracking_blocks_min_id;
+DROP INDEX IF EXISTS idx_tracking_blocks_start;
+DROP INDEX IF EXISTS idx_tracking_blocks_car_start;
+DROP TABLE IF EXISTS tracking_blocks;
@@ -144,4 +144,12 @@ INSERT INTO orders (id, customer_id, car_id, started_at, ended_at, receive_at, r
 (5, 4, 8, '2025-08-16 19:00:00', '2025-08-21 18:00:00', NULL, NULL, 5, 425, 0, 425, '2025-08-16 19:00:00', '2025-08-21 18:00:00', NULL, NULL);
 INSERT INTO invoices (id, order_id, amount, paid_amount, paid_at, created_at, updated_at) VALUES 
 (5, 5, 425, 425, '2025-08-21 18:00:00', '2025-08-21 18:00:00', '2025-08-21 18:00:00');
+-- current position per car, as TrackingService.insert_batch maintains it
+INSERT INTO tracking_latest (car_id, id, latitude, longitude, fuel_level, fuel_litre, fuel_kwh, speed_kmh, engine_status, gps_signal_level, gsm_signal_level, tracking_device_id, created_at, updated_at)
+SELECT car_id, id, latitude, longitude, fuel_level, fuel_litre, fuel_kwh, speed_kmh, engine_status, gps_signal_level, gsm_signal_level, tracking_device_id, created_at, updated_at
+FROM trackings WHERE id IN (SELECT MAX(id) FROM trackings GROUP BY car_id);
+-- spatial index, as TrackingService.insert_batch maintains it
+INSERT INTO tracking_rtree (id, min_lat, max_lat, min_lng, max_lng, min_t, max_t)
+SELECT id, latitude, latitude, longitude, longitude, CAST(strftime('%s', created_at) AS INTEGER), CAST(strftime('%s', created_at) AS INTEGER)
+FROM trackings WHERE latitude IS NOT NULL AND longitude IS NOT NULL;
 COMMIT;
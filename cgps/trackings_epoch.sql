@@ -0,0 +1,48 @@
+-- Optional schema mode: store trackings.created_at as INTEGER epoch milliseconds
+-- (naive wall-clock time read as UTC, matching cgps.core.timestamp_codec).
+-- Applied by `cgps db init` when tracking.timestamps is epoch_ms.
+PRAGMA foreign_keys = OFF;
+
+BEGIN;
+
+CREATE TABLE trackings_epoch (
+  id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+  latitude            REAL,
+  longitude           REAL,
+  fuel_level          REAL,
+  fuel_litre          REAL,
+  fuel_kwh            REAL,
+  speed_kmh           REAL,
+  engine_status       INTEGER,
+  gps_signal_level    REAL,
+  gsm_signal_level    REAL,
+  car_id              TEXT NOT NULL,
+  tracking_device_id  TEXT,
+  created_at          INTEGER,
+  updated_at          TEXT,
+  FOREIGN KEY (car_id)  REFERENCES cars(id),
+  FOREIGN KEY (tracking_device_id) REFERENCES tracking_devices(id)
+);
+
+INSERT INTO trackings_epoch
+SELECT
+  id, latitude, longitude, fuel_level, fuel_litre, fuel_kwh, speed_kmh,
+  engine_status, gps_signal_level, gsm_signal_level, car_id, tracking_device_id,
+  CAST(strftime('%s', created_at) AS INTEGER) * 1000,
+  updated_at
+FROM trackings;
+
+DROP TABLE trackings;
+ALTER TABLE trackings_epoch RENAME TO trackings;
+-- dropped with the old table; same definitions as migrations/0002 and 0004
+CREATE INDEX IF NOT EXISTS idx_trackings_car_id ON trackings (car_id, id);
+CREATE INDEX IF NOT EXISTS idx_trackings_car_time ON trackings (car_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_trackings_created_at ON trackings (created_at);
+
+UPDATE tracking_latest
+SET created_at = CAST(strftime('%s', created_at) AS INTEGER) * 1000
+WHERE typeof(created_at) = 'text';
+
+COMMIT;
+
+PRAGMA foreign_keys = ON;
@@ -0,0 +1,138 @@
+"""Micro-benchmark: generated DBModel row mapping vs the generic fields() loop.
+
+Run from the repository root:
+
+    python scripts/bench_models.py [rows]
+"""
+
+import sys
+import timeit
+from dataclasses import fields
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cgps.core.models.car import Car  # noqa: E402
+from cgps.core.models.order import Order  # noqa: E402
+from cgps.core.models.tracking import Tracking  # noqa: E402
+from cgps.core.utils import ISO_DT  # noqa: E402
+
+
+# The pre-codegen DBModel implementations, kept here as the baseline.
+def generic_from_row(cls, row):
+    conv = getattr(cls, "_converters", {}) or {}
+    kw = {}
+    for f in fields(cls):
+        if f.name.startswith("_"):
+            continue
+        v = row.get(f.name)
+        if v is not None and f.name in conv:
+            v = conv[f.name](v)
+        kw[f.name] = v
+    return cls(**kw)
+
+
+def generic_to_db(obj):
+    out = {}
+    for f in fields(obj):
+        if f.name.startswith("_"):
+            continue
+        v = getattr(obj, f.name)
+        if v is None:
+            out[f.name] = None
+            continue
+        if isinstance(v, bool):
+            out[f.name] = 1 if v else 0
+        elif isinstance(v, datetime):
+            out[f.name] = v.strftime(ISO_DT)
+        elif isinstance(v, date):
+            out[f.name] = v.isoformat()
+        elif isinstance(v, Decimal):
+            out[f.name] = str(v)
+        else:
+            out[f.name] = v
+    return out
+
+
+SAMPLES = {
+    Tracking: {
+        "id": 1,
+        "latitude": -36.8485,
+        "longitude": 174.7633,
+        "fuel_level": 61.2,
+        "fuel_litre": 36.7,
+        "fuel_kwh": None,
+        "speed_kmh": 48.5,
+        "engine_status": 1,
+        "gps_signal_level": 3.2,
+        "gsm_signal_level": 2.9,
+        "car_id": "1",
+        "tracking_device_id": "1",
+        "created_at": "2025-08-08 14:00:00",
+        "updated_at": "2025-08-08 14:00:00",
+    },
+    Car: {
+        "id": 1,
+        "plate_license": "CGP-100",
+        "engine_number": "ENG00001",
+        "fuel_type": "petrol",
+        "make": "Toyota",
+        "model": "Corolla",
+        "year": 2020,
+        "color": "white",
+        "type": "sedan",
+        "seat": 5,
+        "mileage": 42000,
+        "minimum_rent": 1,
+        "maximum_rent": 30,
+        "factory_date": "2020-01-15",
+        "weekday_rate": 60,
+        "weekend_rate": 75,
+        "available": 1,
+        "tracking_device_id": 1,
+        "created_at": "2025-08-01 09:00:00",
+        "updated_at": "2025-08-01 09:00:00",
+    },
+    Order: {
+        "id": 1,
+        "customer_id": 1,
+        "car_id": "1",
+        "started_at": "2025-08-10 10:00:00",
+        "ended_at": "2025-08-12 10:00:00",
+        "total_day": 2,
+        "total_weekday_amount": 120,
+        "total_weekend_amount": 0,
+        "total_amount": 120,
+        "created_at": "2025-08-09 10:00:00",
+        "updated_at": "2025-08-09 10:00:00",
+    },
+}
+
+
+def bench(label, fn, rows):
+    secs = min(timeit.repeat(fn, number=1, repeat=5))
+    print(f"  {label:<24} {secs * 1e3:9.1f} ms  ({rows / secs:,.0f} rows/s)")
+    return secs
+
+
+def main(rows: int) -> None:
+    for cls, sample in SAMPLES.items():
+        data = [dict(sample, id=i) for i in range(rows)]
+        columns = tuple(sample)
+        tuples = [tuple(d.values()) for d in data]
+        objs = [cls.from_row(d) for d in data]
+        read = cls.reader(columns)
+        print(f"{cls.__name__} x {rows}")
+        base = bench("from_row (generic)", lambda: [generic_from_row(cls, d) for d in data], rows)
+        fast = bench("from_row (generated)", lambda: [cls.from_row(d) for d in data], rows)
+        tup = bench("reader (generated)", lambda: [read(t) for t in tuples], rows)
+        print(f"  speedup from_row x{base / fast:.1f}, tuple reader x{base / tup:.1f}")
+        base = bench("to_db (generic)", lambda: [generic_to_db(o) for o in objs], rows)
+        fast = bench("to_db (generated)", lambda: [o.to_db() for o in objs], rows)
+        print(f"  speedup to_db x{base / fast:.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
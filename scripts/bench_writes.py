@@ -0,0 +1,153 @@
+"""Benchmark of the service write paths.
+
+Part 1 times statement preparation alone: the old per-call
+``only_keys(obj.to_db(), keys)`` + SQL string build against the memoised
+statement registry (``cgps.core.statements``). Part 2 times the full service
+calls against a scratch database.
+
+Run from the repository root:
+
+    python scripts/bench_writes.py [ops]
+"""
+
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from cgps.core.database import Database  # noqa: E402
+from cgps.core.migrator import Migrator  # noqa: E402
+from cgps.core.mock_tracking import trackings_iter  # noqa: E402
+from cgps.core.models.car import Car  # noqa: E402
+from cgps.core.models.invoice import Invoice  # noqa: E402
+from cgps.core.models.order import Order  # noqa: E402
+from cgps.core.models.tracking_device import TrackingDevice  # noqa: E402
+from cgps.core.services import (  # noqa: E402
+    car_service,
+    gps_service,
+    order_service,
+    tracking_service,
+)
+from cgps.core.utils import only_keys  # noqa: E402
+
+
+def old_insert(table, data):
+    cols = list(data.keys())
+    return f"INSERT INTO {table} ({','.join(cols)}) VALUES ({','.join(':' + c for c in cols)})"
+
+
+def old_update(table, data):
+    cols = list(data.keys())
+    return f"UPDATE {table} SET {', '.join(f'{c}=:{c}' for c in cols)} WHERE id=:id"
+
+
+def bench(label, fn, ops):
+    secs = min(timeit.repeat(fn, number=1, repeat=5))
+    print(f"  {label:<42} {secs / ops * 1e6:8.2f} us/op")
+    return secs
+
+
+def prepare(ops):
+    car = Car(
+        id=1,
+        plate_license="CGP-900",
+        make="Toyota",
+        model="Yaris",
+        year=2021,
+        seat=5,
+        factory_date=datetime(2021, 1, 1).date(),
+        weekday_rate=Decimal("55"),
+        weekend_rate=Decimal("65"),
+        available=True,
+        tracking_device_id=1,
+    )
+    device = TrackingDevice(id=1, gsm_provider="Spark", gsm_no="021000000")
+    order = Order(id=1, customer_id=1, car_id=1, started_at=datetime.now())
+    tracking = next(trackings_iter(cars=[car]))[0]
+    cases = [
+        ("CarService.update", car, "cars", car_service._UPDATE_CARS, old_update),
+        (
+            "GpsService.register",
+            device,
+            "tracking_devices",
+            gps_service._INSERT_TRACKING_DEVICES,
+            old_insert,
+        ),
+        ("OrderService.rent_and_pay", order, "orders", order_service._INSERT_ORDERS, old_insert),
+        (
+            "TrackingService.insert_batch",
+            tracking,
+            "trackings",
+            tracking_service._INSERT_TRACKINGS,
+            old_insert,
+        ),
+    ]
+    print(f"Statement preparation x {ops} (one row)")
+    for label, obj, table, stmt, build in cases:
+        keys = list(stmt.columns)
+
+        def old():
+            for _ in range(ops):
+                data = only_keys(obj.to_db(), keys)
+                build(table, data)
+
+        def new():
+            for _ in range(ops):
+                stmt.params(obj)
+                stmt.sql
+
+        base = bench(f"{label} (old)", old, ops)
+        fast = bench(f"{label} (registry)", new, ops)
+        print(f"  {'':<42} x{base / fast:.1f}")
+
+
+def end_to_end(ops):
+    tmp = tempfile.mkdtemp()
+    db = Database(str(Path(tmp) / "bench.db"))
+    db.migrate_from_file(ROOT / "cgps" / "db.sql")
+    Migrator(db).migrate()
+    db.migrate_from_file(ROOT / "cgps" / "seed.sql")
+    cars = car_service.CarService(db)
+    gps = gps_service.GpsService(db)
+    orders = order_service.OrderService(db)
+    trackings = tracking_service.TrackingService(db)
+    car = cars.all()[0]
+    device = gps.all()[0]
+    stream = trackings_iter(cars=cars.all())
+    print(f"Service write paths x {ops} (scratch db in {tmp})")
+    bench("CarService.update", lambda: [cars.update(car) for _ in range(ops)], ops)
+    bench("GpsService.update", lambda: [gps.update(device) for _ in range(ops)], ops)
+    bench("OrderService.approve", lambda: [orders.approve(1) for _ in range(ops)], ops)
+    bench(
+        "OrderService.rent_and_pay",
+        lambda: [
+            orders.rent_and_pay(
+                1,
+                Invoice(
+                    id=0,
+                    order_id=0,
+                    amount=Decimal("100"),
+                    order=Order(id=0, customer_id=1, car_id=car.id),
+                ),
+            )
+            for _ in range(ops)
+        ],
+        ops,
+    )
+    bench(
+        "TrackingService.insert_batch",
+        lambda: [trackings.insert_batch(next(stream)) for _ in range(ops)],
+        ops,
+    )
+    db.close()
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    prepare(n)
+    end_to_end(max(n // 10, 1))